@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 from json import loads, JSONDecodeError
-from lib.flair_sentiment import FlairSentiment
+from lib.flair_client import flair_tagger
 import sys
 
 # from icecream import ic
@@ -10,7 +10,7 @@ import sys
 def main():
     # ic.configureOutput(outputFunction=lambda *a: sys.stdout.write(ic(*a)))
     id = 0
-    sentiment_analyzer = FlairSentiment()
+    sentiment_analyzer = flair_tagger()
     for line in sys.stdin:
         id += 1
         record = line.strip()
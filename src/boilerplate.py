@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Strip recurring per source sentences (footers, promos, bylines) from the text
+field before NER, so the models never see them. Learns across runs: a sentence
+that has shown up in --threshold articles from the same source is dropped.
+No text field -> passthrough.
+"""
+
+import sys
+import argparse
+from json import loads, dumps, JSONDecodeError
+from segtok.segmenter import split_multi
+from lib.metrics import StageMetrics
+from lib.boilerplate import (
+    Boilerplate,
+    DEFAULT_BOILERPLATE,
+    DEFAULT_THRESHOLD,
+    DEFAULT_MIN_CHARS,
+    DEFAULT_TTL_DAYS,
+)
+
+
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument(
+        "-c",
+        "--cache",
+        default=DEFAULT_BOILERPLATE,
+        help=f"Sentence counts per source (default {DEFAULT_BOILERPLATE})",
+    )
+    ap.add_argument(
+        "-t",
+        "--threshold",
+        type=int,
+        default=DEFAULT_THRESHOLD,
+        help=f"Articles a sentence must be in to count as boilerplate (default {DEFAULT_THRESHOLD})",
+    )
+    ap.add_argument(
+        "-m",
+        "--min-chars",
+        type=int,
+        default=DEFAULT_MIN_CHARS,
+        help=f"Never strip sentences with fewer letters and digits (default {DEFAULT_MIN_CHARS})",
+    )
+    ap.add_argument(
+        "--ttl",
+        type=float,
+        default=DEFAULT_TTL_DAYS,
+        help=f"Forget sentences not seen for this many days (default {DEFAULT_TTL_DAYS})",
+    )
+    return ap.parse_args(argv)
+
+
+def records(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except JSONDecodeError as e:
+            sys.stderr.write(f"JSON: {e}\n{line}\n")
+
+
+def strip_boilerplate(records, model: Boilerplate, metrics: StageMetrics = None):
+    """Yield the records with their boilerplate sentences dropped."""
+    dropped_by_source = {}
+    for data in records:
+        if not data.get("text"):
+            yield data
+            continue
+
+        src = data.get("source", "")
+        kept, dropped = model.strip(
+            src, list(split_multi(data["text"])), data.get("link")
+        )
+        for sent in dropped:
+            print(f"DROP\t{src}\t{sent}", file=sys.stderr)
+        if dropped:
+            dropped_by_source[src] = dropped_by_source.get(src, 0) + len(dropped)
+            data["text"] = " ".join(kept)
+        yield data
+
+    if metrics:
+        metrics.note("dropped", sum(dropped_by_source.values()))
+    print("Boilerplate sentences dropped by source\n=======\n", file=sys.stderr)
+    for src, count in dropped_by_source.items():
+        print(f"{src}\t{count}", file=sys.stderr)
+
+
+def main():
+    args = cmdargs()
+    metrics = StageMetrics("boilerplate")
+    model = Boilerplate(args.cache, args.threshold, args.min_chars, args.ttl)
+
+    for data in strip_boilerplate(records(metrics.lines(sys.stdin)), model, metrics):
+        out = dumps(data)
+        print(out)
+        metrics.out(out)
+
+    model.close()
+    metrics.close()
+
+
+if __name__ == "__main__":
+    main()
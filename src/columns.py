@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar copies of JSONL article files (lib/columnar) and the fields in them.
+Given a .jsonl file, writes its Parquet copies next to it: foo.parquet, one row
+per article, and foo_ner.parquet, one row per NER span. Given a .parquet file,
+prints the --columns asked for as TSV, the way jq -r '[.id,.title]|join("\\t")'
+does, only reading those columns. Nested fields are dotted: stats.bias,
+bias.degree. e.g.
+  columns.py cache/dedupe.parquet -c id,title,published,summary
+  columns.py cache/dedupe.parquet -c text -i 12,40 --json
+"""
+
+import sys
+import json
+import argparse
+from lib.columnar import convert, parquet_paths, read, DEFAULT_ROW_GROUP
+
+
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("file", help="JSONL file to copy or Parquet file to read")
+    ap.add_argument(
+        "-c",
+        "--columns",
+        default="id,title",
+        help="Comma separated columns to print (default id,title)",
+    )
+    ap.add_argument(
+        "-i",
+        "--ids",
+        help="Comma separated article ids to print, all by default",
+    )
+    ap.add_argument(
+        "-j",
+        "--json",
+        action="store_true",
+        help="Print each row as a JSON array instead of TSV",
+    )
+    ap.add_argument(
+        "-r",
+        "--row-group",
+        type=int,
+        default=DEFAULT_ROW_GROUP,
+        help=f"Rows per row group when writing (default {DEFAULT_ROW_GROUP})",
+    )
+    return ap.parse_args(argv)
+
+
+def tsv(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return str(value)
+
+
+def main():
+    args = cmdargs()
+    try:
+        if not args.file.endswith(".parquet"):
+            count = convert(args.file, args.row_group)
+            print(
+                f"{args.file}: {count} records to {', '.join(parquet_paths(args.file))}",
+                file=sys.stderr,
+            )
+            return
+        columns = args.columns.split(",")
+        ids = [int(id) for id in args.ids.split(",") if id] if args.ids else None
+        for row in read(args.file, columns, ids):
+            values = [row[col] for col in columns]
+            if args.json:
+                print(json.dumps(values))
+            else:
+                print("\t".join(tsv(value) for value in values))
+    except (ImportError, OSError, KeyError, ValueError) as e:
+        sys.exit(f"columns: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 """
 Token counter for LLM tokenization methods.
 Reads from stdin, counts tokens, writes count to stdout.
+
+  count_tokens.py [whitespace|word|subword]
+  count_tokens.py model [MODEL]   the model's tokenizer, see lib/token_budget
 """
 
 import sys
@@ -35,7 +38,7 @@ def subword_estimate(text: str) -> int:
     return estimated_tokens
 
 
-def count_tokens(text: str, method: str = "subword") -> int:
+def count_tokens(text: str, method: str = "subword", model: str = None) -> int:
     """Count tokens using specified method."""
     if method == "whitespace":
         return len(simple_whitespace_tokenize(text))
@@ -43,6 +46,10 @@ def count_tokens(text: str, method: str = "subword") -> int:
         return len(word_tokenize(text))
     elif method == "subword":
         return subword_estimate(text)
+    elif method == "model":
+        from lib.token_budget import count_tokens as model_tokens
+
+        return model_tokens(text, model)
     else:
         raise ValueError(f"Unknown tokenization method: {method}")
 
@@ -60,15 +67,17 @@ def main():
     # Allow method override via command line argument
     if len(sys.argv) > 1:
         method = sys.argv[1].lower()
-        if method not in ["whitespace", "word", "subword"]:
+        if method not in ["whitespace", "word", "subword", "model"]:
             print(
-                f"Error: Unknown method '{method}'. Use: whitespace, word, or subword",
+                f"Error: Unknown method '{method}'. Use: whitespace, word, subword or model",
                 file=sys.stderr,
             )
             sys.exit(1)
 
+    model = sys.argv[2] if len(sys.argv) > 2 else "ollama/llama4:scout"
+
     # Count tokens
-    token_count = count_tokens(text, method)
+    token_count = count_tokens(text, method, model)
 
     # Write count to stdout
     print(token_count)
@@ -2,6 +2,7 @@ import sys
 import re
 from collections import defaultdict
 from json import loads, dumps, JSONDecodeError
+from lib.metrics import StageMetrics
 
 """
 Remove duplicate sentences by comparing to sentences in the previous article.
@@ -17,48 +18,73 @@ def alphanumeric(text):
     return PATTERN.sub("", text)
 
 
-try:
-    with open(DUPEFILE, "r") as dfh:
-        deadlines = loads(dfh.read())
-except FileNotFoundError as e:
-    print(f"Missing: {DUPEFILE}\n{e}\n", file=sys.stderr)
-    exit(1)
-except JSONDecodeError as e:
-    sys.stderr.write(f"JSONload error {DUPEFILE} file: {e}\n")
-    exit(1)
-
-for line in sys.stdin:
-    line = line.strip()
-    if not line:
-        continue
+def load_deadlines(file_path=DUPEFILE) -> dict:
+    with open(file_path, "r") as dfh:
+        return {src: set(sents) for src, sents in loads(dfh.read()).items()}
+
+
+def dedupe(records, deadlines: dict):
+    """Yield the records with their source's repeated sentences dropped from
+    "ner". Records without "ner" pass through."""
+    for data in records:
+        # This should mean this is an rss flavored record
+        if not "ner" in data:
+            yield data
+            continue
+
+        src = data["source"]
+        clean_ner = []
+        try:
+            dedupe = deadlines[src]
+        except KeyError:
+            sys.stderr.write(f"Missing source {src} in dedupe cache.\n")
+            dedupe = set()
+
+        for sentence in data["ner"]:
+            sent = sentence["sentence"]
+            alpha_sent = alphanumeric(sent)
+
+            if alpha_sent in dedupe:
+                print(f"DROP\t{src}\t{sent}", file=sys.stderr)
+                continue
+
+            clean_ner.append(sentence)
+
+        # Sentences done
+        data["ner"] = clean_ner
+        yield data
+
+
+def records(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except JSONDecodeError as e:
+            sys.stderr.write(f"JSON: {e}\n{line}\n")
+
+
+def main():
     try:
-        data = loads(line)
+        deadlines = load_deadlines()
+    except FileNotFoundError as e:
+        print(f"Missing: {DUPEFILE}\n{e}\n", file=sys.stderr)
+        exit(1)
     except JSONDecodeError as e:
-        sys.stderr.write(f"JSON: {e}\n{line}\n")
-        continue
-    # This should mean this is an rss flavored record
-    if not "ner" in data:
-        print(line)
-        continue
-
-    src = data["source"]
-    clean_ner = []
-    try:
-        dedupe = deadlines[src]
-    except KeyError:
-        sys.stderr.write(f"Missing source {src} in dedupe cache.\n")
-        dedupe = []
+        sys.stderr.write(f"JSONload error {DUPEFILE} file: {e}\n")
+        exit(1)
 
-    for sentence in data["ner"]:
-        sent = sentence["sentence"]
-        alpha_sent = alphanumeric(sent)
+    metrics = StageMetrics("dedupe")
 
-        if alpha_sent in dedupe:
-            print(f"DROP\t{src}\t{sent}", file=sys.stderr)
-            continue
+    for data in dedupe(records(metrics.lines(sys.stdin)), deadlines):
+        out = dumps(data)
+        print(out)
+        metrics.out(out)
+
+    metrics.close()
 
-        clean_ner.append(sentence)
 
-    # Sentences done
-    data["ner"] = clean_ner
-    print(dumps(data))
+if __name__ == "__main__":
+    main()
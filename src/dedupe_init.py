@@ -17,53 +17,75 @@ def alphanumeric(text):
     return PATTERN.sub("", text)
 
 
-deadlines = defaultdict(
-    lambda: []
-)  # This will be cached to use after the first article time through
-last_src = False
-
-for line in sys.stdin:
-    line = line.strip()
-    if not line:
-        continue
-    try:
-        data = loads(line)
-    except JSONDecodeError as e:
-        sys.stderr.write(f"JSON: {e}\n{line}\n")
-        continue
-    # This should mean this is an rss flavored record
-    if not "ner" in data:
-        continue
-
-    src = data["source"]
-    if last_src:
-        if src != last_src:
-            init = True
+def records(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except JSONDecodeError as e:
+            sys.stderr.write(f"JSON: {e}\n{line}\n")
+
+
+def find_deadlines(records) -> dict:
+    """{source: set of alphanumeric sentences} that repeat the first article's
+    sentences in later articles of the same source run."""
+    deadlines = defaultdict(
+        set
+    )  # This will be cached to use after the first article time through
+    last_src = False
+
+    for data in records:
+        # This should mean this is an rss flavored record
+        if not "ner" in data:
+            continue
+
+        src = data["source"]
+        if last_src:
+            if src != last_src:
+                init = True
+                last_src = src
+                dedupe = set()
+        else:
             last_src = src
-            dedupe = []
-    else:
-        last_src = src
-        dedupe = []
-        init = True  # Flag to determine whether we are on the first article or not.
-
-    for sentence in data["ner"]:
-        sent = sentence["sentence"]
-        alpha_sent = alphanumeric(sent)
+            dedupe = set()
+            init = True  # Flag to determine whether we are on the first article or not.
+
+        for sentence in data["ner"]:
+            sent = sentence["sentence"]
+            alpha_sent = alphanumeric(sent)
+            if init:
+                dedupe.add(alpha_sent)
+            else:
+                if alpha_sent in dedupe:
+                    deadlines[src].add(alpha_sent)
+
+        # Finished with sentences
+        # dedupe should be full now.
         if init:
-            dedupe.append(alpha_sent)
-        else:
-            if alpha_sent in dedupe:
-                if alpha_sent not in deadlines[src]:
-                    deadlines[src].append(alpha_sent)
+            init = False
+    return deadlines
+
+
+def save_deadlines(deadlines: dict, file_path=DUPEFILE) -> None:
+    with open(file_path, "w") as dfh:
+        print(
+            dumps({src: sorted(sents) for src, sents in deadlines.items()}), file=dfh
+        )
+
+
+def report(deadlines: dict, file=sys.stdout) -> None:
+    print("Duplicate lines by source\n=======\n", file=file)
+    for src in deadlines:
+        print(f"{src}\t{len(deadlines[src])}", file=file)
+
 
-    # Finished with sentences
-    # dedupe should be full now.
-    if init:
-        init = False
+def main():
+    deadlines = find_deadlines(records(sys.stdin))
+    save_deadlines(deadlines)
+    report(deadlines)
 
-with open(DUPEFILE, "w") as dfh:
-    print(dumps(deadlines), file=dfh)
 
-print("Duplicate lines by source\n=======\n")
-for src in deadlines:
-    print(f"{src}\t{len(deadlines[src])}")
+if __name__ == "__main__":
+    main()
@@ -4,29 +4,40 @@ import json
 import sys
 
 
-def main():
+def dedupe_titles(records):
+    """Yield the records with a title not seen before."""
     seen_titles = set()
+    for record in records:
+        # Check if "title" field exists
+        if "title" not in record:
+            continue
 
-    for line_number, line in enumerate(sys.stdin, 1):
-        try:
-            record = json.loads(line.strip())
+        title = record["title"]
 
-            # Check if "title" field exists
-            if "title" not in record:
-                continue
+        if title in seen_titles:
+            sys.stderr.write(f"Duplicate title found and rejected: {title}\n")
+        else:
+            seen_titles.add(title)
+            yield record
 
-            title = record["title"]
-
-            if title in seen_titles:
-                sys.stderr.write(f"Duplicate title found and rejected: {title}\n")
-            else:
-                seen_titles.add(title)
-                print(json.dumps(record))
 
+def records(lines):
+    """The JSON objects in lines; anything else is reported and skipped."""
+    for line_number, line in enumerate(lines, 1):
+        try:
+            record = json.loads(line.strip())
         except json.JSONDecodeError as e:
             sys.stderr.write(f"Error decoding JSON on line {line_number}: {e}\n")
-        except Exception as e:
-            sys.stderr.write(f"Unexpected error processing line {line_number}: {e}\n")
+            continue
+        if not isinstance(record, dict):
+            sys.stderr.write(f"Not a JSON object on line {line_number}, skipped\n")
+            continue
+        yield record
+
+
+def main():
+    for record in dedupe_titles(records(sys.stdin)):
+        print(json.dumps(record))
 
 
 if __name__ == "__main__":
@@ -1,48 +1,229 @@
 import sys
+import time
+import argparse
+from itertools import islice
+import multiprocessing
 from json import loads, dumps, JSONDecodeError
-from lib.flair_sentiment import FlairSentiment
+from lib.flair_client import flair_tagger
+from lib.ner_cache import (
+    CachedTagger,
+    DEFAULT_NER_CACHE,
+    DEFAULT_SENTENCE_CACHE,
+    DEFAULT_MAX_MB,
+)
+from lib.result_cache import ResultCache
+from lib.metrics import StageMetrics
 
-"""Do targetted sentiment detection on news articles. If no text field, passthrough."""
+"""Do targetted sentiment detection on news articles. If no text field, passthrough.
 
-fs = FlairSentiment()
+Articles are tagged --batch at a time so sentences and NER targets from many
+articles share model batches. --workers N shards batches over N processes, each
+with its own copy of the models, and output keeps the input order. With --server
+or FLAIR_SERVER set, tagging goes to a running flair_server.py instead of
+loading the models here. Results are cached by article text (cache/ner.db)
+so re-runs and syndicated copies cost a lookup, and by sentence
+(cache/ner_sentences.db) so only sentences never seen before reach the models."""
+
+DEFAULT_BATCH = 8
+
+fs = None
 last_source = None
-data = {}
+cache_seen = (0, 0)
+
+
+def batches(lines, size):
+    lines = iter(lines)
+    while batch := list(islice(lines, size)):
+        yield batch
 
-for lno, line in enumerate(sys.stdin, start=1):
 
-    #    sys.stderr.write(f"{lno}: {line}\n===\n")
+def tag_batch(lines: list) -> tuple:
+    """Tag a batch of input lines. Returns output lines in the same order, the
+    (hits, misses) this process's cache saw since the last batch, and the
+    seconds spent tagging."""
+    records = []
+    for line in lines:
+        #    sys.stderr.write(f"{lno}: {line}\n===\n")
 
-    line = line.strip()
-    if not line:
-        # sys.stderr.write("Blank {lno}\n")
-        continue
-    try:
-        #        sys.stderr.write(f"Parsing {lno}: {line}\n")
-        data = loads(line)
+        line = line.strip()
+        if not line:
+            # sys.stderr.write("Blank {lno}\n")
+            continue
+        try:
+            #        sys.stderr.write(f"Parsing {lno}: {line}\n")
+            data = loads(line)
 
-    #        sys.stderr.write(f"Parsed {lno}: {data}\n")
+        #        sys.stderr.write(f"Parsed {lno}: {data}\n")
 
-    except JSONDecodeError as e:
-        sys.stderr.write(f"JSON: {e}\n{line}\n")
-        continue
+        except JSONDecodeError as e:
+            sys.stderr.write(f"JSON: {e}\n{line}\n")
+            continue
+        records.append(data)
 
     #    sys.stderr.write(f"data out: {data}\n")
+    records, delta, seconds = tag_records(records)
+    return [dumps(data) for data in records], delta, seconds
+
+
+def tag_records(records: list) -> tuple:
+    """tag_batch() for records already parsed: the same records with their
+    "ner" and "stats", cache (hits, misses) and seconds spent tagging."""
+    global last_source
+    for data in records:
+        # Print message when data stream switches sources
+        if "source" in data:
+            if last_source != data["source"]:
+                sys.stderr.write(f"\nProcessing:\t{data['source']}\n\n")
+                last_source = data["source"]
+
+        if "text" in data:
+            sys.stderr.write(f"{data.get('id', '')}\t{data['title']}\n")
+
+    start = time.perf_counter()
+    results = iter(
+        fs.process_texts([data["text"] for data in records if "text" in data])
+    )
+    seconds = time.perf_counter() - start
+    for data in records:
+        if not "text" in data:
+            #        sys.stderr.write("No text field in data, passing through.\n")
+            continue
+        data["ner"], data["stats"] = next(results)
+        #    sys.stderr.write(f"\ndataNER {data['ner']}\n")
+    return records, cache_delta(), seconds
+
+
+def tag_all(
+    items, tag=tag_records, batch=DEFAULT_BATCH, workers=1, init=(), start_method=None
+):
+    """Yield tag(batch) for each batch of items, in input order, sharded over
+    workers processes that each run init_worker(*init). A threaded caller
+    wants start_method "spawn", since forking one is not safe."""
+    if workers > 1:
+        context = multiprocessing.get_context(start_method)
+        with context.Pool(workers, init_worker, init) as pool:
+            yield from pool.imap(tag, batches(items, batch))
+    else:
+        init_worker(*init)
+        for chunk in batches(items, batch):
+            yield tag(chunk)
+
+
+def cache_delta() -> tuple:
+    global cache_seen
+    if not isinstance(fs, CachedTagger):
+        return (0, 0)
+    hits, misses = fs.cache.hits, fs.cache.misses
+    delta = (hits - cache_seen[0], misses - cache_seen[1])
+    cache_seen = (hits, misses)
+    return delta
+
+
+def init_worker(
+    server, mini_batch_size, tsc_batch_size, cache, sentence_cache, cache_mb
+):
+    global fs
+    kwargs = {}
+    if sentence_cache:
+        kwargs["sentence_cache"] = ResultCache(sentence_cache, max_mb=cache_mb)
+    if mini_batch_size:
+        kwargs["mini_batch_size"] = mini_batch_size
+    if tsc_batch_size:
+        kwargs["tsc_batch_size"] = tsc_batch_size
+    fs = flair_tagger(server, **kwargs)
+    if cache:
+        fs = CachedTagger(fs, cache, cache_mb)
 
-    # Print message when data stream switches sources
-    if "source" in data:
-        if last_source != data["source"]:
-            sys.stderr.write(f"\nProcessing:\t{data['source']}\n\n")
-            last_source = data["source"]
 
-    if not "text" in data:
-        print(line)
-        #        sys.stderr.write("No text field in data, passing through.\n")
-        continue
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Add NER spans and target sentiment to JSONL articles on stdin."
+    )
+    ap.add_argument(
+        "-b",
+        "--batch",
+        type=int,
+        default=DEFAULT_BATCH,
+        help=f"Articles tagged together, 1 is one at a time (default {DEFAULT_BATCH})",
+    )
+    ap.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes to shard batches over, each loads its own models (default 1)",
+    )
+    ap.add_argument(
+        "--mini-batch",
+        type=int,
+        help="Sentences per flair predict batch (default 32)",
+    )
+    ap.add_argument(
+        "--tsc-batch",
+        type=int,
+        help="NER targets per target sentiment batch (default 64)",
+    )
+    ap.add_argument(
+        "-s",
+        "--server",
+        help="flair_server.py url to tag with instead of loading models (env: FLAIR_SERVER)",
+    )
+    ap.add_argument(
+        "-c",
+        "--cache",
+        default=DEFAULT_NER_CACHE,
+        help=f"NER result cache keyed by article text (default {DEFAULT_NER_CACHE})",
+    )
+    ap.add_argument(
+        "--sentence-cache",
+        default=DEFAULT_SENTENCE_CACHE,
+        help=f"Per sentence NER cache, used when the models run here (default {DEFAULT_SENTENCE_CACHE})",
+    )
+    ap.add_argument(
+        "--cache-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        help=f"Size cap in MB for each NER cache, least recently used go first (default {DEFAULT_MAX_MB})",
+    )
+    ap.add_argument(
+        "-n",
+        "--no-cache",
+        action="store_true",
+        help="Always run the models",
+    )
+    return ap.parse_args(argv)
 
-    sys.stderr.write(f"{lno}\t{data['title']}\n")
 
-    data["ner"], data["stats"] = fs.process_text(data["text"])
+if __name__ == "__main__":
+    args = cmdargs()
+    cache = None if args.no_cache else args.cache
+    sentence_cache = None if args.no_cache else args.sentence_cache
+    init = (
+        args.server,
+        args.mini_batch,
+        args.tsc_batch,
+        cache,
+        sentence_cache,
+        args.cache_mb,
+    )
+    metrics = StageMetrics("flair_news")
+    hits = misses = 0
 
-    #    sys.stderr.write(f"\ndataNER {data['ner']}\n")
+    def emit(output, seconds):
+        for line in output:
+            print(line)
+            metrics.out(line)
+            # Records are tagged together, so each gets its share of the batch.
+            metrics.latency(seconds / len(output))
 
-    print(dumps(data))
+    for output, (h, m), seconds in tag_all(
+        metrics.lines(sys.stdin), tag_batch, args.batch, args.workers, init
+    ):
+        hits += h
+        misses += m
+        emit(output, seconds)
+        sys.stdout.flush()
+    if cache:
+        print(f"ner cache: {hits} hits {misses} misses", file=sys.stderr)
+        metrics.cache("ner", hits, misses)
+    metrics.close()
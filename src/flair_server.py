@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+Resident NER / target sentiment worker. Loads the flair and NewsSentiment
+models once and serves FlairSentiment.process_text over HTTP, batching
+requests that arrive together into one process_texts call.
+
+Usage:
+  python src/flair_server.py --port 8765
+  FLAIR_SERVER=http://localhost:8765 python src/flair_news.py < cache/art.jsonl
+
+Endpoints (JSON in, JSON out):
+  POST /               article record, returned with ner and stats added
+                       (fanout.py compatible, records without text pass through)
+  POST /process_text   {"text": str}          -> {"ner": [...], "stats": {...}}
+  POST /process_texts  {"texts": [str, ...]}  -> {"results": [[ner, stats], ...]}
+  GET  /health         {"ok": true, "batches": n, "texts": n}
+"""
+import asyncio, sys, argparse
+from aiohttp import web
+from lib.flair_sentiment import FlairSentiment, MINI_BATCH_SIZE, TSC_BATCH_SIZE
+from lib.ner_cache import DEFAULT_SENTENCE_CACHE, DEFAULT_MAX_MB
+from lib.result_cache import ResultCache
+
+DEFAULT_PORT = 8765
+# Texts per model call, and how long to wait for more before running a short batch.
+DEFAULT_BATCH = 16
+DEFAULT_LINGER = 0.02
+
+
+class Batcher:
+    """Collect texts from concurrent requests and tag them in one go."""
+
+    def __init__(self, fs: FlairSentiment, batch: int, linger: float):
+        self.fs = fs
+        self.batch = batch
+        self.linger = linger
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, texts: list) -> list:
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        for text, future in zip(texts, futures):
+            await self.queue.put((text, future))
+        return await asyncio.gather(*futures)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.linger
+            while len(items) < self.batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # A request that went away leaves its futures cancelled.
+            items = [(text, future) for text, future in items if not future.done()]
+            if not items:
+                continue
+            texts = [text for text, _ in items]
+            try:
+                # Models aren't thread safe, so one batch at a time off the event loop.
+                results = await loop.run_in_executor(
+                    None, self.fs.process_texts, texts
+                )
+                for (_, future), result in zip(items, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batches += 1
+            self.texts += len(texts)
+
+
+async def article(request: web.Request) -> web.Response:
+    record = await request.json()
+    if "text" in record:
+        [(record["ner"], record["stats"])] = await request.app["batcher"].submit(
+            [record["text"]]
+        )
+    return web.json_response(record)
+
+
+async def process_text(request: web.Request) -> web.Response:
+    data = await request.json()
+    [(ner, stats)] = await request.app["batcher"].submit([data["text"]])
+    return web.json_response({"ner": ner, "stats": stats})
+
+
+async def process_texts(request: web.Request) -> web.Response:
+    data = await request.json()
+    results = await request.app["batcher"].submit(data["texts"])
+    return web.json_response({"results": results})
+
+
+async def health(request: web.Request) -> web.Response:
+    batcher = request.app["batcher"]
+    return web.json_response(
+        {"ok": True, "batches": batcher.batches, "texts": batcher.texts}
+    )
+
+
+def make_app(fs: FlairSentiment, batch: int, linger: float) -> web.Application:
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+
+    async def start(app):
+        app["batcher"] = Batcher(fs, batch, linger)
+        app["batcher_task"] = asyncio.create_task(app["batcher"].run())
+
+    async def stop(app):
+        app["batcher_task"].cancel()
+
+    app.on_startup.append(start)
+    app.on_cleanup.append(stop)
+    app.add_routes(
+        [
+            web.post("/", article),
+            web.post("/process_text", process_text),
+            web.post("/process_texts", process_texts),
+            web.get("/health", health),
+        ]
+    )
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve FlairSentiment over HTTP.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    ap.add_argument("--linger", type=float, default=DEFAULT_LINGER)
+    ap.add_argument("--mini-batch", type=int, default=MINI_BATCH_SIZE)
+    ap.add_argument("--tsc-batch", type=int, default=TSC_BATCH_SIZE)
+    ap.add_argument("--sentence-cache", default=DEFAULT_SENTENCE_CACHE)
+    ap.add_argument("--cache-mb", type=float, default=DEFAULT_MAX_MB)
+    ap.add_argument("--no-cache", action="store_true")
+    args = ap.parse_args()
+
+    sentence_cache = None
+    if not args.no_cache:
+        sentence_cache = ResultCache(args.sentence_cache, max_mb=args.cache_mb)
+    print("Loading models...", file=sys.stderr, flush=True)
+    fs = FlairSentiment(args.mini_batch, args.tsc_batch, sentence_cache)
+    web.run_app(
+        make_app(fs, args.batch, args.linger), host=args.host, port=args.port
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 from json import loads, dumps, JSONDecodeError
 import sys
 import re
-from lib.flair_sentiment import FlairSentiment
+from lib.flair_client import flair_tagger
 
-fs = FlairSentiment()
+# Uses a running flair_server.py when FLAIR_SERVER is set.
+fs = flair_tagger()
 
 
 def readstd(callback):
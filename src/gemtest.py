@@ -2,6 +2,8 @@
 import google.generativeai as genai
 import sys
 import os
+import argparse
+from lib.llm_cache import add_cache_args, open_cache
 
 # modelname promptfile
 
@@ -18,21 +20,37 @@ if not os.environ.get("GEMINI_API_KEY"):
 # Configure the API key
 genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
 
-modelname = DEFAULT_MODEL
+ap = argparse.ArgumentParser(description="Send stdin to Gemini after a prompt file.")
+ap.add_argument("modelname", nargs="?", default=DEFAULT_MODEL)
+ap.add_argument("promptfile", nargs="?")
+add_cache_args(ap)
+args = ap.parse_args()
+
+modelname = args.modelname
 system_prompt = ""
 
-if len(sys.argv) > 2:
-    modelname = sys.argv[1]
-    promptfile = sys.argv[2]
+if args.promptfile:
+    promptfile = args.promptfile
     try:
         with open(promptfile, "r") as f:
             system_prompt = f.read()
     except FileNotFoundError:
         sys.stderr.write(f"Error: Prompt file '{promptfile}' not found.\n")
         sys.exit(1)
-else:
-    if len(sys.argv) > 1:
-        modelname = sys.argv[1]
+
+cache = open_cache(args)
+
+
+def complete(response) -> bool:
+    """Whether the answer is whole: some text, and the model stopped on its
+    own rather than at its token limit or a safety block."""
+    try:
+        reason = response.candidates[0].finish_reason
+        text = response.text
+    except (AttributeError, IndexError, ValueError):
+        return False
+    return bool(text.strip()) and getattr(reason, "name", reason) in ("STOP", 1)
+
 
 # quiet
 # sys.stderr.write(f"model: {modelname}\n")
@@ -45,15 +63,22 @@ try:
             continue
         buf.append(line)
 
-    prompt = system_prompt + "".join(buf)
+    text = "".join(buf)
+    prompt = system_prompt + text
 
     # print("sent")
 
-    response = model.generate_content(prompt)
+    answer = cache.response(modelname, system_prompt, text) if cache else None
+    if answer is None:
+        response = model.generate_content(prompt)
+        answer = response.text
+        # A cut off or empty answer is asked for again next time.
+        if cache and complete(response):
+            cache.store(modelname, system_prompt, text, answer)
 
     # print(f"Response: {response.text}\n")
 
-    print(response.text)
+    print(answer)
     sys.exit(0)
 except Exception as e:
     sys.stderr.write(f"Error: {e}\n")
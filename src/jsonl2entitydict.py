@@ -4,36 +4,47 @@ from collections import defaultdict
 
 # Create a tab delimited file of entities.
 # entity, type, reference count, article ids containing entity
-# from stdin to stdout
+# from stdin to stdout, or from the NER Parquet copy (lib/columnar) given,
+# e.g. cache/dedupe_ner.parquet, reading only the columns needed.
 
 # Dictionary to store entity references with article IDs and occurrence counts
 entity_references = defaultdict(lambda: {"count": 0, "article_ids": set()})
 
-# Read JSONL from stdin
-for line in sys.stdin:
-    try:
-        # Parse each line as JSON
-        record = json.loads(line.strip())
+
+def jsonl_spans(lines):
+    """(article id, entity name, entity type) of each NER span."""
+    for line in lines:
+        try:
+            # Parse each line as JSON
+            record = json.loads(line.strip())
+        except json.JSONDecodeError:
+            # Skip invalid JSON lines
+            continue
 
         # Get article ID
         article_id = record.get("id")
 
         # Process NER spans
         for ner_entry in record.get("ner", []):
-            spans = ner_entry.get("spans", [])
-            for span in spans:
-                entity_name = span.get("text")
-                entity_type = span.get("value")
-                if entity_name and entity_type:
-                    # Create composite key from entity name and type
-                    entity_key = (entity_name, entity_type)
-                    # Increment occurrence count and add article ID
-                    entity_references[entity_key]["count"] += 1
-                    entity_references[entity_key]["article_ids"].add(article_id)
-
-    except json.JSONDecodeError:
-        # Skip invalid JSON lines
-        continue
+            for span in ner_entry.get("spans", []):
+                yield article_id, span.get("text"), span.get("value")
+
+
+def parquet_spans(file_path):
+    from lib.columnar import read
+
+    for row in read(file_path, ["id", "text", "value"]):
+        yield row["id"], row["text"], row["value"]
+
+
+spans = parquet_spans(sys.argv[1]) if len(sys.argv) > 1 else jsonl_spans(sys.stdin)
+for article_id, entity_name, entity_type in spans:
+    if entity_name and entity_type:
+        # Create composite key from entity name and type
+        entity_key = (entity_name, entity_type)
+        # Increment occurrence count and add article ID
+        entity_references[entity_key]["count"] += 1
+        entity_references[entity_key]["article_ids"].add(article_id)
 
 # Prepare data for sorting
 output_data = [
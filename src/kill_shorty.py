@@ -7,40 +7,34 @@ Remove repeated string from text field and make sure it is a certain minimum len
 import sys
 import json
 import re
+import argparse
 
-min_length = 128
-killfile = None
+MIN_LENGTH = 128
 
 nospace = re.compile(r"\s+", re.IGNORECASE)
 
-if len(sys.argv) > 1:
-    killfile = sys.argv[1]
-    if len(sys.argv) > 2:
-        min_length = int(sys.argv[2])
 
-killwords = []
-
-try:
+def load_killfile(killfile) -> list:
+    """One regex per line, matched case insensitively."""
+    killwords = []
     with open(killfile, "r", encoding="utf-8") as f:
         for line in f:
             pat = line.strip()
             killwords.append(re.compile(pat, re.IGNORECASE))
+    return killwords
 
-except FileNotFoundError:
-    print(f"Error: Killfile not found at '{killfile}'", file=sys.stderr)
-    sys.exit(1)
-except Exception as e:
-    print(f"Error reading killfile '{killfile}': {e}", file=sys.stderr)
-    sys.exit(1)
 
-for line_num, line in enumerate(sys.stdin, 1):
-    try:
-        record = json.loads(line)
-    except json.JSONDecodeError as e:
-        print(f"Error: Could not parse JSON on line {line_num}: {e}", file=sys.stderr)
-        print(f"Skipping line: {line.strip()}", file=sys.stderr)
-        continue
+def kill_shorty(records, killwords: list, min_length=MIN_LENGTH):
+    """Yield the records that kill_one() keeps."""
+    for record in records:
+        record = kill_one(record, killwords, min_length)
+        if record is not None:
+            yield record
 
+
+def kill_one(record, killwords: list, min_length=MIN_LENGTH):
+    """The record with the kill patterns stripped from its text, or None if
+    that leaves less than min_length of it."""
     original_text = record.get("text")
     l = len(original_text)
 
@@ -49,7 +43,7 @@ for line_num, line in enumerate(sys.stdin, 1):
             f"shorty: {l} {record['source']} {record['id']}: {original_text}",
             file=sys.stderr,
         )
-        continue
+        return None
 
     text = original_text
     for killpat in killwords:
@@ -65,7 +59,52 @@ for line_num, line in enumerate(sys.stdin, 1):
             f"shorty: {l} {record['source']} {record['id']}: {original_text}",
             file=sys.stderr,
         )
-        continue
+        return None
 
     record["text"] = text.strip()
-    print(json.dumps(record))
+    return record
+
+
+def records(lines):
+    for line_num, line in enumerate(lines, 1):
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            print(
+                f"Error: Could not parse JSON on line {line_num}: {e}", file=sys.stderr
+            )
+            print(f"Skipping line: {line.strip()}", file=sys.stderr)
+
+
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("killfile", help="Regexes to strip from the text, one per line")
+    ap.add_argument(
+        "min_length",
+        nargs="?",
+        type=int,
+        default=MIN_LENGTH,
+        help=f"Drop articles with less text than this (default {MIN_LENGTH})",
+    )
+    return ap.parse_args(argv)
+
+
+def main():
+    args = cmdargs()
+    killfile = args.killfile
+
+    try:
+        killwords = load_killfile(killfile)
+    except FileNotFoundError:
+        print(f"Error: Killfile not found at '{killfile}'", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading killfile '{killfile}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for record in kill_shorty(records(sys.stdin), killwords, args.min_length):
+        print(json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import json
+import time
+import sqlite3
+from datetime import datetime
+
+"""Persistent store of finished articles, in SQLite, for windowed views.
+
+Articles go in once, as the bias stage finishes them, keyed by id with their
+title and publish time in indexed columns and the record as its JSON line. A
+view of the last few days is then a range scan over the publish time, first
+article per title, written out as stored: nothing is re-read or re-parsed from
+the per run files. A copy with a bias answer is never replaced by one
+without."""
+
+DEFAULT_STORE = "cache/store.db"
+DEFAULT_WINDOW_DAYS = 3
+# Articles published longer ago than this are dropped from the store.
+DEFAULT_KEEP_DAYS = 30
+DEFAULT_BATCH = 500
+
+
+def published_time(data: dict):
+    """Epoch seconds of published_parsed, read as local time the way
+    date_filter.py does, or None without a usable one."""
+    published_parsed = data.get("published_parsed")
+    if not published_parsed or len(published_parsed) < 6:
+        return None
+    try:
+        return datetime(*published_parsed[:6]).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class ArticleStore:
+    def __init__(
+        self, file_path=DEFAULT_STORE, keep_days=DEFAULT_KEEP_DAYS, batch=DEFAULT_BATCH
+    ):
+        self.file_path = file_path
+        self.keep_days = keep_days
+        self.batch = batch
+        self.pending = 0
+        self.added = 0
+        self.undated = 0
+        self.db = sqlite3.connect(file_path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS articles (id INTEGER PRIMARY KEY, "
+            "title TEXT, published REAL NOT NULL, biased INTEGER, added REAL, "
+            "record TEXT NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS articles_published ON articles (published)"
+        )
+
+    def add(self, data: dict, line: str = None) -> bool:
+        """Store an article, line being its JSON if already at hand. Articles
+        without an id or a publish time can't be in a view and are skipped."""
+        published = published_time(data)
+        if "id" not in data or published is None:
+            self.undated += 1
+            return False
+        self.db.execute(
+            "INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE "
+            "SET title = excluded.title, published = excluded.published, "
+            "biased = excluded.biased, added = excluded.added, "
+            "record = excluded.record WHERE excluded.biased >= articles.biased",
+            (
+                data["id"],
+                data.get("title"),
+                published,
+                int("bias" in data),
+                time.time(),
+                line or json.dumps(data),
+            ),
+        )
+        self.added += 1
+        self.pending += 1
+        if self.pending >= self.batch:
+            self.commit()
+        return True
+
+    def commit(self) -> None:
+        self.db.commit()
+        self.pending = 0
+
+    def window(self, days=DEFAULT_WINDOW_DAYS):
+        """JSON lines of the articles published in the last days, the first
+        one of each title, in id order. Articles without a title are all
+        kept: they aren't copies of each other."""
+        since = time.time() - days * 86400
+        self.commit()
+        cursor = self.db.execute(
+            "SELECT record FROM articles WHERE published >= ? AND (title IS NULL "
+            "OR id IN (SELECT MIN(id) FROM articles WHERE published >= ? "
+            "AND title IS NOT NULL GROUP BY title)) ORDER BY id",
+            (since, since),
+        )
+        for (record,) in cursor:
+            yield record
+
+    def expire(self) -> int:
+        cursor = self.db.execute(
+            "DELETE FROM articles WHERE published < ?",
+            (time.time() - self.keep_days * 86400,),
+        )
+        self.commit()
+        return cursor.rowcount
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self) -> None:
+        self.commit()
+        self.db.close()
@@ -0,0 +1,119 @@
+import time
+import sqlite3
+
+"""Per source model of recurring sentences (footers, bylines, newsletter plugs).
+
+Counts, per source, how many articles each normalized sentence has appeared in,
+across runs. Once a sentence reaches the threshold it is treated as boilerplate.
+Counts for a source are loaded into a dict the first time the source shows up,
+so every lookup after that is a hash hit."""
+
+DEFAULT_BOILERPLATE = "cache/boilerplate.db"
+DEFAULT_THRESHOLD = 3
+# Shorter sentences ("He said.") recur naturally, so they're never stripped.
+DEFAULT_MIN_CHARS = 20
+DEFAULT_TTL_DAYS = 30
+
+
+def normalize(sentence: str) -> str:
+    """Letters and digits only, like dedupe's alphanumeric() but unicode aware."""
+    return "".join(c for c in sentence if c.isalnum())
+
+
+class Boilerplate:
+    def __init__(
+        self,
+        file_path=DEFAULT_BOILERPLATE,
+        threshold=DEFAULT_THRESHOLD,
+        min_chars=DEFAULT_MIN_CHARS,
+        ttl_days=DEFAULT_TTL_DAYS,
+    ):
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.ttl = ttl_days * 86400
+        self.counts = {}  # source -> {key: articles seen in}
+        self.dirty = {}  # (source, key) -> articles seen in this run
+        self.db = sqlite3.connect(file_path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sentences ("
+            "source TEXT, key TEXT, count INTEGER, last_seen REAL, "
+            "PRIMARY KEY (source, key))"
+        )
+        # Articles already counted, so re-running a stage doesn't inflate counts.
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS articles (link TEXT PRIMARY KEY, last_seen REAL)"
+        )
+        self.db.commit()
+        self.counted = set()
+
+    def _counts(self, source: str) -> dict:
+        if source not in self.counts:
+            self.counts[source] = dict(
+                self.db.execute(
+                    "SELECT key, count FROM sentences WHERE source = ? AND last_seen > ?",
+                    (source, time.time() - self.ttl),
+                ).fetchall()
+            )
+        return self.counts[source]
+
+    def _first_time(self, link) -> bool:
+        if not link or link in self.counted:
+            return not link
+        self.counted.add(link)
+        row = self.db.execute(
+            "SELECT 1 FROM articles WHERE link = ?", (link,)
+        ).fetchone()
+        return row is None
+
+    def strip(self, source: str, sentences: list, link: str = None) -> tuple:
+        """Count this article's sentences and split them into (kept, dropped).
+        An article seen before (by link) is stripped but not counted again."""
+        counts = self._counts(source)
+        seen = set() if self._first_time(link) else None
+        kept = []
+        dropped = []
+        for sentence in sentences:
+            key = normalize(sentence)
+            if len(key) < self.min_chars:
+                kept.append(sentence)
+                continue
+            if seen is not None and key not in seen:
+                seen.add(key)
+                counts[key] = counts.get(key, 0) + 1
+                self.dirty[(source, key)] = self.dirty.get((source, key), 0) + 1
+            if counts.get(key, 0) >= self.threshold:
+                dropped.append(sentence)
+            else:
+                kept.append(sentence)
+        return kept, dropped
+
+    def boilerplate(self, source: str) -> set:
+        """Keys currently treated as boilerplate for source."""
+        return {
+            key for key, count in self._counts(source).items() if count >= self.threshold
+        }
+
+    def save(self) -> None:
+        """Add this run's counts (so overlapping runs don't clobber each other)
+        and drop sentences not seen for ttl."""
+        now = time.time()
+        self.db.executemany(
+            "INSERT INTO sentences VALUES (?, ?, ?, ?) ON CONFLICT (source, key) "
+            "DO UPDATE SET count = sentences.count + excluded.count, "
+            "last_seen = excluded.last_seen",
+            ((source, key, count, now) for (source, key), count in self.dirty.items()),
+        )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO articles VALUES (?, ?)",
+            ((link, now) for link in self.counted),
+        )
+        self.db.execute("DELETE FROM sentences WHERE last_seen <= ?", (now - self.ttl,))
+        self.db.execute("DELETE FROM articles WHERE last_seen <= ?", (now - self.ttl,))
+        self.db.commit()
+        self.dirty = {}
+        self.counted = set()
+
+    def close(self) -> None:
+        self.save()
+        self.db.close()
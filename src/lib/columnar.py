@@ -0,0 +1,212 @@
+"""Columnar Parquet copies of JSONL article files, for reading a few fields.
+
+Pulling the ids and titles out of cache/dedupe.jsonl means parsing every
+article's text and NER whole. A copy of the file as two Parquet tables makes it
+a column scan: foo.parquet with one row per article, nested fields flattened to
+dotted names (stats.bias, bias.degree) and the whole record as JSON in the
+record column, and foo_ner.parquet with one row per NER span and the id and
+sentence number it came from. read() only loads the columns it is asked for,
+and ids= skips the row groups that can't hold them. Needs pyarrow.
+
+    with ColumnarWriter("cache/dedupe.jsonl") as writer:
+        for data in records:
+            writer.add(data)
+    for row in read("cache/dedupe.parquet", ["id", "title"]):
+        ...
+"""
+
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+DEFAULT_ROW_GROUP = 1000
+
+if pa:
+    ARTICLES = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("lang", pa.string()),
+            ("source", pa.string()),
+            ("flavor", pa.string()),
+            ("title", pa.string()),
+            ("link", pa.string()),
+            ("published", pa.string()),
+            ("published_parsed", pa.list_(pa.int64())),
+            ("summary", pa.string()),
+            ("text", pa.string()),
+            ("stats.bias", pa.string()),
+            ("stats.bias_value", pa.string()),
+            ("stats.positive", pa.int64()),
+            ("stats.negative", pa.int64()),
+            ("stats.neutral", pa.int64()),
+            ("stats.total", pa.int64()),
+            ("bias.bias", pa.string()),
+            ("bias.degree", pa.string()),
+            ("bias.reason", pa.string()),
+            ("record", pa.string()),
+        ]
+    )
+    NER = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("sentence", pa.int32()),
+            ("tag", pa.string()),
+            ("text", pa.string()),
+            ("value", pa.string()),
+            ("start", pa.int64()),
+            ("end", pa.int64()),
+            ("score", pa.float64()),
+            ("sentiment", pa.string()),
+            ("probability", pa.float64()),
+        ]
+    )
+
+
+def require() -> None:
+    if pa is None:
+        raise ImportError("Columnar copies need pyarrow: pip install pyarrow")
+
+
+def parquet_paths(file_path: str) -> tuple:
+    """(articles, ner) Parquet file names for a JSONL file name."""
+    base = file_path[:-6] if file_path.endswith(".jsonl") else file_path
+    return f"{base}.parquet", f"{base}_ner.parquet"
+
+
+def field(data: dict, name: str):
+    """data's value for a dotted column name, None where it has none."""
+    for key in name.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def typed(value, type):
+    """value as the column type wants it; anything that doesn't fit is null."""
+    if value is None or value == "":
+        return None
+    if pa.types.is_string(type):
+        return value if isinstance(value, str) else json.dumps(value)
+    if pa.types.is_integer(type):
+        return value if isinstance(value, int) and not isinstance(value, bool) else None
+    if pa.types.is_floating(type):
+        # Flair's scores come as floats, or as strings from older files.
+        if isinstance(value, bool):
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if pa.types.is_list(type):
+        return value if isinstance(value, list) else None
+    return value
+
+
+def article_row(data: dict, line: str = None) -> dict:
+    row = {
+        col.name: typed(field(data, col.name), col.type)
+        for col in ARTICLES
+        if col.name != "record"
+    }
+    row["record"] = line or json.dumps(data)
+    return row
+
+
+def ner_rows(data: dict):
+    id = data.get("id")
+    for sentence, entry in enumerate(data.get("ner") or []):
+        if not isinstance(entry, dict):
+            continue
+        for span in entry.get("spans") or []:
+            row = {
+                col.name: typed(span.get(col.name), col.type)
+                for col in NER
+                if col.name not in ("id", "sentence", "tag")
+            }
+            row.update(id=id, sentence=sentence, tag=entry.get("tag"))
+            yield row
+
+
+class ColumnarWriter:
+    """Writes the Parquet copies of the JSONL file file_path, a row group at
+    a time."""
+
+    def __init__(self, file_path: str, row_group=DEFAULT_ROW_GROUP):
+        require()
+        self.file_path = file_path
+        self.row_group = row_group
+        articles, ner = parquet_paths(file_path)
+        self.articles = pq.ParquetWriter(articles, ARTICLES)
+        self.ner = pq.ParquetWriter(ner, NER)
+        self.rows = []
+        self.spans = []
+        self.count = 0
+
+    def add(self, data: dict, line: str = None) -> None:
+        if not isinstance(data, dict):
+            return
+        self.rows.append(article_row(data, line))
+        self.spans.extend(ner_rows(data))
+        self.count += 1
+        if len(self.rows) >= self.row_group:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.rows:
+            self.articles.write_table(
+                pa.Table.from_pylist(self.rows, schema=ARTICLES)
+            )
+            self.rows = []
+        if self.spans:
+            self.ner.write_table(pa.Table.from_pylist(self.spans, schema=NER))
+            self.spans = []
+
+    def close(self) -> None:
+        self.flush()
+        self.articles.close()
+        self.ner.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def convert(file_path: str, row_group=DEFAULT_ROW_GROUP) -> int:
+    """Write the Parquet copies of a JSONL file. Returns the records copied."""
+    with ColumnarWriter(file_path, row_group) as writer, open(file_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                writer.add(json.loads(line), line)
+            except json.JSONDecodeError:
+                continue
+        return writer.count
+
+
+def read_table(file_path: str, columns: list = None, ids=None):
+    """The columns of a Parquet copy as a pyarrow Table, only the rows of ids
+    if given."""
+    require()
+    if columns:
+        names = pq.read_schema(file_path).names
+        missing = [col for col in columns if col not in names]
+        if missing:
+            raise ValueError(f"No columns {', '.join(missing)} in {file_path}")
+    filters = [("id", "in", list(ids))] if ids is not None else None
+    return pq.read_table(file_path, columns=columns, filters=filters)
+
+
+def read(file_path: str, columns: list = None, ids=None):
+    """Rows of a Parquet copy as dicts of the columns asked for."""
+    table = read_table(file_path, columns, ids)
+    for batch in table.to_batches():
+        yield from batch.to_pylist()
@@ -0,0 +1,306 @@
+import sys
+import json
+import queue
+import asyncio
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+"""Run pipeline stages in one process, passing dicts instead of JSON lines.
+
+Each stage runs on its own thread and reads from a bounded queue, so a slow
+stage holds back the ones feeding it instead of letting records pile up, and
+I/O bound and CPU bound stages overlap. A stage is either a generator over the
+records it is given (one thread, can keep state, open its own SQLite files in
+it) or, with per_record, a function of one record run on a pool of workers
+threads with the input order kept. A stage reads the output of the stage
+before it unless it names another one, so one stage can feed several. A stage
+with a checkpoint also writes its output there as JSONL, the same file the
+Makefile's run targets write, so a run can be picked up from any of them.
+Its sinks, objects with add(record) and close() such as lib/columnar's
+ColumnarWriter, get every record it outputs as well. An asyncio stage reads
+its input through unblocked() and pushes its output with pushed(), so the
+blocking queues on either side never stall its event loop.
+Stages reading the same stage get the same dicts: copy one before changing it.
+A stage given a delta (lib/manifest) only sees the records it hasn't put out
+in an earlier finished run, and its run is logged there when it finishes.
+
+    pipeline = Pipeline([
+        Stage("read", read_feeds),
+        Stage("clean", clean, per_record=True, workers=4),
+        Stage("tag", tag, checkpoint="cache/tagged.jsonl"),
+    ])
+    pipeline.run(open("config/feeds.tsv"))
+"""
+
+DEFAULT_QUEUE_SIZE = 64
+# How often a blocked stage checks whether the run has been stopped.
+POLL_SECS = 0.5
+
+_END = object()
+
+
+class Stopped(Exception):
+    """Another stage failed and the run is being torn down."""
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        fn,
+        input=None,
+        per_record=False,
+        workers=1,
+        checkpoint=None,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        metrics=None,
+        delta=None,
+        sinks=(),
+    ):
+        """fn(records) -> records, or with per_record fn(record) -> a record,
+        a list of them or None to drop it. input is the name of the stage to
+        read from, the one before by default. metrics, a StageMetrics, gets
+        the records in and out and is closed when the stage finishes. delta,
+        a StageDelta, filters the input and is told whether the stage
+        finished cleanly. sinks get each record output and are closed at
+        the end."""
+        self.name = name
+        self.fn = fn
+        self.input = input
+        self.per_record = per_record
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self.delta = delta
+        self.sinks = list(sinks)
+        self.inbox = None
+        self.consumers = []
+        self.finished = threading.Event()
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+    def process(self, records):
+        if not self.per_record:
+            return self.fn(records)
+        return self.map(records)
+
+    def map(self, records):
+        if self.workers <= 1:
+            for record in records:
+                yield from _results(self.fn(record))
+            return
+        # Results come out in input order; a window of twice the workers keeps
+        # them busy without reading far ahead.
+        with ThreadPoolExecutor(self.workers) as executor:
+            pending = deque()
+            for record in records:
+                pending.append(executor.submit(self.fn, record))
+                while pending and (
+                    len(pending) >= self.workers * 2 or pending[0].done()
+                ):
+                    yield from _results(pending.popleft().result())
+            while pending:
+                yield from _results(pending.popleft().result())
+
+
+def _results(result):
+    if result is None:
+        return []
+    if isinstance(result, dict):
+        return [result]
+    return result
+
+
+class Pipeline:
+    def __init__(self, stages: list):
+        """stages in an order where each one comes after the stage it reads."""
+        self.stages = stages
+        self.by_name = {}
+        for i, stage in enumerate(stages):
+            if stage.name in self.by_name:
+                raise ValueError(f"Two stages named {stage.name}")
+            if i == 0:
+                if stage.input is not None:
+                    raise ValueError(f"First stage {stage.name} has no input")
+            else:
+                stage.input = stage.input or stages[i - 1].name
+                if stage.input not in self.by_name:
+                    raise ValueError(
+                        f"Stage {stage.name} reads {stage.input}, not an earlier stage"
+                    )
+                self.by_name[stage.input].consumers.append(stage)
+                stage.inbox = queue.Queue(stage.queue_size)
+            self.by_name[stage.name] = stage
+        self.stop = threading.Event()
+        self.errors = []
+
+    def run(self, source=()) -> None:
+        """Run every stage, the first one over source, until all are done.
+        Raises RuntimeError naming the stages that failed."""
+        threads = []
+        for stage in self.stages:
+            records = source if stage.inbox is None else self.received(stage)
+            thread = threading.Thread(
+                target=self.run_stage, args=(stage, records), name=stage.name
+            )
+            thread.start()
+            threads.append(thread)
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(POLL_SECS)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+            raise
+        if self.errors:
+            raise RuntimeError(
+                "Failed stages: " + ", ".join(name for name, _ in self.errors)
+            )
+
+    def received(self, stage: Stage):
+        """The records put in stage's inbox, until its input is done."""
+        while True:
+            try:
+                record = stage.inbox.get(timeout=POLL_SECS)
+            except queue.Empty:
+                if self.stop.is_set():
+                    raise Stopped()
+                continue
+            if record is _END:
+                return
+            yield record
+
+    def send(self, stage: Stage, record) -> None:
+        while not stage.finished.is_set():
+            try:
+                stage.inbox.put(record, timeout=POLL_SECS)
+                return
+            except queue.Full:
+                if self.stop.is_set():
+                    raise Stopped()
+
+    def run_stage(self, stage: Stage, records) -> None:
+        checkpoint = None
+        output = None
+        ok = False
+        metrics = stage.metrics
+        try:
+            if stage.checkpoint:
+                checkpoint = open(stage.checkpoint, "w")
+            if stage.delta:
+                records = stage.delta.records(records)
+            if metrics:
+                records = counted(records, metrics)
+            output = stage.process(records)
+            for record in output:
+                if metrics:
+                    metrics.out()
+                if stage.delta:
+                    stage.delta.out(record)
+                if checkpoint:
+                    checkpoint.write(json.dumps(record) + "\n")
+                for sink in stage.sinks:
+                    sink.add(record)
+                for consumer in stage.consumers:
+                    self.send(consumer, record)
+            ok = True
+        except Stopped:
+            pass
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            sys.stderr.write(f"Stage {stage.name} failed: {e}\n")
+            self.errors.append((stage.name, e))
+            self.stop.set()
+        finally:
+            stage.finished.set()
+            # A generator cut short cleans up here, on the thread that opened
+            # its files, not whenever it is garbage collected.
+            if hasattr(output, "close"):
+                output.close()
+            if checkpoint:
+                checkpoint.close()
+            for sink in stage.sinks:
+                sink.close()
+            if stage.delta:
+                stage.delta.finish(ok)
+            if metrics:
+                metrics.close()
+            for consumer in stage.consumers:
+                try:
+                    self.send(consumer, _END)
+                except Stopped:
+                    pass
+            # Anyone still blocked sending here has to be let go.
+            if stage.inbox is not None:
+                drain(stage.inbox)
+
+
+def pushed(fn, records, queue_size=DEFAULT_QUEUE_SIZE):
+    """Yield each record fn(records, emit) passes to emit, for stage logic
+    that pushes its results (an asyncio loop, say) instead of yielding them.
+    fn runs on a thread of its own. emit blocks while the queue is full; from
+    an event loop call it through asyncio.to_thread."""
+    results = queue.Queue(queue_size)
+    failed = []
+    closed = threading.Event()
+
+    def emit(record):
+        while not closed.is_set():
+            try:
+                results.put(record, timeout=POLL_SECS)
+                return
+            except queue.Full:
+                pass
+        # Nobody is reading any more: the run is being torn down.
+        raise Stopped()
+
+    def run():
+        try:
+            fn(records, emit)
+        except BaseException as e:
+            failed.append(e)
+        finally:
+            try:
+                emit(_END)
+            except Stopped:
+                pass
+
+    # A daemon, so a run torn down while fn is blocked can still exit.
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while (record := results.get()) is not _END:
+            yield record
+    finally:
+        closed.set()
+    thread.join()
+    if failed:
+        raise failed[0]
+
+
+async def unblocked(records):
+    """records as an async iterator, each next() run on a worker thread, so
+    an event loop reading a stage's inbox keeps going while it waits."""
+    records = iter(records)
+    while (record := await asyncio.to_thread(next, records, _END)) is not _END:
+        yield record
+
+
+def counted(records, metrics):
+    for record in records:
+        metrics.into()
+        yield record
+
+
+def drain(inbox: queue.Queue) -> None:
+    while True:
+        try:
+            inbox.get_nowait()
+        except queue.Empty:
+            return
@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import urllib.request
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+"""A pool of inference endpoints (Ollama servers) for one client.
+
+Each call goes to the healthy endpoint with the fewest requests outstanding.
+An endpoint that fails max_failures calls in a row is ejected for eject_secs,
+and only let back in once a health check passes. A call that fails for the
+endpoint's sake (connection, timeout, 5xx) is retried on another endpoint, so
+one box going down costs a retry, not the article. Errors in the request
+itself (bad request, context window exceeded) are raised at once: another
+server would refuse it too."""
+
+DEFAULT_OLLAMA = "http://localhost:11434"
+# Comma separated endpoints, e.g. "gpu1,gpu2:11434,http://gpu3:11434".
+OLLAMA_HOSTS_ENV = "OLLAMA_HOSTS"
+OLLAMA_PORT = 11434
+HEALTH_PATH = "/api/tags"
+DEFAULT_RETRIES = 2
+DEFAULT_MAX_FAILURES = 2
+DEFAULT_EJECT_SECS = 30
+HEALTH_TIMEOUT = 3
+# Error class names, anywhere in the MRO, that mean the server and not the
+# request is at fault: httpx, aiohttp, requests and litellm spell them these ways.
+RETRY_NAMES = (
+    "Timeout",
+    "ConnectError",
+    "ConnectionError",
+    "TransportError",
+    "ServerDisconnected",
+    "ServiceUnavailable",
+)
+
+
+def endpoint_url(host: str) -> str:
+    """http://host:11434 from "host", "host:port" or a full URL. Only bare
+    hosts and http URLs get the Ollama port; https keeps its default."""
+    host = host.strip().rstrip("/")
+    if "://" not in host:
+        host = f"http://{host}"
+    url = urlsplit(host)
+    if url.scheme == "http" and url.port is None:
+        host = host.replace(url.netloc, f"{url.netloc}:{OLLAMA_PORT}", 1)
+    return host
+
+
+def status_code(e: Exception):
+    """The HTTP status an error carries, if any."""
+    for owner in (e, getattr(e, "response", None)):
+        for name in ("status_code", "status"):
+            code = getattr(owner, name, None)
+            if isinstance(code, int):
+                return code
+    return None
+
+
+def retryable(e: Exception) -> bool:
+    """True if e is the endpoint's fault: a connection error, a timeout or a
+    5xx. Anything else is a problem with the request."""
+    if isinstance(e, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    code = status_code(e)
+    if code is not None and (code >= 500 or code == 408):
+        return True
+    names = [cls.__name__ for cls in type(e).__mro__]
+    if any(part in name for name in names for part in RETRY_NAMES):
+        return True
+    # urllib wraps a refused connection in URLError, an OSError.
+    return isinstance(e, OSError) and code is None
+
+
+def ollama_hosts(hosts=None) -> list:
+    """Endpoint URLs from a list or comma separated string, else $OLLAMA_HOSTS,
+    else the local server."""
+    hosts = hosts or os.environ.get(OLLAMA_HOSTS_ENV) or DEFAULT_OLLAMA
+    if isinstance(hosts, str):
+        hosts = hosts.split(",")
+    return [endpoint_url(host) for host in hosts if host.strip()]
+
+
+class Endpoint:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.calls = 0
+
+    def __repr__(self):
+        return f"Endpoint({self.url!r})"
+
+
+class EndpointPool:
+    def __init__(
+        self,
+        hosts=None,
+        retries=DEFAULT_RETRIES,
+        max_failures=DEFAULT_MAX_FAILURES,
+        eject_secs=DEFAULT_EJECT_SECS,
+        health_path=HEALTH_PATH,
+        retryable=retryable,
+    ):
+        self.endpoints = [Endpoint(url) for url in ollama_hosts(hosts)]
+        self.retries = retries
+        self.max_failures = max_failures
+        self.eject_secs = eject_secs
+        self.health_path = health_path
+        self.retryable = retryable
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def healthy(self, endpoint: Endpoint) -> bool:
+        try:
+            with urllib.request.urlopen(
+                endpoint.url + self.health_path, timeout=HEALTH_TIMEOUT
+            ) as response:
+                return response.status == 200
+        except Exception:
+            return False
+
+    def check(self) -> list:
+        """Health check every endpoint at once, ejecting the ones that fail.
+        Returns the healthy ones."""
+        with ThreadPoolExecutor(len(self.endpoints)) as pool:
+            results = list(pool.map(self.healthy, self.endpoints))
+        for endpoint, ok in zip(self.endpoints, results):
+            if not ok:
+                sys.stderr.write(f"Endpoint down: {endpoint.url}\n")
+                self.eject(endpoint)
+        return [endpoint for endpoint, ok in zip(self.endpoints, results) if ok]
+
+    def eject(self, endpoint: Endpoint) -> None:
+        with self.lock:
+            endpoint.ejected_until = time.monotonic() + self.eject_secs
+
+    def _candidates(self, tried) -> tuple:
+        """(endpoints in, ejected endpoints due for a health check)."""
+        now = time.monotonic()
+        live = [e for e in self.endpoints if e.ejected_until <= 0 and e not in tried]
+        due = [e for e in self.endpoints if 0 < e.ejected_until <= now and e not in tried]
+        return live, due
+
+    def _take(self, live: list, tried) -> Endpoint:
+        with self.lock:
+            if not live:
+                # Everything is out or already tried: the one back soonest.
+                live = [e for e in self.endpoints if e not in tried] or self.endpoints
+                live = [min(live, key=lambda e: e.ejected_until)]
+            # Ties go to the endpoint used least, so idle servers share the work.
+            endpoint = min(live, key=lambda e: (e.outstanding, e.calls))
+            endpoint.outstanding += 1
+            endpoint.calls += 1
+            return endpoint
+
+    def _readmit(self, endpoint: Endpoint, ok: bool) -> None:
+        with self.lock:
+            if ok:
+                sys.stderr.write(f"Endpoint back: {endpoint.url}\n")
+                endpoint.ejected_until = 0.0
+                endpoint.failures = 0
+            else:
+                endpoint.ejected_until = time.monotonic() + self.eject_secs
+
+    def select(self, tried=()) -> Endpoint:
+        """Reserve the least loaded endpoint not in tried; release() it after."""
+        live, due = self._candidates(tried)
+        for endpoint in due:
+            ok = self.healthy(endpoint)
+            self._readmit(endpoint, ok)
+            if ok:
+                live.append(endpoint)
+        return self._take(live, tried)
+
+    async def select_async(self, tried=()) -> Endpoint:
+        live, due = self._candidates(tried)
+        if due:
+            results = await asyncio.gather(
+                *(asyncio.to_thread(self.healthy, endpoint) for endpoint in due)
+            )
+            for endpoint, ok in zip(due, results):
+                self._readmit(endpoint, ok)
+                if ok:
+                    live.append(endpoint)
+        return self._take(live, tried)
+
+    def release(self, endpoint: Endpoint, ok: bool) -> None:
+        with self.lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.max_failures and not endpoint.ejected_until:
+                sys.stderr.write(
+                    f"Endpoint ejected for {self.eject_secs}s: {endpoint.url}\n"
+                )
+                endpoint.ejected_until = time.monotonic() + self.eject_secs
+
+    def call(self, fn):
+        """fn(url) on the best endpoint, retried on others if the endpoint fails."""
+        tried = []
+        for attempt in range(self.retries + 1):
+            endpoint = self.select(tried)
+            tried.append(endpoint)
+            try:
+                result = fn(endpoint.url)
+            except Exception as e:
+                if not self.retryable(e):
+                    # The endpoint answered; the request was at fault.
+                    self.release(endpoint, True)
+                    raise
+                self.release(endpoint, False)
+                if attempt == self.retries:
+                    raise
+                sys.stderr.write(f"Retrying after {endpoint.url}: {e}\n")
+                continue
+            self.release(endpoint, True)
+            return result
+
+    async def call_async(self, fn):
+        """await fn(url) on the best endpoint, retried on others if the endpoint
+        fails."""
+        tried = []
+        for attempt in range(self.retries + 1):
+            endpoint = await self.select_async(tried)
+            tried.append(endpoint)
+            try:
+                result = await fn(endpoint.url)
+            except Exception as e:
+                if not self.retryable(e):
+                    # The endpoint answered; the request was at fault.
+                    self.release(endpoint, True)
+                    raise
+                self.release(endpoint, False)
+                if attempt == self.retries:
+                    raise
+                sys.stderr.write(f"Retrying after {endpoint.url}: {e}\n")
+                continue
+            self.release(endpoint, True)
+            return result
+
+    def stats(self) -> str:
+        return ", ".join(f"{e.url} {e.calls}" for e in self.endpoints)
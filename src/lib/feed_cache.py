@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+"""Remember HTTP validators (ETag, Last-Modified) and a body hash per feed url so
+unchanged feeds can be skipped with a conditional GET."""
+
+DEFAULT_FEED_CACHE = "cache/feeds.json"
+
+
+class FeedCache:
+    def __init__(self, file_path=DEFAULT_FEED_CACHE):
+        self.file_path = file_path
+        self.lock = threading.Lock()
+        self.cache = self._load_cache()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_cache(self):
+        if os.path.exists(self.file_path):
+            try:
+                with open(self.file_path, "r") as f:
+                    return json.load(f)
+            except ValueError:
+                pass
+        return {}
+
+    def save(self):
+        """Write to a temp file and rename so a crash never leaves a torn cache."""
+        with self.lock:
+            tmp = f"{self.file_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.cache, f)
+            os.replace(tmp, self.file_path)
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def headers(self, url: str) -> dict:
+        """Conditional request headers for url, empty if we've never seen it."""
+        with self.lock:
+            entry = self.cache.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("modified"):
+            headers["If-Modified-Since"] = entry["modified"]
+        return headers
+
+    def not_modified(self, url: str) -> None:
+        """Record a 304."""
+        with self.lock:
+            self.hits += 1
+            if url in self.cache:
+                self.cache[url]["checked"] = time.time()
+
+    def changed(self, url: str, data: bytes, etag=None, modified=None) -> bool:
+        """Store new validators for url. True if the body differs from last time."""
+        digest = self.digest(data)
+        with self.lock:
+            prev = self.cache.get(url, {})
+            self.cache[url] = {
+                "etag": etag,
+                "modified": modified,
+                "hash": digest,
+                "checked": time.time(),
+            }
+            if prev.get("hash") == digest:
+                self.hits += 1
+                return False
+            self.misses += 1
+            return True
@@ -0,0 +1,44 @@
+import os
+import json
+import urllib.request
+
+"""Client for flair_server.py with the same process_text / process_texts
+interface as FlairSentiment, so a stage can skip loading the models."""
+
+DEFAULT_TIMEOUT = 600
+
+
+class FlairClient:
+    def __init__(self, url: str, timeout=DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: dict) -> dict:
+        req = urllib.request.Request(
+            f"{self.url}{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def process_text(self, text: str) -> tuple:
+        data = self._post("/process_text", {"text": text})
+        return data["ner"], data["stats"]
+
+    def process_texts(self, texts: list) -> list:
+        if not texts:
+            return []
+        data = self._post("/process_texts", {"texts": texts})
+        return [tuple(result) for result in data["results"]]
+
+
+def flair_tagger(server: str = None, *args, **kwargs):
+    """FlairClient if a server url is given or FLAIR_SERVER is set, otherwise
+    load the models here. args and kwargs go to FlairSentiment."""
+    server = server or os.environ.get("FLAIR_SERVER")
+    if server:
+        return FlairClient(server)
+    from lib.flair_sentiment import FlairSentiment
+
+    return FlairSentiment(*args, **kwargs)
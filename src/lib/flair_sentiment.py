@@ -3,75 +3,188 @@ from flair.splitter import SegtokSentenceSplitter
 from NewsSentiment import TargetSentimentClassifier
 import sys
 from json import dumps
+from lib.result_cache import digest
+from lib.ner_cache import MODEL_VERSION
+
+# Sentences per flair predict() batch and NER targets per NewsSentiment batch.
+MINI_BATCH_SIZE = 32
+TSC_BATCH_SIZE = 64
 
 
 class FlairSentiment:
     # NER_TAGGER = "flair/ner-english-large"
     NER_TAGGER = "ner-ontonotes-large"
 
-    def __init__(self):
+    def __init__(
+        self,
+        mini_batch_size=MINI_BATCH_SIZE,
+        tsc_batch_size=TSC_BATCH_SIZE,
+        sentence_cache=None,
+    ):
+        """sentence_cache is an optional ResultCache of per sentence output."""
         self.sentiment_tagger = Classifier.load("sentiment")
         self.ner_tagger = Classifier.load(self.NER_TAGGER)
         self.splitter = SegtokSentenceSplitter()
         self.tsc = TargetSentimentClassifier()
+        self.mini_batch_size = mini_batch_size
+        self.tsc_batch_size = tsc_batch_size
+        self.sentence_cache = sentence_cache
 
     #        self.linker = Classifier.load("linker")
 
     def process_text(self, text: str) -> list:
-        sentences = self.splitter.split(text)
-        self.sentiment_tagger.predict(sentences)
-        self.ner_tagger.predict(sentences)
+        return self.process_texts([text])[0]
+
+    def process_texts(self, texts: list) -> list:
+        """Tag many texts at once. Sentences from all texts go through the
+        sentiment and NER models together, and every NER span goes to the
+        target sentiment model in batches. Returns (ner, stats) per text.
+
+        With a sentence cache only sentences not seen before are tagged, and
+        each distinct one only once per call, so repeated boilerplate is free."""
+        docs = [self.splitter.split(text) for text in texts]
+        sentences = [sentence for doc in docs for sentence in doc if sentence]
+        done = {}
+        alias = {}
+        todo = sentences
+        keys = {}
+        if self.sentence_cache is not None:
+            keys = {id(s): self.sentence_key(s.to_plain_string()) for s in sentences}
+            found = self.sentence_cache.get_many(
+                list({key for key in keys.values() if key})
+            )
+            todo = []
+            first = {}
+            for sentence in sentences:
+                key = keys[id(sentence)]
+                if key in found:
+                    done[id(sentence)] = found[key]
+                elif key and key in first:
+                    alias[id(sentence)] = first[key]
+                else:
+                    first[key] = id(sentence)
+                    todo.append(sentence)
+        if todo:
+            self.sentiment_tagger.predict(todo, mini_batch_size=self.mini_batch_size)
+            self.ner_tagger.predict(todo, mini_batch_size=self.mini_batch_size)
         #        self.linker.predict(sentences)
+        tagged = self.target_sentiments(todo)
+        fresh = {}
+        for sentence in todo:
+            entry = tagged[id(sentence)]
+            if not isinstance(entry, Exception):
+                entry = self.sentence_output(sentence, *entry)
+                if keys.get(id(sentence)):
+                    fresh[keys[id(sentence)]] = entry
+            done[id(sentence)] = entry
+        for key, rep in alias.items():
+            done[key] = done[rep]
+        if fresh:
+            self.sentence_cache.put_many(fresh)
+        return [self.summarize(doc, done) for doc in docs]
+
+    @staticmethod
+    def sentence_key(sent: str):
+        """Cache key for a sentence: letters and digits only, in the spirit of
+        dedupe's alphanumeric(), but unicode aware. None if nothing is left."""
+        norm = "".join(c for c in sent if c.isalnum())
+        return digest(MODEL_VERSION, "sentence", norm) if norm else None
+
+    def target_sentiments(self, sentences: list) -> dict:
+        """Run target sentiment on every NER span of every sentence, batched.
+        Returns {id(sentence): (plain text, [(span, sentiment), ...]) or exception}."""
+        tagged = {}
+        jobs = []
+        for sentence in sentences:
+            sent = sentence.to_plain_string()
+            spans = sentence.get_spans("ner")
+            tagged[id(sentence)] = (sent, [])
+            for span in spans:
+                l = sent[: span.start_position]
+                m = sent[span.start_position : span.end_position]
+                r = sent[span.end_position :]
+                jobs.append((id(sentence), span, (l, m, r)))
 
+        for i in range(0, len(jobs), self.tsc_batch_size):
+            batch = jobs[i : i + self.tsc_batch_size]
+            try:
+                # infer() defaults to batch_size=1: pass ours or it goes one by one.
+                results = self.tsc.infer(
+                    targets=[target for _, _, target in batch],
+                    batch_size=self.tsc_batch_size,
+                    disable_tqdm=True,
+                )
+            except Exception:
+                # One bad target sinks the whole batch, so redo it one by one.
+                results = []
+                for key, _, target in batch:
+                    try:
+                        results.append(self.tsc.infer_from_text(*target))
+                    except Exception as e:
+                        results.append(e)
+            for (key, span, _), sentiment in zip(batch, results):
+                entry = tagged[key]
+                if isinstance(entry, Exception):
+                    continue
+                if isinstance(sentiment, Exception):
+                    tagged[key] = sentiment
+                else:
+                    entry[1].append((span, sentiment))
+        return tagged
+
+    @staticmethod
+    def sentence_output(sentence, sent: str, targets: list) -> dict:
+        spans = []
+        for span, sentiment in targets:
+            # Skip unkown labels, only consider known labels as they cause blank nodes
+            for label in span.labels:
+                if label.value == "<unk>":
+                    continue
+                val = label.value
+                spans.append(
+                    {
+                        "text": span.text,
+                        "start": span.start_position,
+                        "end": span.end_position,
+                        "value": val,
+                        "score": f"{label.score:.2f}",
+                        "sentiment": sentiment[0]["class_label"],
+                        "probability": f"{sentiment[0]['class_prob']:.2f}",
+                    }
+                )
+        return {
+            "sentence": sent,
+            "tag": sentence.tag.lower(),
+            "score": f"{sentence.score:.2f}",
+            "spans": spans,
+        }
+
+    def summarize(self, sentences: list, done: dict) -> tuple:
         stats = {
             "positive": 0,
             "negative": 0,
             "neutral": 0,
         }
-       #        for sentence in sentences:
+        #        for sentence in sentences:
 
         output = []
         for sentence in sentences:
             if sentence:
-                try:
-                    spans = []
-                    sent = sentence.to_plain_string()
-                    for span in sentence.get_spans("ner"):
-                        l = sent[: span.start_position]
-                        m = sent[span.start_position : span.end_position]
-                        r = sent[span.end_position :]
-                        sentiment = self.tsc.infer_from_text(l, m, r)
-                        # Skip unkown labels, only consider known labels as they cause blank nodes
-                        for label in span.labels:
-                            if label.value == "<unk>":
-                                continue
-                            val = label.value
-                            stats[sentiment[0]["class_label"]] += 1
-                            spans.append(
-                                {
-                                    "text": span.text,
-                                    "start": span.start_position,
-                                    "end": span.end_position,
-                                    "value": val,
-                                    "score": f"{label.score:.2f}",
-                                    "sentiment": sentiment[0]["class_label"],
-                                    "probability": f"{sentiment[0]['class_prob']:.2f}",
-                                }
-                            )
-
-        
-                    output.append(
-                        {
-                            "sentence": sent,
-                            "tag": sentence.tag.lower(),
-                            "score": f"{sentence.score:.2f}",
-                            "spans": spans,
-                        }
+                entry = done[id(sentence)]
+                if isinstance(entry, Exception):
+                    sys.stderr.write(
+                        f"{entry}\nSentiment targetting failure:\n{sentence}"
                     )
-                except Exception as e:
-                    sys.stderr.write(f"{e}\nSentiment targetting failure:\n{sentence}")
                     # raise ValueError(f"{e}\nsent:\n{sentence}")
+                    continue
+                for span in entry["spans"]:
+                    stats[span["sentiment"]] += 1
+                output.append(entry)
 
+        return output, self.bias(stats)
+
+    @staticmethod
+    def bias(stats: dict) -> dict:
         posneg = stats["negative"] + stats["positive"]
         tot = posneg + stats["neutral"]
         bias_dir = "neutral"
@@ -85,16 +198,15 @@ class FlairSentiment:
                 if stats["negative"] - stats["positive"] > 0:
                     bias_dir = "negative"
         #            print(f"{dir(stats)}", file=sys.stderr)
-        # output.append({"bias": bias_dir, "pos": stats["positive"], "neg": stats["negative"], "neut": stats["neutral"], "tot": tot})   
-        stats = {
+        # output.append({"bias": bias_dir, "pos": stats["positive"], "neg": stats["negative"], "neut": stats["neutral"], "tot": tot})
+        return {
             "bias": bias_dir,
             "positive": stats["positive"],
             "negative": stats["negative"],
             "neutral": stats["neutral"],
             "total": tot,
             "bias_value": f"{bias:.2f}",
-        }            
-        return output, stats
+        }
 
 
 if __name__ == "__main__":
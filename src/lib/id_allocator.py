@@ -0,0 +1,91 @@
+import os
+import json
+import sqlite3
+
+"""Hand out unique, monotonically increasing ids, safe across processes.
+
+Ids are reserved from a SQLite sequence in blocks under a write lock, so
+parallel workers never see the same id and a crash can only leave a gap,
+never a reused id. Whatever is left of the last block is given back on close
+if nobody else has reserved past it."""
+
+DEFAULT_BLOCK = 100
+
+
+class IdAllocator:
+    def __init__(self, file_path, block=DEFAULT_BLOCK, legacy_json=None):
+        self.file_path = file_path
+        self.block = block
+        self.db = sqlite3.connect(file_path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sequence (name TEXT PRIMARY KEY, next INTEGER NOT NULL)"
+        )
+        self._init_sequence(legacy_json)
+        self.current = 0
+        self.limit = 0
+
+    def _init_sequence(self, legacy_json):
+        """Seed the sequence, from an old counter.json if there is one."""
+        start = 0
+        if legacy_json and os.path.exists(legacy_json):
+            try:
+                with open(legacy_json, "r") as f:
+                    start = json.loads(f.read())["id"]
+            except (ValueError, KeyError):
+                pass
+        self.db.execute("BEGIN IMMEDIATE")
+        cur = self.db.execute(
+            "INSERT OR IGNORE INTO sequence VALUES ('id', ?)", (start,)
+        )
+        self.db.execute("COMMIT")
+        if cur.rowcount and legacy_json and os.path.exists(legacy_json):
+            os.replace(legacy_json, f"{legacy_json}.imported")
+
+    def _reserve(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            (start,) = self.db.execute(
+                "SELECT next FROM sequence WHERE name = 'id'"
+            ).fetchone()
+            self.db.execute(
+                "UPDATE sequence SET next = ? WHERE name = 'id'",
+                (start + self.block,),
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.current = start
+        self.limit = start + self.block
+
+    def next(self) -> int:
+        if self.current >= self.limit:
+            self._reserve()
+        id = self.current
+        self.current += 1
+        return id
+
+    def peek(self) -> int:
+        """Next id that would be handed out without reserving anything."""
+        if self.current < self.limit:
+            return self.current
+        return self.db.execute("SELECT next FROM sequence WHERE name = 'id'").fetchone()[
+            0
+        ]
+
+    def close(self):
+        """Return the unused tail of our block if it is still the newest one."""
+        if self.current < self.limit:
+            self.db.execute(
+                "UPDATE sequence SET next = ? WHERE name = 'id' AND next = ?",
+                (self.current, self.limit),
+            )
+        self.current = self.limit = 0
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
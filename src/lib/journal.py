@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+
+"""Append only JSONL journal of finished records, so a long stage can pick up
+where it died. Every append is flushed to the OS, which survives the process
+dying; fsync runs every sync_every records, so a machine crash loses at most
+that many."""
+
+DEFAULT_SYNC_EVERY = 10
+
+
+class Journal:
+    def __init__(self, file_path, resume=False, sync_every=DEFAULT_SYNC_EVERY):
+        """A fresh journal unless resume, then the records already in it are
+        loaded into done, keyed by id."""
+        self.file_path = file_path
+        self.sync_every = sync_every
+        self.unsynced = 0
+        self.done = {}
+        if os.path.dirname(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if resume and os.path.exists(file_path):
+            self.done = self.load(file_path)
+        self.file = open(file_path, "a" if resume else "w")
+        if resume and self.file.tell() and not self.ends_with_newline(file_path):
+            # Start after a line cut short, not glued onto it.
+            self.file.write("\n")
+
+    @staticmethod
+    def ends_with_newline(file_path) -> bool:
+        with open(file_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @staticmethod
+    def load(file_path) -> dict:
+        done = {}
+        with open(file_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line of a journal that died mid write.
+                    sys.stderr.write(f"Journal: skipping partial line in {file_path}\n")
+                    continue
+                if "id" in record:
+                    done[str(record["id"])] = record
+        return done
+
+    def finished(self, record):
+        """The journaled copy of record if it is already done, else None."""
+        if "id" not in record:
+            return None
+        return self.done.get(str(record["id"]))
+
+    def append(self, record) -> None:
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def close(self) -> None:
+        self.sync()
+        self.file.close()
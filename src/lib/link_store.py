@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+
+"""Link -> id store with a TTL, backed by SQLite.
+
+Drop in for FileCache where the cache is large and written once per new key:
+lookups hit an index instead of a dict loaded from JSON, and puts are batched
+into transactions instead of rewriting the whole file each time."""
+
+DEFAULT_TTL_HOURS = 72
+DEFAULT_BATCH = 500
+
+
+class LinkStore:
+    def __init__(
+        self,
+        file_path,
+        default_ttl_hours=DEFAULT_TTL_HOURS,
+        batch=DEFAULT_BATCH,
+        legacy_json=None,
+    ):
+        self.file_path = file_path
+        self.default_ttl_hours = default_ttl_hours
+        self.batch = batch
+        self.pending = 0
+        self.db = sqlite3.connect(file_path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            "link TEXT PRIMARY KEY, value, expiration REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS links_expiration ON links (expiration)"
+        )
+        if legacy_json:
+            self._import_json(legacy_json)
+        self.compact()
+
+    def _import_json(self, json_path):
+        """One time import of a FileCache JSON file, renamed aside once loaded."""
+        if not os.path.exists(json_path):
+            return
+        with open(json_path, "r") as f:
+            cache = json.load(f)
+        self.db.executemany(
+            "INSERT OR IGNORE INTO links VALUES (?, ?, ?)",
+            ((k, v["value"], v["expiration"]) for k, v in cache.items()),
+        )
+        self.db.commit()
+        os.replace(json_path, f"{json_path}.imported")
+
+    def put(self, key, value, ttl_hours=None):
+        if ttl_hours is None:
+            ttl_hours = self.default_ttl_hours
+        expiration = time.time() + (ttl_hours * 3600)
+        self.db.execute(
+            "INSERT OR REPLACE INTO links VALUES (?, ?, ?)", (key, value, expiration)
+        )
+        self.pending += 1
+        if self.pending >= self.batch:
+            self.commit()
+
+    def claim(self, key, value, ttl_hours=None) -> bool:
+        """Put key only if it is absent or expired. False if another run has it.
+        Committed straight away so concurrent processes see the claim."""
+        return key in self.claim_many([(key, value)], ttl_hours)
+
+    def claim_many(self, items, ttl_hours=None) -> set:
+        """claim() each (key, value) of items in one write transaction, the
+        same BEGIN IMMEDIATE IdAllocator takes. Returns the keys claimed."""
+        if ttl_hours is None:
+            ttl_hours = self.default_ttl_hours
+        now = time.time()
+        expiration = now + ttl_hours * 3600
+        claimed = set()
+        self.commit()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for key, value in items:
+                cur = self.db.execute(
+                    "INSERT INTO links VALUES (?, ?, ?) ON CONFLICT (link) DO UPDATE "
+                    "SET value = excluded.value, expiration = excluded.expiration "
+                    "WHERE links.expiration <= ?",
+                    (key, value, expiration, now),
+                )
+                if cur.rowcount > 0:
+                    claimed.add(key)
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return claimed
+
+    def cached(self, key):
+        row = self.db.execute(
+            "SELECT 1 FROM links WHERE link = ? AND expiration > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def get(self, key):
+        row = self.db.execute(
+            "SELECT value FROM links WHERE link = ? AND expiration > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def flush(self, key=None):
+        if key:
+            self.db.execute("DELETE FROM links WHERE link = ?", (key,))
+            self.commit()
+        else:
+            self.compact()
+
+    def compact(self):
+        """Drop expired links."""
+        self.db.execute("DELETE FROM links WHERE expiration <= ?", (time.time(),))
+        self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
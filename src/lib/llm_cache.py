@@ -0,0 +1,69 @@
+from lib.result_cache import ResultCache, digest
+
+"""Disk cache of LLM responses, shared by litellm_ai.py, gemtest.py,
+summ_ids.py and nerd.py. A response is keyed by model, prompt and input, so a
+rerun only pays for new articles and editing a prompt file starts fresh. Callers
+store only answers they could use, so a malformed or cut off one is asked for
+again next run instead of coming back from the cache for the whole TTL."""
+
+DEFAULT_LLM_CACHE = "cache/llm.db"
+DEFAULT_TTL_HOURS = 24 * 30
+DEFAULT_MAX_MB = 512
+
+
+class LLMCache(ResultCache):
+    def __init__(
+        self, file_path=DEFAULT_LLM_CACHE, ttl_hours=DEFAULT_TTL_HOURS, max_mb=DEFAULT_MAX_MB
+    ):
+        super().__init__(file_path, ttl_hours, max_mb)
+
+    @staticmethod
+    def key(model: str, prompt: str, text: str) -> str:
+        """The prompt and input are hashed separately, so one prompt file's
+        hash covers every article sent with it."""
+        return digest("llm", model, digest(prompt), digest(text))
+
+    def response(self, model: str, prompt: str, text: str):
+        """Cached response text, or None."""
+        return self.get(self.key(model, prompt, text))
+
+    def store(self, model: str, prompt: str, text: str, response: str) -> None:
+        self.put(self.key(model, prompt, text), response)
+
+    def forget(self, model: str, prompt: str, text: str) -> None:
+        """Drop a cached response that turned out to be unusable."""
+        self.delete(self.key(model, prompt, text))
+
+
+def add_cache_args(ap) -> None:
+    """The cache options every LLM script takes."""
+    ap.add_argument(
+        "--llm-cache",
+        default=DEFAULT_LLM_CACHE,
+        help=f"LLM response cache (default {DEFAULT_LLM_CACHE})",
+    )
+    ap.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_HOURS,
+        help=f"Hours a cached response stays valid (default {DEFAULT_TTL_HOURS})",
+    )
+    ap.add_argument(
+        "--cache-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        help=f"Evict least recently used responses past this size (default {DEFAULT_MAX_MB})",
+    )
+    ap.add_argument(
+        "-n",
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the LLM response cache",
+    )
+
+
+def open_cache(args):
+    """LLMCache from parsed add_cache_args options, None with --no-cache."""
+    if args.no_cache:
+        return None
+    return LLMCache(args.llm_cache, args.cache_ttl, args.cache_mb)
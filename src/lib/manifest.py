@@ -0,0 +1,151 @@
+import time
+import sqlite3
+import threading
+
+"""Run manifest: what each pipeline stage has already processed, in SQLite.
+
+A stage's progress is the set of article ids it has taken in and put out again
+during a run that finished. A later run of the stage skips those records:
+replaying a checkpoint after a crash, or feeding a file that holds earlier
+runs' articles, costs only the new ones. Ids come in blocks handed to runs in
+parallel (lib/id_allocator), so they are kept as a set, not a high-water mark.
+A record the stage took in but dropped, an article that failed, isn't in the
+set and is tried again next time; so is everything from a run that died part
+way. Each stage run is also logged with its record counts, id range and
+output file."""
+
+DEFAULT_MANIFEST = "cache/manifest.db"
+# Processed ids are forgotten after this long, like the articles in the store.
+DEFAULT_KEEP_DAYS = 30
+
+
+class RunManifest:
+    def __init__(self, file_path=DEFAULT_MANIFEST, keep_days=DEFAULT_KEEP_DAYS):
+        self.file_path = file_path
+        # Stages finish on their own threads.
+        self.db = sqlite3.connect(file_path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS processed (stage TEXT, id INTEGER, "
+            "updated REAL, PRIMARY KEY (stage, id)) WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT, stage TEXT, started REAL, finished REAL, ok INTEGER, "
+            "records_in INTEGER, skipped INTEGER, first_id INTEGER, "
+            "last_id INTEGER, output TEXT)"
+        )
+        self.db.execute(
+            "DELETE FROM processed WHERE updated < ?",
+            (time.time() - keep_days * 86400,),
+        )
+        self.db.commit()
+
+    def processed(self, stage: str) -> set:
+        """The ids stage has put out in runs that finished."""
+        with self.lock:
+            cursor = self.db.execute(
+                "SELECT id FROM processed WHERE stage = ?", (stage,)
+            )
+            return {id for (id,) in cursor}
+
+    def record(self, run_id: str, stage: str, delta, ok: bool, output=None) -> None:
+        """Log a stage run and, if it finished cleanly, add the ids it put out
+        to the stage's processed set."""
+        with self.lock:
+            self._record(run_id, stage, delta, ok, output, time.time())
+
+    def _record(self, run_id, stage, delta, ok, output, now) -> None:
+        self.db.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                stage,
+                delta.started,
+                now,
+                int(ok),
+                delta.records_in,
+                delta.skipped,
+                delta.first_id,
+                delta.last_id,
+                output,
+            ),
+        )
+        if ok:
+            self.db.executemany(
+                "INSERT INTO processed VALUES (?, ?, ?) ON CONFLICT(stage, id) "
+                "DO UPDATE SET updated = excluded.updated",
+                ((stage, id, now) for id in delta.done),
+            )
+        self.db.commit()
+
+    def runs(self, stage: str = None, limit=20) -> list:
+        """The latest stage runs, newest first, as dicts."""
+        sql = "SELECT * FROM runs"
+        params = ()
+        if stage:
+            sql += " WHERE stage = ?"
+            params = (stage,)
+        sql += " ORDER BY finished DESC LIMIT ?"
+        cursor = self.db.execute(sql, (*params, limit))
+        names = [col[0] for col in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def delta(self, stage: str, run_id: str, output=None) -> "StageDelta":
+        return StageDelta(self, stage, run_id, output)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class StageDelta:
+    """One run of one stage: filters its input down to the records the stage
+    hasn't processed before, notes which of them it puts out, and logs the run
+    when it is done."""
+
+    def __init__(self, manifest: RunManifest, stage: str, run_id: str, output=None):
+        self.manifest = manifest
+        self.stage = stage
+        self.run_id = run_id
+        self.output = output
+        # Empty it to process everything given.
+        self.seen = manifest.processed(stage)
+        self.started = time.time()
+        self.records_in = 0
+        self.skipped = 0
+        self.first_id = None
+        self.last_id = None
+        self.taken = set()
+        self.done = set()
+
+    def new(self, data) -> bool:
+        """Whether data wasn't processed before, counting it in if so. Records
+        without an id are always new."""
+        id = data.get("id") if isinstance(data, dict) else None
+        if isinstance(id, int):
+            if id in self.seen:
+                self.skipped += 1
+                return False
+            self.taken.add(id)
+            if self.first_id is None or id < self.first_id:
+                self.first_id = id
+            if self.last_id is None or id > self.last_id:
+                self.last_id = id
+        self.records_in += 1
+        return True
+
+    def records(self, records):
+        """The records that are new()."""
+        for data in records:
+            if self.new(data):
+                yield data
+
+    def out(self, data) -> None:
+        """data made it through the stage: processed, once the run finishes."""
+        id = data.get("id") if isinstance(data, dict) else None
+        if id in self.taken:
+            self.done.add(id)
+
+    def finish(self, ok: bool) -> None:
+        self.manifest.record(self.run_id, self.stage, self, ok, self.output)
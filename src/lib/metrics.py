@@ -0,0 +1,156 @@
+import os
+import sys
+import math
+import json
+import time
+import atexit
+import resource
+from contextlib import contextmanager
+
+"""Per stage run metrics, appended as one JSON line per stage run.
+
+A stage counts records and bytes in and out, times each record, and names the
+caches it used; wall and CPU time (its own and its worker processes') are taken
+when it finishes. Every line carries the run id from $RUN_ID, which the
+Makefile sets once per make invocation, so the stages of one allruns can be
+grouped by src/metrics_report.py.
+
+    metrics = StageMetrics("boilerplate")
+    for line in metrics.lines(sys.stdin):
+        with metrics.timed():
+            ...
+        metrics.out(output_line)
+    metrics.cache("sentences", hits, misses)
+    metrics.close()
+"""
+
+DEFAULT_METRICS = "cache/metrics.jsonl"
+METRICS_ENV = "METRICS_FILE"
+RUN_ID_ENV = "RUN_ID"
+
+
+def run_id() -> str:
+    """$RUN_ID, or one made up for a stage run by hand."""
+    return os.environ.get(RUN_ID_ENV) or time.strftime("%Y%m%d-%H%M%S-") + str(os.getpid())
+
+
+def percentile(values: list, pct: float):
+    """Nearest rank percentile of values, None when empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))
+    return values[rank]
+
+
+def _size(item) -> int:
+    if isinstance(item, bytes):
+        return len(item)
+    return len(item.encode("utf-8")) if isinstance(item, str) else 0
+
+
+class StageMetrics:
+    def __init__(self, stage: str, file_path=None):
+        self.stage = stage
+        self.file_path = file_path or os.environ.get(METRICS_ENV) or DEFAULT_METRICS
+        self.run_id = run_id()
+        self.started = time.time()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.children_start = self._children_cpu()
+        self.records_in = 0
+        self.records_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latencies = []
+        self.caches = {}  # name -> (hits, misses) or an object with hits/misses
+        self.notes = {}
+        self.closed = False
+        # Stages that exit early (sys.exit, an exception) still get a line.
+        atexit.register(self.close)
+
+    @staticmethod
+    def _children_cpu() -> float:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    def into(self, item=None, count: int = 1) -> None:
+        self.records_in += count
+        self.bytes_in += _size(item)
+
+    def out(self, item=None, count: int = 1) -> None:
+        self.records_out += count
+        self.bytes_out += _size(item)
+
+    def lines(self, stream):
+        """The lines of stream, counted in."""
+        for line in stream:
+            self.into(line)
+            yield line
+
+    def latency(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+
+    @contextmanager
+    def timed(self):
+        """Time the block as one record's latency."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def cache(self, name: str, hits: int, misses: int) -> None:
+        """Hit and miss counts for a named cache."""
+        self.caches[name] = (hits, misses)
+
+    def track(self, name: str, cache) -> None:
+        """A cache that counts .hits and .misses, read when the stage finishes."""
+        self.caches[name] = cache
+
+    def note(self, key: str, value) -> None:
+        self.notes[key] = value
+
+    def summary(self) -> dict:
+        caches = {}
+        for name, counts in self.caches.items():
+            hits, misses = counts if isinstance(counts, tuple) else (counts.hits, counts.misses)
+            total = (hits or 0) + (misses or 0)
+            caches[name] = {
+                "hits": hits or 0,
+                "misses": misses or 0,
+                "hit_rate": round(hits / total, 4) if total else None,
+            }
+        p50 = percentile(self.latencies, 50)
+        p95 = percentile(self.latencies, 95)
+        return {
+            "run_id": self.run_id,
+            "stage": self.stage,
+            "started": self.started,
+            "wall": round(time.perf_counter() - self.wall_start, 3),
+            "cpu": round(time.process_time() - self.cpu_start, 3),
+            "cpu_children": round(self._children_cpu() - self.children_start, 3),
+            "records_in": self.records_in,
+            "records_out": self.records_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "timed": len(self.latencies),
+            "p50": round(p50, 4) if p50 is not None else None,
+            "p95": round(p95, 4) if p95 is not None else None,
+            "caches": caches,
+            **self.notes,
+        }
+
+    def close(self) -> None:
+        """Append this stage's line to the metrics file. Only the first call writes."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if os.path.dirname(self.file_path):
+                os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            # One write of one line, so stages finishing together don't interleave.
+            with open(self.file_path, "a") as f:
+                f.write(json.dumps(self.summary()) + "\n")
+        except Exception as e:
+            sys.stderr.write(f"Metrics: {e}\n")
@@ -0,0 +1,162 @@
+import re
+import time
+import sqlite3
+import hashlib
+import random
+from array import array
+
+"""MinHash signatures and a persistent LSH index for near duplicate articles.
+
+Text is cut into word shingles, each shingle hashed to 64 bits, and the
+signature is the minimum of NUM_PERM universal hashes over the shingles. The
+signature is split into BANDS bands; articles sharing any band are candidates
+and are confirmed by the fraction of matching signature slots, which estimates
+their Jaccard similarity. Articles dropped as duplicates are recorded with the
+id of the article they copy, so a cluster can still be listed after the
+copies are gone."""
+
+DEFAULT_NEAR_DUPES = "cache/near_dupes.db"
+NUM_PERM = 128
+BANDS = 16  # 8 rows per band, candidates from roughly 0.7 Jaccard up
+SHINGLE = 5
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_TTL_DAYS = 7
+
+PRIME = (1 << 61) - 1
+MASK = (1 << 64) - 1
+WORDS = re.compile(r"\w+")
+# Fixed seed: signatures are stored and compared across runs.
+_rng = random.Random(1)
+PERMS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text: str, size: int = SHINGLE) -> set:
+    words = WORDS.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def signature(text: str) -> array:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in shingles(text)
+    ]
+    if not hashes:
+        return array("Q", [MASK] * NUM_PERM)
+    return array("Q", [min((a * h + b) % PRIME for h in hashes) for a, b in PERMS])
+
+
+def similarity(sig1: array, sig2: array) -> float:
+    return sum(x == y for x, y in zip(sig1, sig2)) / NUM_PERM
+
+
+def bands(sig: array) -> list:
+    rows = NUM_PERM // BANDS
+    return [
+        hashlib.blake2b(sig[i * rows : (i + 1) * rows].tobytes(), digest_size=8).hexdigest()
+        for i in range(BANDS)
+    ]
+
+
+class NearDupeIndex:
+    """LSH index of article signatures, kept in SQLite so later runs match
+    against articles already sent downstream."""
+
+    def __init__(
+        self,
+        file_path=DEFAULT_NEAR_DUPES,
+        threshold=DEFAULT_THRESHOLD,
+        ttl_days=DEFAULT_TTL_DAYS,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl_days * 86400
+        self.db = sqlite3.connect(file_path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "id TEXT PRIMARY KEY, source TEXT, link TEXT, sig BLOB, seen REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER, hash TEXT, id TEXT)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS bands_hash ON bands (band, hash)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS bands_id ON bands (id)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS duplicates ("
+            "id TEXT PRIMARY KEY, canonical TEXT, source TEXT, link TEXT, seen REAL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS duplicates_canonical ON duplicates (canonical)"
+        )
+        self.db.commit()
+        self.expire()
+
+    def match(self, sig: array, id=None):
+        """Id, source and link of the most similar indexed article at or over
+        the threshold, or None. The article's own id (a rerun) never matches."""
+        best = None
+        best_sim = self.threshold
+        seen = {str(id)}
+        for band, digest in enumerate(bands(sig)):
+            for (other_id,) in self.db.execute(
+                "SELECT id FROM bands WHERE band = ? AND hash = ?", (band, digest)
+            ):
+                if other_id in seen:
+                    continue
+                seen.add(other_id)
+                row = self.db.execute(
+                    "SELECT source, link, sig FROM articles WHERE id = ?", (other_id,)
+                ).fetchone()
+                if not row:
+                    continue
+                other = array("Q")
+                other.frombytes(row[2])
+                sim = similarity(sig, other)
+                if sim >= best_sim:
+                    best, best_sim = (other_id, row[0], row[1]), sim
+        return best
+
+    def add(self, id, source: str, link: str, sig: array) -> None:
+        id = str(id)
+        self.db.execute(
+            "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?)",
+            (id, source, link, sig.tobytes(), time.time()),
+        )
+        self.db.execute("DELETE FROM bands WHERE id = ?", (id,))
+        self.db.executemany(
+            "INSERT INTO bands VALUES (?, ?, ?)",
+            ((band, digest, id) for band, digest in enumerate(bands(sig))),
+        )
+
+    def add_duplicate(self, id, canonical, source: str, link: str) -> None:
+        """Record article id as a copy of the indexed article canonical."""
+        self.db.execute(
+            "INSERT OR REPLACE INTO duplicates VALUES (?, ?, ?, ?, ?)",
+            (str(id), str(canonical), source, link, time.time()),
+        )
+
+    def duplicates(self, canonical) -> list:
+        """The copies dropped in favour of article canonical, oldest first."""
+        return [
+            {"id": id, "source": source, "link": link}
+            for id, source, link in self.db.execute(
+                "SELECT id, source, link FROM duplicates WHERE canonical = ? "
+                "ORDER BY seen",
+                (str(canonical),),
+            )
+        ]
+
+    def expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        self.db.execute(
+            "DELETE FROM bands WHERE id IN (SELECT id FROM articles WHERE seen < ?)",
+            (cutoff,),
+        )
+        self.db.execute("DELETE FROM articles WHERE seen < ?", (cutoff,))
+        self.db.execute("DELETE FROM duplicates WHERE seen < ?", (cutoff,))
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,48 @@
+from lib.result_cache import ResultCache, digest, DEFAULT_MAX_MB
+
+"""Cache FlairSentiment output by normalized article text, so re-runs and
+syndicated copies of the same wire story skip the models entirely."""
+
+DEFAULT_NER_CACHE = "cache/ner.db"
+# Per sentence output, see FlairSentiment.sentence_key.
+DEFAULT_SENTENCE_CACHE = "cache/ner_sentences.db"
+# Part of every key. Bump when the models or the ner/stats format change.
+MODEL_VERSION = "sentiment+ner-ontonotes-large+NewsSentiment/1"
+
+
+def normalize(text: str) -> str:
+    """Collapse whitespace so copies that only differ in layout share an entry."""
+    return " ".join(text.split())
+
+
+class CachedTagger:
+    """Wraps a FlairSentiment or FlairClient and only sends it uncached texts."""
+
+    def __init__(self, tagger, file_path=DEFAULT_NER_CACHE, max_mb=DEFAULT_MAX_MB):
+        self.tagger = tagger
+        self.cache = ResultCache(file_path, max_mb=max_mb)
+
+    @staticmethod
+    def key(text: str) -> str:
+        return digest(MODEL_VERSION, normalize(text))
+
+    def process_text(self, text: str) -> tuple:
+        return self.process_texts([text])[0]
+
+    def process_texts(self, texts: list) -> list:
+        keys = [self.key(text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        # Each distinct uncached text is tagged once, even if repeated in the batch.
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        if todo:
+            results = self.tagger.process_texts(list(todo.values()))
+            fresh = {key: list(result) for key, result in zip(todo, results)}
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [tuple(found[key]) for key in keys]
+
+    def close(self) -> None:
+        self.cache.close()
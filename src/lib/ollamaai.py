@@ -5,21 +5,38 @@ import base64
 from PIL import Image
 from io import BytesIO
 import requests
+from lib.endpoint_pool import EndpointPool
 
 # Example:
-# python lib/ollamaai.py 'llama3.1:8b' 3000 prompt="Capital of Spain"
+# cd src && python -m lib.ollamaai 'llama3.1:8b' 3000 prompt="Capital of Spain"
+# OLLAMA_HOSTS=gpu1,gpu2 spreads calls over several servers, see lib/endpoint_pool.
 
 
 # add print method to show llm data like model etc
 class OllamaAI:
     def __init__(
-        self, system_prompt=None, model=None, max_tokens=3000, temperature=0.1
+        self,
+        system_prompt=None,
+        model=None,
+        max_tokens=3000,
+        temperature=0.1,
+        hosts=None,
     ):
+        """hosts: Ollama servers, a list or comma separated, default $OLLAMA_HOSTS."""
         self.model = model
         self.max_tokens = max_tokens
         self.temperature = temperature
+        self.pool = EndpointPool(hosts)
+        if len(self.pool) > 1:
+            self.pool.check()
+        self.clients = {}
         self.set_system(system_prompt)
 
+    def client(self, url):
+        if url not in self.clients:
+            self.clients[url] = ollama.Client(host=url)
+        return self.clients[url]
+
     def set_system(self, prompt):
         self.system = (
             prompt
@@ -56,15 +73,17 @@ class OllamaAI:
         # sys.stderr.write(f"model: {self.model}\nmessages:\n{message}\nsystem: {self.system}\n")
 
         try:
-            response = ollama.chat(
-                model=self.model,
-                messages=[message],
-                stream=False,
-                options={
-                    "temperature": self.temperature,
-                    "system": self.system,
-                    "num_predict": self.max_tokens,
-                },
+            response = self.pool.call(
+                lambda url: self.client(url).chat(
+                    model=self.model,
+                    messages=[message],
+                    stream=False,
+                    options={
+                        "temperature": self.temperature,
+                        "system": self.system,
+                        "num_predict": self.max_tokens,
+                    },
+                )
             )
             return response["message"]["content"]
         except Exception as e:
@@ -0,0 +1,185 @@
+import os
+import gzip
+import time
+import hashlib
+import sqlite3
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+"""On disk cache of fetched pages keyed by canonical url, with a TTL and a
+size cap enforced by least recently used eviction.
+
+Bodies are stored gzipped under <dir>/<2 hex>/<sha256 of url>.gz and indexed in
+<dir>/index.db, so re-running a stage only hits the network for new urls."""
+
+DEFAULT_PAGE_CACHE = "cache/pages"
+DEFAULT_TTL_HOURS = 168
+DEFAULT_MAX_MB = 2048
+# Query parameters that say where a click came from, not which page it is.
+TRACKING_PREFIXES = ("utm_", "mc_", "_hs")
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "gbraid",
+    "wbraid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "_ga",
+    "_gl",
+    "ocid",
+    "cmpid",
+    "smid",
+    "campaign",
+    "src",
+    "ref",
+}
+
+
+def canonical_url(url: str) -> str:
+    """Lower case scheme and host, drop the fragment and tracking parameters
+    (utm_*, fbclid, ...) and sort what is left of the query, so
+    ?utm_source=rss variants share one entry while article.php?id=123 and
+    ?id=124 stay apart."""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not tracking(name)
+    )
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path or "/",
+            urlencode(query),
+            "",
+        )
+    )
+
+
+def tracking(name: str) -> bool:
+    name = name.lower()
+    return name.startswith(TRACKING_PREFIXES) or name in TRACKING_PARAMS
+
+
+class PageCache:
+    def __init__(
+        self,
+        cache_dir=DEFAULT_PAGE_CACHE,
+        ttl_hours=DEFAULT_TTL_HOURS,
+        max_mb=DEFAULT_MAX_MB,
+    ):
+        self.cache_dir = cache_dir
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(
+            os.path.join(cache_dir, "index.db"), timeout=30, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, url TEXT, size INTEGER, stored REAL, accessed REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)")
+        self.db.commit()
+        self.size = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()[0]
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.gz")
+
+    def get(self, url: str):
+        """Cached body for url as str, or None if missing or expired."""
+        key = self.key(url)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT stored FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if not row or now - row[0] > self.ttl:
+                self.misses += 1
+                return None
+            try:
+                with gzip.open(self.path(key), "rt", encoding="utf-8") as f:
+                    body = f.read()
+            except (OSError, EOFError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE pages SET accessed = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self.hits += 1
+            return body
+
+    def put(self, url: str, body: str) -> None:
+        key = self.key(url)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(body)
+        size = os.path.getsize(tmp)
+        now = time.time()
+        with self.lock:
+            os.replace(tmp, path)
+            row = self.db.execute(
+                "SELECT size FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self.size -= row[0]
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (key, canonical_url(url), size, now, now),
+            )
+            self.size += size
+            self._evict()
+            self.db.commit()
+
+    def _drop(self, key: str) -> None:
+        row = self.db.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.size -= row[0]
+        self.db.execute("DELETE FROM pages WHERE key = ?", (key,))
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        """Drop least recently used pages until we're under the size cap."""
+        if self.size <= self.max_bytes:
+            return
+        for (key,) in self.db.execute(
+            "SELECT key FROM pages ORDER BY accessed"
+        ).fetchall():
+            self._drop(key)
+            if self.size <= self.max_bytes:
+                break
+
+    def expire(self) -> int:
+        """Drop everything past its TTL. Returns the pages dropped."""
+        with self.lock:
+            keys = self.db.execute(
+                "SELECT key FROM pages WHERE stored < ?", (time.time() - self.ttl,)
+            ).fetchall()
+            for (key,) in keys:
+                self._drop(key)
+            self.db.commit()
+        return len(keys)
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.commit()
+            self.db.close()
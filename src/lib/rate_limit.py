@@ -0,0 +1,62 @@
+import time
+import asyncio
+import threading
+from collections import defaultdict
+
+"""Token bucket rate limiting, one bucket per key (domain, model, ...).
+
+Callers reserve a token and are told how long to wait for it, so the same
+bucket works from threads (acquire) and from asyncio (acquire_async)."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = 1):
+        """rate tokens per second, at most burst saved up."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, possibly borrowed from the future. Returns seconds to wait."""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    """A TokenBucket per key, created on first use."""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.buckets = defaultdict(lambda: TokenBucket(self.rate, self.burst))
+
+    def bucket(self, key) -> TokenBucket:
+        with self.lock:
+            return self.buckets[key]
+
+    def acquire(self, key) -> None:
+        self.bucket(key).acquire()
+
+    async def acquire_async(self, key) -> None:
+        await self.bucket(key).acquire_async()
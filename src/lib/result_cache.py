@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+"""Persistent key -> JSON value cache in SQLite, for results that are expensive
+to recompute (model output). Entries can expire after a TTL and the file is
+held under a size cap by evicting the least recently used entries."""
+
+DEFAULT_MAX_MB = 1024
+
+
+def digest(*parts) -> str:
+    """Stable key from strings: sha256 of the parts joined by NUL."""
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, file_path, ttl_hours=None, max_mb=DEFAULT_MAX_MB):
+        self.file_path = file_path
+        self.ttl = ttl_hours * 3600 if ttl_hours else None
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self.db = sqlite3.connect(file_path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT, size INTEGER, stored REAL, accessed REAL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)"
+        )
+        self.db.commit()
+        self.size = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def _fresh(self, stored: float, now: float) -> bool:
+        return self.ttl is None or now - stored <= self.ttl
+
+    def get(self, key: str):
+        """Cached value for key, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: list) -> dict:
+        """{key: value} for the keys that are cached and fresh."""
+        found = {}
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                row = self.db.execute(
+                    "SELECT value, stored FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row and self._fresh(row[1], now):
+                    found[key] = json.loads(row[0])
+                    self.db.execute(
+                        "UPDATE results SET accessed = ? WHERE key = ?", (now, key)
+                    )
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            self.db.commit()
+        return found
+
+    def put(self, key: str, value) -> None:
+        self.put_many({key: value})
+
+    def put_many(self, items: dict) -> None:
+        now = time.time()
+        with self.lock:
+            for key, value in items.items():
+                blob = json.dumps(value)
+                row = self.db.execute(
+                    "SELECT size FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    self.size -= row[0]
+                self.db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), now, now),
+                )
+                self.size += len(blob)
+            self._evict()
+            self.db.commit()
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT size FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self.size -= row[0]
+                self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.db.commit()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under the cap."""
+        if self.ttl is not None:
+            cur = self.db.execute(
+                "DELETE FROM results WHERE stored < ?", (time.time() - self.ttl,)
+            )
+            if cur.rowcount:
+                self.size = self.db.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM results"
+                ).fetchone()[0]
+        if self.size > self.max_bytes:
+            for key, size in self.db.execute(
+                "SELECT key, size FROM results ORDER BY accessed"
+            ).fetchall():
+                self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.size -= size
+                if self.size <= self.max_bytes:
+                    break
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"{self.hits} hits {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.commit()
+            self.db.close()
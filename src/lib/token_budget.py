@@ -0,0 +1,153 @@
+import re
+
+"""Fit article text into a token budget before it is sent to an LLM.
+
+Tokens are counted with litellm's token_counter, which uses the model's own
+tokenizer when it knows it and tiktoken otherwise. The budget is the smaller of
+a target article size and what is left of the model's context window after the
+prompt and room for the answer. An article over budget keeps its lead and then
+the sentences with the most named entities, in their original order. A prompt
+that leaves no room for an article at all is an error, not a smaller budget."""
+
+try:
+    from litellm import token_counter, get_model_info
+except ImportError:
+    token_counter = get_model_info = None
+
+# Context windows we actually run with. Ollama models get theirs sent as
+# num_ctx with each request, so the server runs with the window budgeted for,
+# not its own default or the model's advertised maximum.
+CONTEXT = {
+    "ollama/llama4:scout": 16384,
+    "ollama/gemma3:27b": 8192,
+    "ollama/deepseek-r1:70b": 8192,
+    "ollama/llama3.3:70b": 8192,
+    "ollama/qwen3:8b": 8192,
+    "ollama/qwen3:32b": 8192,
+    "gemini/gemini-2.5-flash": 1048576,
+    "gemini/gemini-2.5-pro": 1048576,
+}
+DEFAULT_CONTEXT = 8192
+# Room left for the model's answer.
+RESERVE_TOKENS = 1024
+# More room for each further article answered in the same request.
+BATCH_ANSWER_TOKENS = 256
+# Article tokens to aim for. Most news articles fit whole.
+DEFAULT_ARTICLE_TOKENS = 2000
+# Share of the budget that goes to the lead before entity rich sentences.
+LEAD_SHARE = 0.5
+# Entity types that say little about who or what an article is about.
+MINOR_ENTITIES = {"MONEY", "ORDINAL", "PERCENT", "QUANTITY", "TIME", "DATE", "CARDINAL"}
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str, model: str) -> int:
+    if token_counter is not None:
+        try:
+            return token_counter(model=model, text=text)
+        except Exception:
+            pass
+    # About four characters a token for English.
+    return len(text) // 4 + 1
+
+
+def context_window(model: str) -> int:
+    if model in CONTEXT:
+        return CONTEXT[model]
+    if model.startswith("ollama"):
+        # Sent as num_ctx: a window the server can hold, not the model's maximum.
+        return DEFAULT_CONTEXT
+    if get_model_info is not None:
+        try:
+            return get_model_info(model)["max_input_tokens"] or DEFAULT_CONTEXT
+        except Exception:
+            pass
+    return DEFAULT_CONTEXT
+
+
+class TokenBudget:
+    def __init__(
+        self,
+        model: str,
+        prompt: str,
+        article_tokens=DEFAULT_ARTICLE_TOKENS,
+        context=None,
+        reserve=RESERVE_TOKENS,
+    ):
+        """article_tokens 0 means only the context window limits the article."""
+        self.model = model
+        self.prompt_tokens = count_tokens(prompt, model)
+        self.context = context or context_window(model)
+        self.reserve = reserve
+        self.budget = self.context - self.prompt_tokens - reserve
+        if article_tokens:
+            self.budget = min(self.budget, article_tokens)
+        if self.budget <= 0:
+            # Any article sent would be cut off by the server, not by us.
+            raise ValueError(
+                f"Prompt is {self.prompt_tokens} tokens, no room for an article "
+                f"in {self.context} for {model}"
+            )
+        self.calls = 0
+        self.total_tokens = 0
+        self.truncated = 0
+
+    def room(self, count=1, extra=0) -> int:
+        """Tokens left in the context window after the prompt, extra prompt
+        tokens and the answers for count articles."""
+        answers = self.reserve + BATCH_ANSWER_TOKENS * (count - 1)
+        return self.context - self.prompt_tokens - extra - answers
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def fit(self, text: str, ner=None) -> tuple:
+        """(text, tokens, original tokens) with text cut to the budget. ner is
+        the article's flair output, used for sentence splits and entities."""
+        tokens = self.count(text)
+        original = tokens
+        if tokens > self.budget:
+            text = self.shorten(text, ner)
+            tokens = self.count(text)
+            self.truncated += 1
+        self.calls += 1
+        self.total_tokens += self.prompt_tokens + tokens
+        return text, tokens, original
+
+    def shorten(self, text: str, ner=None) -> str:
+        if ner:
+            sentences = [ent["sentence"] for ent in ner]
+            weights = [
+                sum(1 for span in ent["spans"] if span["value"] not in MINOR_ENTITIES)
+                for ent in ner
+            ]
+        else:
+            sentences = SENTENCE_END.split(text)
+            weights = [0] * len(sentences)
+        sizes = [self.count(sentence) + 1 for sentence in sentences]
+
+        keep = set()
+        used = 0
+        lead = self.budget * LEAD_SHARE
+        for i, size in enumerate(sizes):
+            if used + size > lead:
+                break
+            keep.add(i)
+            used += size
+        # Then the most entity rich of the rest, earlier sentences first on ties.
+        for i in sorted(range(len(sentences)), key=lambda i: (-weights[i], i)):
+            if i in keep or used + sizes[i] > self.budget:
+                continue
+            keep.add(i)
+            used += sizes[i]
+        if not keep:
+            # One giant sentence: cut it by characters.
+            return text[: self.budget * 4]
+        return " ".join(sentences[i] for i in sorted(keep))
+
+    def stats(self) -> str:
+        average = self.total_tokens / self.calls if self.calls else 0
+        return (
+            f"{self.calls} calls, {average:.0f} input tokens on average "
+            f"(prompt {self.prompt_tokens}), {self.truncated} articles shortened"
+        )
@@ -1,18 +1,40 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from litellm import completion
+from litellm import acompletion
 import sys
 import json
 import re
 import time
+import asyncio
+import argparse
+from collections import deque, defaultdict, Counter
 from lib.emojify import emojify
+from lib.rate_limit import RateLimiter
+from lib.llm_cache import add_cache_args, open_cache
+from lib.journal import Journal, DEFAULT_SYNC_EVERY
+from lib.endpoint_pool import EndpointPool, DEFAULT_OLLAMA
+from lib.token_budget import TokenBudget, DEFAULT_ARTICLE_TOKENS
+from lib.metrics import StageMetrics
 
 """
 Use LiteLLM to get bias from news articles.
+
+Articles are sent concurrently (--concurrency) through litellm's async API,
+each model held to its requests per minute, and written out in input order
+unless --unordered. With --batch several articles share one request.
+Answers are requested as schema constrained JSON, validated strictly, and a
+malformed one gets a cheap repair request before it counts as a failure.
+Local models are spread over a pool of Ollama servers (--ollama or
+$OLLAMA_HOSTS), least busy first. Long articles are cut to a token budget
+(lib/token_budget) before they are sent. Responses are cached on disk
+(lib/llm_cache), so reruns only send new articles.
 """
 
 JSON_RE = re.compile(r"(\{[^\}]+\})")
+# Reasoning models think out loud first, and many wrap JSON in a code fence.
+THINK_RE = re.compile(r"<think>.*?</think>", re.S)
+FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
 MODEL = "gemini/gemini-2.5-flash"
 MODEL = "gemini/gemini-2.5-pro"
 # DEFAULT_MODEL = "ollama/llama4:scout"
@@ -23,11 +45,49 @@ DEFAULT_MODEL = "ollama/llama4:scout"
 # DEFAULT_MODEL = "ollama/qwen3:8b"
 # DEFAULT_MODEL = "ollama/qwen3:32b"
 
+# Finished articles, for --resume after a crash.
+DEFAULT_JOURNAL = "cache/bias_journal.jsonl"
+# Requests in flight at once, per Ollama server for local models. Ollama queues
+# what its parallel slots can't take.
+DEFAULT_CONCURRENCY = 4
+# Requests per minute by model, 0 is unlimited. Override with --rpm.
+RPM = {
+    "gemini/gemini-2.5-pro": 150,
+    "gemini/gemini-2.5-flash": 1000,
+}
+BIASES = ("left", "center", "right")
+DEGREES = ("minimal", "moderate", "strong")
+BIAS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "bias": {"type": "string", "enum": list(BIASES)},
+        "degree": {"type": "string", "enum": list(DEGREES)},
+        "reason": {"type": "string"},
+    },
+    "required": ["bias", "degree", "reason"],
+}
+BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"id": {"type": "string"}, **BIAS_SCHEMA["properties"]},
+        "required": ["id", *BIAS_SCHEMA["required"]],
+    },
+}
+# Sent with a response that didn't validate, instead of the whole article again.
+REPAIR_PROMPT = """Rewrite the following answer as JSON only, in exactly this format:
+{"bias": "[left,center,right]", "degree": "[minimal,moderate,strong]", "reason": "<reason>"}
+Keep its meaning. Answer:
+"""
+# Follows the prompt file when --batch packs several articles in one request.
+BATCH_PROMPT = """There are {count} attachments below, each starting with a line "Article id: <id>".
+Analyze each one on its own. Return only a JSON array with one object per article, in the same order:
+[{{"id": "<id>", "bias": "[left,center,right]", "degree": "[minimal,moderate,strong]", "reason": "<reason>"}}, ...]
+"""
+
 
 # init
 e = emojify
-model_name = DEFAULT_MODEL
-location = "local"
 
 # load emojis
 emap = {
@@ -39,19 +99,6 @@ emap = {
     "strong": e(["right_arrow_curving_up"])[0],
 }
 
-if len(sys.argv) > 1:
-    prompt_file = sys.argv[1]
-    prompt = open(prompt_file, "r").read().strip()
-
-    if len(sys.argv) > 2:
-        model_name = sys.argv[2]
-        if "gemini" in model_name:
-            location = "remote"
-            model = MODEL
-
-else:
-    exit("Usage: python litellm_ai.py <prompt_file> <model_name> optional")
-
 
 class LapTimer:
     def __init__(self):
@@ -65,6 +112,11 @@ class LapTimer:
         self.start_time = current_time
         return lap_time
 
+    def add(self, lap_time: float) -> float:
+        """Record a lap timed by the caller, for calls that overlap."""
+        self.lap_times.append(lap_time)
+        return lap_time
+
     def get_lap_times(self):
         return self.lap_times
 
@@ -76,106 +128,622 @@ class LapTimer:
 
 
 timer = LapTimer()
+metrics = StageMetrics("litellm_ai")
+
+
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(description="Get bias from news articles with LiteLLM.")
+    ap.add_argument("prompt_file")
+    ap.add_argument("model_name", nargs="?", default=DEFAULT_MODEL)
+    ap.add_argument(
+        "-j",
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"Requests in flight at once (default {DEFAULT_CONCURRENCY} per Ollama server)",
+    )
+    ap.add_argument(
+        "-o",
+        "--ollama",
+        default=None,
+        help="Comma separated Ollama servers (default $OLLAMA_HOSTS or localhost)",
+    )
+    ap.add_argument(
+        "-r",
+        "--rpm",
+        type=float,
+        default=None,
+        help="Requests per minute for the model, 0 for unlimited (default from RPM table)",
+    )
+    ap.add_argument(
+        "-u",
+        "--unordered",
+        action="store_true",
+        help="Write articles as they finish instead of in input order",
+    )
+    ap.add_argument(
+        "--journal",
+        default=DEFAULT_JOURNAL,
+        help=f"Checkpoint of finished articles (default {DEFAULT_JOURNAL})",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse the articles already in the journal instead of starting over",
+    )
+    ap.add_argument(
+        "--sync-every",
+        type=int,
+        default=DEFAULT_SYNC_EVERY,
+        help=f"fsync the journal every this many articles (default {DEFAULT_SYNC_EVERY})",
+    )
+    ap.add_argument(
+        "-b",
+        "--batch",
+        type=int,
+        default=1,
+        help="Articles packed into one request, answered as a JSON array (default 1)",
+    )
+    ap.add_argument(
+        "-m",
+        "--max-tokens",
+        type=int,
+        default=DEFAULT_ARTICLE_TOKENS,
+        help=f"Article tokens to fit into, 0 for the model's context window (default {DEFAULT_ARTICLE_TOKENS})",
+    )
+    ap.add_argument(
+        "--context",
+        type=int,
+        default=None,
+        help="Context window of the model, overriding lib/token_budget's table; sent to Ollama as num_ctx",
+    )
+    ap.add_argument(
+        "--no-schema",
+        action="store_true",
+        help="Don't ask the backend for schema constrained JSON",
+    )
+    ap.add_argument(
+        "--no-repair",
+        action="store_true",
+        help="Don't send malformed answers back to be fixed",
+    )
+    add_cache_args(ap)
+    return ap.parse_args(argv)
+
+
+def response_format(schema: dict) -> dict:
+    """litellm turns this into Gemini's response schema and Ollama's format."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "bias", "schema": schema, "strict": True},
+    }
 
 
-def remote_ai(text: str, model: str = MODEL):
+async def remote_ai(text: str, model: str = MODEL, schema: dict = None):
     """
     Remote AI function to process text and return a response.
     Google gemini for now.
     """
-    response = completion(model=model, messages=[{"role": "user", "content": text}])
+    kwargs = {"response_format": response_format(schema)} if schema else {}
+    response = await acompletion(
+        model=model, messages=[{"role": "user", "content": text}], **kwargs
+    )
     return response.choices[0].message.content.strip()
 
 
-def local_ai(text: str, model: str = DEFAULT_MODEL) -> str:
+async def local_ai(
+    text: str,
+    model: str = DEFAULT_MODEL,
+    api_base: str = DEFAULT_OLLAMA,
+    schema: dict = None,
+    num_ctx: int = None,
+) -> str:
     """
-    Local AI function to process text and return a response.
+    Local AI function to process text and return a response. num_ctx is the
+    context window for Ollama to run with, the one the article was fitted to.
     """
-
-    response = completion(
+    kwargs = {"response_format": response_format(schema)} if schema else {}
+    if num_ctx:
+        kwargs["num_ctx"] = num_ctx
+    response = await acompletion(
         model=model,
         messages=[{"content": text, "role": "user"}],
-        api_base="http://localhost:11434",
+        api_base=api_base,
+        **kwargs,
     )
     return response.choices[0].message.content.strip()
 
 
-def getbias(prompt: str, text: str, model: str) -> dict:
-    """
-    Function to get bias from text using a local AI model.
-    """
-    instring = f"{prompt}\n{text}"
-    # print(f"=> Local AI: {instring}\n")
-
-    if location == "remote":
-        res = remote_ai(text=instring, model=model)
-    else:
-        res = local_ai(text=instring, model=model)
-
-    lap = timer.lap()
-    # sys.stderr.write(f"Lap {timer.get_count()}: {lap:.4f} sec.\n")
-    # print(f"AI Response: {res}\n")
-
-    match = JSON_RE.search(res)
-    out = {
-        "bias": "NA",
-        "degree": "NA",
-        "reason": "NA",
-        "model": model,
-        "lap": f"{lap:.1f}",
-    }
+def strip_response(res: str) -> str:
+    return FENCE_RE.sub("", THINK_RE.sub("", res).strip()).strip()
 
-    if match:
-        data = match.group(0)
-    else:
-        # try to recover from bad JSON
-        sys.stderr.write(f"Attempting fix:\n{res}\n")
-        res = res + "}"
-        match = JSON_RE.search(res)
-
-        if match:
-            data = match.group(0)
-        else:
-            sys.stderr.write(f"No JSON found in response, returning NA dict.\n{res}\n")
-            return out
-    out = json.loads(data)
-    out["model"] = model
-    out["lap"] = f"{lap:.1f}"
-    return out
 
+def valid_bias(entry):
+    """{"bias", "degree", "reason"} from a decoded answer, or None if it isn't
+    one. Case is forgiven, anything else isn't."""
+    if not isinstance(entry, dict):
+        return None
+    bias = entry.get("bias")
+    degree = entry.get("degree")
+    reason = entry.get("reason")
+    if not (isinstance(bias, str) and isinstance(degree, str) and isinstance(reason, str)):
+        return None
+    bias = bias.strip().lower()
+    degree = degree.strip().lower()
+    if bias not in BIASES or degree not in DEGREES:
+        return None
+    return {"bias": bias, "degree": degree, "reason": reason}
 
-# === Main ===
-source = None
 
-for lno, line in enumerate(sys.stdin, start=1):
-    line = line.strip()
-    if not line:
-        continue
+def extract_bias(res: str) -> tuple:
+    """(bias entry or None, how): "strict" when the whole answer is valid
+    JSON, "recovered" when a valid object had to be dug out of it."""
+    text = strip_response(res)
     try:
-        data = json.loads(line)
-
+        entry = valid_bias(json.loads(text))
+        if entry:
+            return entry, "strict"
+    except json.JSONDecodeError:
+        pass
+    # The old way: first {...} in the answer, or with a missing } added.
+    for candidate in (text, text + "}"):
+        match = JSON_RE.search(candidate)
+        if not match:
+            continue
+        try:
+            entry = valid_bias(json.loads(match.group(0)))
+        except json.JSONDecodeError:
+            continue
+        if entry:
+            return entry, "recovered"
+    return None, "failed"
+
+
+def parse_batch(res: str) -> dict:
+    """{id: {"bias", "degree", "reason"}} for the well formed entries of the
+    JSON array in a batch response."""
+    text = strip_response(res)
+    start = text.find("[")
+    end = text.rfind("]")
+    if start < 0 or end < start:
+        return {}
+    try:
+        entries = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return {}
+    found = {}
+    for entry in entries:
+        bias = valid_bias(entry)
+        if bias and "id" in entry:
+            found[str(entry["id"])] = bias
+    return found
+
+
+def records(lines):
+    """The JSON lines parsed, skipping the ones that don't."""
+    for lno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except Exception as e:
+            sys.stderr.write(f"Error parsing line {lno}: {e}\n")
+
+
+def articles(records):
+    """(record number, article) for the records that have text."""
+    source = None
+    for lno, data in enumerate(records, start=1):
         if "source" in data:
             if source != data["source"]:
                 sys.stderr.write(f"\nProcessing:\t{data['source']}\n\n")
                 source = data["source"]
 
         if "text" in data:
-            text = data["text"]
-            # print(f"-----\n{text}")
-            bias = getbias(prompt, text, model_name)
+            yield lno, data
+
+
+def emit(results: list) -> None:
+    for data in results:
+        if data is not None:
+            out = json.dumps(data)
+            print(out, flush=True)
+            metrics.out(out)
+
+
+class BiasClassifier:
+    """Sends articles to one model, at most concurrency at a time and within
+    its rate limit. Responses come from the cache when there is one, and
+    finished articles are written to the journal when there is one."""
+
+    def __init__(
+        self,
+        prompt: str,
+        model: str,
+        concurrency: int,
+        rpm: float,
+        cache=None,
+        journal=None,
+        pool=None,
+        budget=None,
+        batch=1,
+        structured=True,
+        repair=True,
+    ):
+        self.prompt = prompt
+        self.model = model
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rpm / 60 if rpm else 0)
+        self.slots = asyncio.Semaphore(concurrency)
+        self.cache = cache
+        self.journal = journal
+        self.pool = pool
+        self.budget = budget
+        self.batch = batch
+        self.structured = structured
+        self.repair = repair
+        # model -> Counter of how answers parsed: strict, recovered, repaired, failed
+        self.parse_stats = defaultdict(Counter)
+        self.resumed = 0
+        self.batched = 0
+
+    async def ask(
+        self, text: str, prompt: str = None, cached: bool = True, schema=BIAS_SCHEMA
+    ) -> tuple:
+        """(response, seconds) for the prompt followed by text. Only read from
+        the cache: the caller stores the response once it has validated it."""
+        schema = schema if self.structured else None
+        prompt = prompt or self.prompt
+        cached = cached and self.cache is not None
+        if cached:
+            res = self.cache.response(self.model, prompt, text)
+            if res is not None:
+                return res, 0.0
+        instring = f"{prompt}\n{text}"
+        # print(f"=> Local AI: {instring}\n")
+
+        async with self.slots:
+            await self.limiter.acquire_async(self.model)
+            start = time.perf_counter()
+            if "gemini" in self.model:
+                res = await remote_ai(text=instring, model=self.model, schema=schema)
+            else:
+                res = await self.pool.call_async(
+                    lambda url: local_ai(
+                        text=instring,
+                        model=self.model,
+                        api_base=url,
+                        schema=schema,
+                        num_ctx=self.budget.context if self.budget is not None else None,
+                    )
+                )
+            lap = timer.add(time.perf_counter() - start)
+            metrics.latency(lap)
+        # sys.stderr.write(f"Lap {timer.get_count()}: {lap:.4f} sec.\n")
+        # print(f"AI Response: {res}\n")
+        return res, lap
+
+    def fit(self, text: str, ner=None) -> tuple:
+        """(text, tokens) with text cut to the token budget, tokens None
+        without a budget."""
+        if self.budget is None:
+            return text, None
+        text, tokens, original = self.budget.fit(text, ner)
+        if tokens < original:
+            sys.stderr.write(f"Shortened {original} -> {tokens} tokens\n")
+        return text, tokens
+
+    async def getbias(self, text: str, ner=None) -> dict:
+        """
+        Function to get bias from text using a local or remote AI model.
+        """
+        text, tokens = self.fit(text, ner)
+        return await self.fitted_bias(text, tokens)
+
+    async def fitted_bias(self, text: str, tokens) -> dict:
+        res, lap = await self.ask(text)
+        return await self.response_bias(res, lap, tokens, text)
+
+    async def response_bias(self, res: str, lap: float, tokens, text: str) -> dict:
+        """The bias dict for the answer to text, NA if it can't be made valid.
+        lap is 0 for an answer from the cache. Only a valid answer is cached,
+        as its clean JSON so a rerun neither repairs nor recovers it again; an
+        unusable one is dropped from the cache."""
+        entry, how = extract_bias(res)
+        if entry is None and self.repair:
+            entry = await self.repaired(res)
+            if entry is not None:
+                how = "repaired"
+        if self.cache is not None:
+            if entry is None:
+                self.cache.forget(self.model, self.prompt, text)
+            elif lap or json.dumps(entry) != res:
+                self.cache.store(self.model, self.prompt, text, json.dumps(entry))
+        self.parse_stats[self.model][how] += 1
+        if entry is None:
+            sys.stderr.write(f"No valid JSON in response, returning NA dict.\n{res}\n")
+            entry = {"bias": "NA", "degree": "NA", "reason": "NA"}
+        bias = dict(entry, model=self.model, lap=f"{lap:.1f}")
+        if tokens is not None:
+            bias["tokens"] = self.budget.prompt_tokens + tokens
+        return bias
+
+    async def repaired(self, res: str):
+        """Ask the model to reformat its own answer, without the article."""
+        try:
+            fixed, _ = await self.ask(strip_response(res)[-4000:], REPAIR_PROMPT, cached=False)
+        except Exception as e:
+            sys.stderr.write(f"Repair failed: {e}\n")
+            return None
+        return extract_bias(fixed)[0]
+
+    def parse_report(self) -> str:
+        lines = []
+        for model, counts in self.parse_stats.items():
+            total = sum(counts[kind] for kind in ("strict", "recovered", "repaired", "failed"))
+            failed = counts["failed"] / total * 100 if total else 0.0
+            kinds = ", ".join(f"{kind} {n}" for kind, n in sorted(counts.items()))
+            lines.append(f"{model}: {kinds} ({failed:.1f}% failed)")
+        return "\n".join(lines)
+
+    def finish(self, lno, data, bias: dict):
+        data["bias"] = bias
+        bdir = bias["bias"]
+        deg = bias["degree"]
+
+        sys.stderr.write(
+            f"{lno} {data['id']}: {data.get('title', '')}\n{emap[bdir]} {emap[deg]} {bias['lap']} {bias.get('tokens', '')}\t{bias['reason']}\n"
+        )
+        if self.journal is not None:
+            self.journal.append(data)
+        return data
+
+    def resume(self, data):
+        """The journaled copy of the article, if it was finished before."""
+        if self.journal is None:
+            return None
+        done = self.journal.finished(data)
+        if done is not None:
+            self.resumed += 1
+        return done
+
+    async def classify(self, lno, data, fitted=None):
+        """The article with its bias added, or None on failure. fitted is
+        (text, tokens) when the text has been through fit() already."""
+        try:
+            done = self.resume(data)
+            if done is not None:
+                return done
+            if fitted is None:
+                fitted = self.fit(data["text"], data.get("ner"))
+            bias = await self.fitted_bias(*fitted)
             # print(f"\n{json.dumps(bias)}\n=====\n")
-            data["bias"] = bias
-            bdir = bias["bias"]
-            deg = bias["degree"]
+            return self.finish(lno, data, bias)
+        except Exception as e:
+            sys.stderr.write(f"Error parsing line {lno}: {e}\n")
+            return None
+
+    async def classify_batch(self, chunk: list) -> list:
+        """classify() for each (lno, article) of chunk, sending the ones not
+        cached or journaled to the model together, as many per request as fit
+        the context window. Articles the batch answer doesn't cover properly
+        are sent again on their own."""
+        if len(chunk) == 1:
+            return [await self.classify(*chunk[0])]
+        results = [None] * len(chunk)
+        todo = []
+        for i, (lno, data) in enumerate(chunk):
+            # One bad article is dropped, the rest of the chunk goes on.
+            try:
+                if "id" not in data:
+                    raise KeyError("id")
+                results[i] = self.resume(data)
+                if results[i] is not None:
+                    continue
+                fitted = self.fit(data["text"], data.get("ner"))
+                res = None
+                if self.cache is not None:
+                    res = self.cache.response(self.model, self.prompt, fitted[0])
+                if res is None:
+                    todo.append((i, lno, data, fitted))
+                    continue
+                bias = await self.response_bias(res, 0.0, fitted[1], fitted[0])
+                results[i] = self.finish(lno, data, bias)
+            except Exception as e:
+                sys.stderr.write(f"Error parsing line {lno}: {e}\n")
+
+        groups = [[]]
+        used = 0
+        if self.budget is not None:
+            extra = self.budget.count(BATCH_PROMPT.format(count=len(todo)))
+        for item in todo:
+            tokens = item[3][1] or 0
+            if self.budget is not None:
+                tokens += self.budget.count(f"Article id: {item[2]['id']}\n")
+                # Each article in a group needs its own room for an answer.
+                room = self.budget.room(len(groups[-1]) + 1, extra)
+                if groups[-1] and used + tokens > room:
+                    groups.append([])
+                    used = 0
+            groups[-1].append(item)
+            used += tokens
+        for group, answers in zip(
+            groups, await asyncio.gather(*(self.ask_batch(g) for g in groups))
+        ):
+            for i, lno, data, fitted in group:
+                results[i] = answers.get(i) or await self.classify(lno, data, fitted)
+        return results
+
+    async def ask_batch(self, group: list) -> dict:
+        """{index: finished article} for the articles of group the model
+        answered for properly, in one request."""
+        if len(group) < 2:
+            return {}
+        ids = [str(data["id"]) for _, _, data, _ in group]
+        text = "\n\n".join(
+            f"Article id: {id}\n{fitted[0]}" for id, (_, _, _, fitted) in zip(ids, group)
+        )
+        prompt = f"{self.prompt}\n{BATCH_PROMPT.format(count=len(group))}"
+        try:
+            # Cached per article below instead, so any batch reuses them.
+            res, lap = await self.ask(text, prompt, cached=False, schema=BATCH_SCHEMA)
+        except Exception as e:
+            sys.stderr.write(f"Batch of {len(group)} failed: {e}\n")
+            return {}
+        entries = parse_batch(res)
+        self.parse_stats[self.model]["batch"] += len(entries)
+        self.parse_stats[self.model]["batch missing"] += len(group) - len(entries)
+        answers = {}
+        for id, (i, lno, data, (article, tokens)) in zip(ids, group):
+            entry = entries.get(id)
+            if entry is None:
+                sys.stderr.write(f"No valid answer for {id} in batch, asking alone\n")
+                continue
+            if self.cache is not None:
+                self.cache.store(self.model, self.prompt, article, json.dumps(entry))
+            bias = dict(entry, model=self.model, lap=f"{lap:.1f}", batch=len(group))
+            if tokens is not None:
+                bias["tokens"] = self.budget.prompt_tokens + tokens
+            answers[i] = self.finish(lno, data, bias)
+        self.batched += len(answers)
+        return answers
+
+    async def run(self, items, unordered: bool = False, emit=emit):
+        """classify() the (number, article) items, passing each chunk's
+        finished articles to emit. items may be an async iterable and emit a
+        coroutine function, so waiting for input or for room downstream
+        doesn't hold up the requests in flight."""
+        # Keep a few requests queued behind the ones in flight, but don't read all of stdin.
+        window = self.concurrency * 2
+        pending = deque()
+
+        async def put(results):
+            done = emit(results)
+            if asyncio.iscoroutine(done):
+                await done
+
+        async for chunk in achunks(items, self.batch):
+            pending.append(asyncio.create_task(self.classify_batch(chunk)))
+            if unordered:
+                while len(pending) >= window or any(t.done() for t in pending):
+                    done, _ = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        pending.remove(task)
+                        await put(task.result())
+            else:
+                while pending and (len(pending) >= window or pending[0].done()):
+                    await put(await pending.popleft())
+            # Let the tasks just created start before reading more.
+            await asyncio.sleep(0)
+
+        if unordered:
+            for task in asyncio.as_completed(pending):
+                await put(await task)
+        else:
+            while pending:
+                await put(await pending.popleft())
+
+
+def chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def achunks(items, size: int):
+    """chunks() of a plain or an async iterable."""
+    if not hasattr(items, "__aiter__"):
+        for chunk in chunks(items, size):
+            yield chunk
+        return
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def open_classifier(args) -> BiasClassifier:
+    """The classifier for cmdargs() args, with its cache, journal, Ollama pool
+    and token budget."""
+    prompt = open(args.prompt_file, "r").read().strip()
+    try:
+        budget = TokenBudget(args.model_name, prompt, args.max_tokens, args.context)
+    except ValueError as e:
+        sys.exit(str(e))
+    rpm = args.rpm if args.rpm is not None else RPM.get(args.model_name, 0)
+    cache = open_cache(args)
+    journal = Journal(args.journal, args.resume, args.sync_every)
+    pool = None
+    concurrency = args.concurrency or DEFAULT_CONCURRENCY
+    if "gemini" not in args.model_name:
+        pool = EndpointPool(args.ollama)
+        pool.check()
+        concurrency = args.concurrency or DEFAULT_CONCURRENCY * len(pool)
+
+    return BiasClassifier(
+        prompt,
+        args.model_name,
+        concurrency,
+        rpm,
+        cache,
+        journal,
+        pool,
+        budget,
+        args.batch,
+        not args.no_schema,
+        not args.no_repair,
+    )
+
+
+def close_classifier(classifier: BiasClassifier, args):
+    """Report on the run and close the classifier's cache."""
+    cache, budget, pool = classifier.cache, classifier.budget, classifier.pool
+    sys.stderr.write(f"Tokens: {budget.stats()}\n")
+    sys.stderr.write(f"Answers parsed: {classifier.parse_report()}\n")
+    if args.batch > 1:
+        sys.stderr.write(f"Answered in batches: {classifier.batched}\n")
+    if pool is not None:
+        sys.stderr.write(f"Calls by endpoint: {pool.stats()}\n")
+    if args.resume:
+        sys.stderr.write(f"Resumed {classifier.resumed} articles from {args.journal}\n")
+    if cache is not None:
+        sys.stderr.write(f"LLM cache: {cache.stats()}\n")
+        cache.close()
+    if timer.get_count():
+        sys.stderr.write(f"Lap times: {timer.get_lap_times()}\n")
+        sys.stderr.write(f"Average lap time: {timer.get_average_lap_time():.4f} sec.\n")
+
+    if cache is not None:
+        metrics.track("llm", cache)
+    metrics.note("model", args.model_name)
+    metrics.note("input_tokens", budget.total_tokens)
+    metrics.note("parse", dict(classifier.parse_stats[args.model_name]))
+
+
+def main():
+    args = cmdargs()
+    classifier = open_classifier(args)
+    items = articles(records(metrics.lines(sys.stdin)))
+    try:
+        asyncio.run(classifier.run(items, args.unordered))
+    finally:
+        classifier.journal.close()
 
-            sys.stderr.write(
-                f"{lno} {data['id']}: {data['title']}\n{emap[bdir]} {emap[deg]} {bias['lap']}\t{bias['reason']}\n"
-            )
+    close_classifier(classifier, args)
+    metrics.close()
 
-            print(json.dumps(data))
-    except Exception as e:
-        sys.stderr.write(f"Error parsing line {lno}: {e}\n")
-        continue
 
-sys.stderr.write(f"Lap times: {timer.get_lap_times()}\n")
-sys.stderr.write(f"Average lap time: {timer.get_average_lap_time():.4f} sec.\n")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Summarize the stage metrics lib/metrics.py appends to cache/metrics.jsonl:
+where a run spent its time, records and bytes through each stage, per record
+latency and cache hit rates. The latest run by default.
+"""
+
+import sys
+import time
+import argparse
+from json import loads, JSONDecodeError
+from collections import defaultdict
+from lib.metrics import DEFAULT_METRICS
+
+
+def cmdargs():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument(
+        "file",
+        nargs="?",
+        default=DEFAULT_METRICS,
+        help=f"Metrics file (default {DEFAULT_METRICS})",
+    )
+    ap.add_argument("-r", "--run", help="Run id to report on (default latest)")
+    ap.add_argument(
+        "-a", "--all", action="store_true", help="One line per run instead"
+    )
+    return ap.parse_args()
+
+
+def load(file_path) -> dict:
+    """{run_id: [stage lines in start order]}"""
+    runs = defaultdict(list)
+    with open(file_path) as f:
+        for line in f:
+            try:
+                rec = loads(line)
+            except JSONDecodeError:
+                continue
+            runs[rec["run_id"]].append(rec)
+    for stages in runs.values():
+        stages.sort(key=lambda rec: rec["started"])
+    return runs
+
+
+def span(stages: list) -> float:
+    """Wall clock from the first stage starting to the last one finishing."""
+    return max(s["started"] + s["wall"] for s in stages) - stages[0]["started"]
+
+
+def ms(seconds) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+def caches(rec: dict) -> str:
+    return " ".join(
+        f"{name} {c['hit_rate'] * 100:.0f}%"
+        for name, c in rec.get("caches", {}).items()
+        if c["hit_rate"] is not None
+    )
+
+
+def report(run_id: str, stages: list) -> None:
+    total = sum(s["wall"] for s in stages) or 1
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stages[0]["started"]))
+    print(f"run {run_id}  started {started}  elapsed {span(stages):.1f}s\n")
+    print(
+        f"{'stage':<14}{'wall s':>9}{'%':>6}{'cpu s':>9}{'+kids':>8}"
+        f"{'in':>8}{'out':>8}{'MB in':>8}{'MB out':>8}{'p50 ms':>8}{'p95 ms':>8}  caches"
+    )
+    for s in stages:
+        print(
+            f"{s['stage']:<14}{s['wall']:>9.1f}{s['wall'] / total * 100:>6.1f}"
+            f"{s['cpu']:>9.1f}{s['cpu_children']:>8.1f}"
+            f"{s['records_in']:>8}{s['records_out']:>8}"
+            f"{s['bytes_in'] / 1e6:>8.1f}{s['bytes_out'] / 1e6:>8.1f}"
+            f"{ms(s['p50']):>8}{ms(s['p95']):>8}  {caches(s)}"
+        )
+
+
+def main():
+    args = cmdargs()
+    try:
+        runs = load(args.file)
+    except FileNotFoundError:
+        sys.exit(f"No metrics yet: {args.file}")
+    if not runs:
+        sys.exit(f"No metrics yet: {args.file}")
+
+    if args.all:
+        for run_id, stages in sorted(runs.items(), key=lambda r: r[1][0]["started"]):
+            top = max(stages, key=lambda s: s["wall"])
+            print(
+                f"{run_id}\t{len(stages)} stages\t{span(stages):.1f}s\t"
+                f"slowest {top['stage']} {top['wall']:.1f}s"
+            )
+        return
+
+    run_id = args.run or max(runs, key=lambda r: runs[r][0]["started"])
+    if run_id not in runs:
+        sys.exit(f"No run {run_id} in {args.file}")
+    report(run_id, runs[run_id])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Drop near duplicate articles (rewrites, syndicated copies) before NER and the
+LLM bias call. Articles are compared by MinHash of their text and each one is
+passed on as soon as it has been checked; the first one of a cluster is kept.
+The index persists, so copies of an article sent downstream in an earlier run
+are dropped too. Each copy dropped is recorded in the index with the id of the
+article kept, listed by --group ID. No text field -> passthrough.
+"""
+
+import sys
+import time
+import argparse
+from json import loads, dumps, JSONDecodeError
+from lib.metrics import StageMetrics
+from lib.minhash import (
+    NearDupeIndex,
+    signature,
+    DEFAULT_NEAR_DUPES,
+    DEFAULT_THRESHOLD,
+    DEFAULT_TTL_DAYS,
+)
+
+
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument(
+        "-c",
+        "--cache",
+        default=DEFAULT_NEAR_DUPES,
+        help=f"Signature index shared across runs (default {DEFAULT_NEAR_DUPES})",
+    )
+    ap.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Estimated Jaccard similarity to count as a duplicate (default {DEFAULT_THRESHOLD})",
+    )
+    ap.add_argument(
+        "--ttl",
+        type=float,
+        default=DEFAULT_TTL_DAYS,
+        help=f"Forget articles indexed more than this many days ago (default {DEFAULT_TTL_DAYS})",
+    )
+    ap.add_argument(
+        "-g",
+        "--group",
+        metavar="ID",
+        help="Print the copies dropped in favour of article ID as JSON and exit",
+    )
+    return ap.parse_args(argv)
+
+
+def records(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except JSONDecodeError as e:
+            sys.stderr.write(f"JSON: {e}\n{line}\n")
+
+
+def near_dupes(records, index: NearDupeIndex, metrics: StageMetrics = None):
+    """Yield the records that aren't near duplicates, in input order, each as
+    soon as it has been checked against the index."""
+    dropped = 0
+
+    for data in records:
+        if not data.get("text") or "id" not in data:
+            yield data
+            continue
+
+        start = time.perf_counter()
+        sig = signature(data["text"])
+        match = index.match(sig, data["id"])
+        if metrics:
+            metrics.latency(time.perf_counter() - start)
+        if match is None:
+            index.add(data["id"], data.get("source", ""), data.get("link", ""), sig)
+            yield data
+            continue
+
+        id, source, link = match
+        dropped += 1
+        index.add_duplicate(
+            data["id"], id, data.get("source", ""), data.get("link", "")
+        )
+        print(
+            f"NEARDUP\t{data['id']}\t{data.get('source', '')}\t{id}\t{source}\t{link}",
+            file=sys.stderr,
+        )
+
+    print(f"Near duplicates dropped: {dropped}", file=sys.stderr)
+    if metrics:
+        metrics.note("dropped", dropped)
+
+
+def main():
+    args = cmdargs()
+    index = NearDupeIndex(args.cache, args.threshold, args.ttl)
+    if args.group:
+        print(dumps(index.duplicates(args.group)))
+        index.close()
+        return
+    metrics = StageMetrics("near_dupes")
+
+    for data in near_dupes(records(metrics.lines(sys.stdin)), index, metrics):
+        out = dumps(data)
+        print(out)
+        metrics.out(out)
+
+    index.close()
+    metrics.close()
+
+
+if __name__ == "__main__":
+    main()
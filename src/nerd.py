@@ -14,12 +14,29 @@ from time import sleep
 from lib.ollamaai import OllamaAI
 from lib.groqaai import GroqAI
 from lib.geminiai import GeminiAI
+from lib.llm_cache import LLMCache
 
-"""model name, [groq ollama] default ollama"""
+"""model name, [groq ollama] default ollama, --no-cache to bypass the LLM cache"""
 
 # https://github.com/CodeAKrome/ollama-chat/blob/main/ollama_chat.py#L1431
 
 MODEL = "llama3.1:70b"
+YES_NO = re.compile(r"\b(yes|no)\b", re.I)
+# Set to an LLMCache in __main__ unless run with --no-cache.
+llm_cache = None
+
+
+def says(system, prompt):
+    """assistant.says(prompt), answered from llm_cache when it can be. Only
+    yes or no answers are cached, anything else is asked again next time."""
+    if llm_cache is not None:
+        raw = llm_cache.response(model, system, prompt)
+        if raw is not None:
+            return raw
+    raw = assistant.says(prompt)
+    if llm_cache is not None and YES_NO.search(raw or ""):
+        llm_cache.store(model, system, prompt, raw)
+    return raw
 
 
 @cache
@@ -100,7 +117,7 @@ WORK_OF_ART	name of work of art	Mona Lisa, Star Wars
 
     for person, summ in usual_suspects.items():
         prompt = f"Is <{tag}>{suspect}</{tag}> in the following example:\n<example>{sentence}</example>\nthe same as <{tag}>{person}</{tag}> in the following summary:\n<summary>{summ}</summary>\nAnswer 'yes' or 'no'.\n"
-        raw = assistant.says(prompt)
+        raw = says(system, prompt)
 
         sys.stderr.write(f"RAW: {raw}\n")
 
@@ -306,6 +323,10 @@ if __name__ == "__main__":
     nerd_map = {}
     model = MODEL
 
+    no_cache = "--no-cache" in sys.argv
+    if no_cache:
+        sys.argv.remove("--no-cache")
+
     if len(sys.argv) > 1:
         model = sys.argv[1]
 
@@ -323,6 +344,9 @@ if __name__ == "__main__":
     if assistant_name == "Ollama":
         assistant = OllamaAI(model=model)
 
+    if not no_cache:
+        llm_cache = LLMCache()
+
     sys.stderr.write(
         f"\n===\nUsing model: {MODEL} with assistant {assistant_name}\n===\n"
     )
@@ -330,6 +354,10 @@ if __name__ == "__main__":
     # main(assistant, nerd_map)
     readstd(procart)
 
+    if llm_cache is not None:
+        sys.stderr.write(f"\nLLM cache: {llm_cache.stats()}\n")
+        llm_cache.close()
+
     lap = perf_counter() - run_start_time
     lap = lap / 60
     sys.stderr.write(f"\nTotal Run time: {lap:.2f} min.\n")
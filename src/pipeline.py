@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run the article pipeline, Makefile run1 through recent, in one process.
+Records pass between the stages as dicts over bounded queues (lib/dag), so
+nothing is parsed twice and no stage pays for starting Python and loading its
+imports. Fetching, cleaning and tagging overlap; dedupe has to see the whole
+run before it can learn its repeated sentences, so the LLM starts only once
+tagging is done. Every stage writes the same checkpoint file as its make
+target, so --from can start at any of them and the make targets after bias
+work as before. Stage options are the options of the stage's own script, e.g.
+-o read_article="-w 32" -o bias="-b 4 prompt/lcr_reason_exam4k.txt". Each
+stage only takes the articles the run manifest (lib/manifest) doesn't have
+down as done by it, so a replay from a checkpoint redoes nothing a finished
+run already did, only what failed; --all ignores the manifest. --parquet also
+writes a columnar copy of each checkpoint (lib/columnar).
+"""
+
+import sys
+import json
+import shlex
+import argparse
+from dataclasses import asdict
+from functools import partial
+from lib.dag import Pipeline, Stage, pushed, unblocked, DEFAULT_QUEUE_SIZE
+from lib.metrics import StageMetrics, run_id
+from lib.manifest import RunManifest, DEFAULT_MANIFEST
+
+DEFAULT_FEEDS = "config/political_feeds.tsv"
+DEFAULT_PROMPT = "prompt/lcr_reason_exam4k.txt"
+
+
+def read_rss_stage(argv: list) -> Stage:
+    import read_rss
+    from lib.feed_cache import FeedCache
+
+    args = read_rss.cmdargs(argv)
+    metrics = StageMetrics("read_rss")
+
+    def run(lines):
+        feed_cache = None if args.no_cache else FeedCache(args.cache)
+        reader = read_rss.ReadRss(feed_cache, metrics)
+        for records in reader.fetch_all(
+            reader.feeds(lines), args.workers, args.per_host, args.timeout
+        ):
+            for rec in records:
+                yield asdict(rec)
+        if feed_cache:
+            feed_cache.save()
+            metrics.track("feeds", feed_cache)
+
+    return Stage("read_rss", run, metrics=metrics)
+
+
+def dedupe_titles_stage(argv: list) -> Stage:
+    import dedupe_titles
+
+    return Stage("dedupe_titles", dedupe_titles.dedupe_titles)
+
+
+def tallyman_stage(argv: list) -> Stage:
+    import tallyman
+
+    metrics = StageMetrics("tallyman")
+    return Stage("tallyman", partial(tallyman.tally, metrics=metrics), metrics=metrics)
+
+
+def read_article_stage(argv: list) -> Stage:
+    import read_article
+    from lib.page_cache import PageCache
+
+    args = read_article.cmdargs(argv)
+    metrics = StageMetrics("read_article")
+
+    def run(records):
+        page_cache = None
+        if not args.no_cache:
+            page_cache = PageCache(args.cache_dir, args.cache_ttl, args.cache_mb)
+        processor = read_article.RSSFeedProcessor(page_cache, args.extractor, metrics)
+        yield from processor.fetched(
+            records, args.workers, args.rate, args.retries, args.window
+        )
+        metrics.note("failed", processor.bad)
+        if page_cache:
+            expired = page_cache.expire()
+            print(
+                f"page cache: {page_cache.hits} hits {page_cache.misses} misses "
+                f"{expired} expired",
+                file=sys.stderr,
+            )
+            page_cache.close()
+            metrics.track("pages", page_cache)
+
+    return Stage("read_article", run, metrics=metrics)
+
+
+def boilerplate_stage(argv: list) -> Stage:
+    import boilerplate
+    from lib.boilerplate import Boilerplate
+
+    args = boilerplate.cmdargs(argv)
+    metrics = StageMetrics("boilerplate")
+
+    def run(records):
+        # The grep '"art"' in front of run4: only articles have pages.
+        records = (data for data in records if data.get("flavor") == "art")
+        model = Boilerplate(args.cache, args.threshold, args.min_chars, args.ttl)
+        try:
+            yield from boilerplate.strip_boilerplate(records, model, metrics)
+        finally:
+            model.close()
+
+    return Stage("boilerplate", run, metrics=metrics)
+
+
+def kill_shorty_stage(argv: list) -> Stage:
+    import kill_shorty
+
+    args = kill_shorty.cmdargs(argv)
+    killwords = kill_shorty.load_killfile(args.killfile)
+    return Stage(
+        "kill_shorty",
+        partial(
+            kill_shorty.kill_one, killwords=killwords, min_length=args.min_length
+        ),
+        per_record=True,
+    )
+
+
+def near_dupes_stage(argv: list) -> Stage:
+    import near_dupes
+    from lib.minhash import NearDupeIndex
+
+    args = near_dupes.cmdargs(argv)
+    metrics = StageMetrics("near_dupes")
+
+    def run(records):
+        index = NearDupeIndex(args.cache, args.threshold, args.ttl)
+        try:
+            yield from near_dupes.near_dupes(records, index, metrics)
+        finally:
+            index.close()
+
+    return Stage("near_dupes", run, metrics=metrics)
+
+
+def flair_news_stage(argv: list) -> Stage:
+    import flair_news
+
+    args = flair_news.cmdargs(argv)
+    metrics = StageMetrics("flair_news")
+    cache = None if args.no_cache else args.cache
+    sentence_cache = None if args.no_cache else args.sentence_cache
+    init = (
+        args.server,
+        args.mini_batch,
+        args.tsc_batch,
+        cache,
+        sentence_cache,
+        args.cache_mb,
+    )
+
+    def run(records):
+        hits = misses = 0
+        for output, (h, m), seconds in flair_news.tag_all(
+            records,
+            flair_news.tag_records,
+            args.batch,
+            args.workers,
+            init,
+            "spawn",
+        ):
+            hits += h
+            misses += m
+            for data in output:
+                # Records are tagged together, so each gets its share of the batch.
+                metrics.latency(seconds / len(output))
+                yield data
+        if cache:
+            print(f"ner cache: {hits} hits {misses} misses", file=sys.stderr)
+            metrics.cache("ner", hits, misses)
+
+    return Stage("flair_news", run, metrics=metrics)
+
+
+def dedupe_stage(argv: list) -> Stage:
+    """run6init and run6: learning the repeated sentences needs every record
+    first, so this stage holds the whole run."""
+    import dedupe
+    import dedupe_init
+
+    metrics = StageMetrics("dedupe")
+
+    def run(records):
+        records = list(records)
+        deadlines = dedupe_init.find_deadlines(records)
+        dedupe_init.save_deadlines(deadlines)
+        dedupe_init.report(deadlines, sys.stderr)
+        yield from dedupe.dedupe(records, deadlines)
+
+    return Stage("dedupe", run, metrics=metrics)
+
+
+def bias_stage(argv: list) -> Stage:
+    import asyncio
+    import litellm_ai
+
+    args = litellm_ai.cmdargs(argv)
+
+    def classify(records, emit):
+        classifier = litellm_ai.open_classifier(args)
+
+        async def finished(results):
+            for data in results:
+                if data is not None:
+                    # Waits for room downstream on a thread, not on the loop.
+                    await asyncio.to_thread(emit, data)
+
+        items = unblocked(litellm_ai.articles(records))
+        try:
+            asyncio.run(classifier.run(items, args.unordered, finished))
+        finally:
+            classifier.journal.close()
+        litellm_ai.close_classifier(classifier, args)
+
+    return Stage("bias", partial(pushed, classify), metrics=litellm_ai.metrics)
+
+
+def recent_stage(argv: list) -> Stage:
+    import recent
+    from lib.article_store import ArticleStore
+
+    args = recent.cmdargs(argv)
+    metrics = StageMetrics("recent")
+
+    def run(records):
+        store = ArticleStore(args.store, args.keep_days)
+        try:
+            for data in records:
+                store.add(data)
+                yield data
+            expired = store.expire()
+            count = recent.write_window(store, args.days, args.output, args.parquet)
+        finally:
+            store.close()
+        skipped = stage.delta.skipped if stage.delta else 0
+        recent.report(store, skipped, expired, count, args.days)
+        metrics.note("stored", store.added)
+
+    stage = Stage("recent", run, metrics=metrics)
+    return stage
+
+
+# name, builder, checkpoint, default options. Checkpoints are the files the
+# Makefile's run targets write.
+STAGES = [
+    ("read_rss", read_rss_stage, "cache/read_rss.jsonl", []),
+    ("dedupe_titles", dedupe_titles_stage, None, []),
+    ("tallyman", tallyman_stage, "cache/tallyman.jsonl", []),
+    ("read_article", read_article_stage, "cache/read_article.jsonl", []),
+    ("boilerplate", boilerplate_stage, None, []),
+    ("kill_shorty", kill_shorty_stage, None, ["config/kill.txt"]),
+    ("near_dupes", near_dupes_stage, "cache/art.jsonl", []),
+    ("flair_news", flair_news_stage, "cache/flair_news.jsonl", []),
+    ("dedupe", dedupe_stage, "cache/dedupe_deduped.jsonl", []),
+    ("bias", bias_stage, "cache/dedupe_bias.jsonl", [DEFAULT_PROMPT]),
+    ("recent", recent_stage, None, ["-o", "cache/dedupe.jsonl"]),
+]
+NAMES = [name for name, _, _, _ in STAGES]
+
+
+def cmdargs():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument(
+        "-f",
+        "--feeds",
+        default=DEFAULT_FEEDS,
+        help=f"Feed list read_rss starts from (default {DEFAULT_FEEDS})",
+    )
+    ap.add_argument(
+        "--from",
+        dest="start",
+        choices=NAMES,
+        default=NAMES[0],
+        help="First stage to run, reading the checkpoint of the one before it",
+    )
+    ap.add_argument(
+        "--until",
+        choices=NAMES,
+        default=NAMES[-1],
+        help="Last stage to run",
+    )
+    ap.add_argument(
+        "-o",
+        "--opts",
+        action="append",
+        default=[],
+        metavar="STAGE=ARGS",
+        help="Arguments for a stage, as its own script takes them; replaces the defaults",
+    )
+    ap.add_argument(
+        "-m",
+        "--manifest",
+        default=DEFAULT_MANIFEST,
+        help=f"Run manifest of what each stage has done (default {DEFAULT_MANIFEST})",
+    )
+    ap.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Process every record given, even ones a finished run already did",
+    )
+    ap.add_argument(
+        "-p",
+        "--parquet",
+        action="store_true",
+        help="Also write each checkpoint as Parquet, articles and NER spans",
+    )
+    ap.add_argument(
+        "-q",
+        "--queue",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Records waiting between two stages at most (default {DEFAULT_QUEUE_SIZE})",
+    )
+    return ap.parse_args()
+
+
+def stage_options(opts: list) -> dict:
+    options = {name: argv for name, _, _, argv in STAGES}
+    for opt in opts:
+        name, _, argv = opt.partition("=")
+        if name not in options:
+            sys.exit(f"No stage {name}, stages are: {' '.join(NAMES)}")
+        options[name] = shlex.split(argv)
+    return options
+
+
+def checkpoint_records(file_path):
+    with open(file_path) as f:
+        for lno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                sys.stderr.write(f"{file_path} line {lno}: {e}\n")
+
+
+def main():
+    args = cmdargs()
+    first, last = NAMES.index(args.start), NAMES.index(args.until)
+    if first > last:
+        sys.exit(f"--from {args.start} comes after --until {args.until}")
+    if first == 0:
+        source = open(args.feeds)
+    else:
+        checkpoint = STAGES[first - 1][2]
+        if checkpoint is None:
+            sys.exit(f"No checkpoint to start {args.start} from: {NAMES[first - 1]}")
+        source = checkpoint_records(checkpoint)
+
+    options = stage_options(args.opts)
+    if args.parquet:
+        from lib.columnar import ColumnarWriter, require
+
+        try:
+            require()
+        except ImportError as e:
+            sys.exit(str(e))
+    manifest = RunManifest(args.manifest)
+    run = run_id()
+    stages = []
+    for name, build, checkpoint, _ in STAGES[first : last + 1]:
+        stage = build(options[name])
+        stage.checkpoint = checkpoint
+        stage.queue_size = args.queue
+        stage.delta = manifest.delta(name, run, checkpoint)
+        if args.all:
+            stage.delta.seen = set()
+        if args.parquet and checkpoint:
+            stage.sinks.append(ColumnarWriter(checkpoint))
+        stages.append(stage)
+
+    try:
+        Pipeline(stages).run(source)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    finally:
+        manifest.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,27 @@ import requests
 from queue import Queue
 import threading
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 import logging
-from bs4 import BeautifulSoup
-import html
-import re
-import lxml
 
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 import itertools
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+from lib.rate_limit import RateLimiter
+from lib.extract import extractor, EXTRACTORS, DEFAULT_EXTRACTOR
+from lib.metrics import StageMetrics
+from lib.page_cache import (
+    PageCache,
+    DEFAULT_PAGE_CACHE,
+    DEFAULT_TTL_HOURS,
+    DEFAULT_MAX_MB,
+)
 
 
 class UserAgentCycler:
@@ -33,7 +42,16 @@ class UserAgentCycler:
         return next(self.agent_cycle)
 
 
+USER_AGENT = UserAgentCycler.USER_AGENTS[0]
 SLEEP_TIME = 1
+# Concurrent fetching: total requests in flight, and requests per second to any
+# one domain, which keeps the old one request per SLEEP_TIME politeness per site.
+DEFAULT_WORKERS = 16
+DEFAULT_RATE = 1 / SLEEP_TIME
+DEFAULT_RETRIES = 3
+# Records read ahead of the fetchers, and how often output is flushed downstream.
+DEFAULT_WINDOW = 256
+DEFAULT_FLUSH = 10
 
 # Create a logger
 logging.basicConfig(
@@ -71,7 +89,15 @@ class QueueWorker(threading.Thread):
 
 
 class RSSFeedProcessor:
-    def __init__(self):
+    def __init__(
+        self,
+        page_cache: PageCache = None,
+        engine=DEFAULT_EXTRACTOR,
+        metrics: StageMetrics = None,
+    ):
+        self.page_cache = page_cache
+        self.metrics = metrics
+        self.extract = extractor(engine)
         self.data = []
         self.queues = defaultdict(Queue)
         self.processed_data = []
@@ -132,6 +158,159 @@ class RSSFeedProcessor:
         return (good, bad)
         # return results
 
+    def make_session(self, retries=DEFAULT_RETRIES, pool=1):
+        session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool, pool_maxsize=pool)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def domain(record) -> str:
+        return urlsplit(record.get("link", "")).netloc.lower()
+
+    def iter_stdin(self):
+        """Yield records from stdin one at a time instead of loading them all."""
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            if self.metrics:
+                self.metrics.into(line)
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.error(f"Invalid JSON: {line}")
+
+    def fetch_concurrent(
+        self,
+        records,
+        workers=DEFAULT_WORKERS,
+        rate=DEFAULT_RATE,
+        retries=DEFAULT_RETRIES,
+        window=DEFAULT_WINDOW,
+        flush_every=DEFAULT_FLUSH,
+    ):
+        """Print each record as soon as fetched() has its text."""
+        for n, record in enumerate(
+            self.fetched(records, workers, rate, retries, window), start=1
+        ):
+            self.emit(record)
+            if n % flush_every == 0:
+                sys.stdout.flush()
+        sys.stdout.flush()
+        return (self.good, self.bad)
+
+    def fetched(
+        self,
+        records,
+        workers=DEFAULT_WORKERS,
+        rate=DEFAULT_RATE,
+        retries=DEFAULT_RETRIES,
+        window=DEFAULT_WINDOW,
+    ):
+        """Fetch on a thread pool with a token bucket per domain, yielding each
+        record as soon as it has its text. Throughput grows with the number of
+        distinct sites while each site still sees at most rate requests/sec.
+        Counts land in self.good and self.bad.
+
+        records is read lazily: at most window records wait in a lookahead buffer,
+        handed out round robin by domain, and 2 * workers are in flight, so memory
+        stays flat however long the input is."""
+        self.good = 0
+        self.bad = 0
+        limiter = RateLimiter(rate)
+        cycler = UserAgentCycler()
+        local = threading.local()
+
+        def fetch(record):
+            if self.metrics:
+                with self.metrics.timed():
+                    return fetch_one(record)
+            return fetch_one(record)
+
+        def fetch_one(record):
+            if not hasattr(local, "session"):
+                local.session = self.make_session(retries)
+                with self.lock:
+                    local.session.headers.update(
+                        {"User-Agent": cycler.get_next_agent()}
+                    )
+            doc = self.page_cache.get(record["link"]) if self.page_cache else None
+            if doc is None:
+                limiter.acquire(self.domain(record))
+                response = local.session.get(record["link"], timeout=10)
+                response.raise_for_status()
+                doc = response.text
+                if self.page_cache:
+                    self.page_cache.put(record["link"], doc)
+            record["text"] = self.paragraph_text(doc)
+            return record
+
+        source = iter(records)
+        exhausted = False
+        pending = defaultdict(deque)  # domain -> records not yet submitted
+        domains = deque()  # round robin order of domains with pending records
+        buffered = 0
+        inflight = {}
+        progress = tqdm(desc="Pulling articles", unit="article")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                while not exhausted and buffered < window:
+                    record = next(source, None)
+                    if record is None:
+                        exhausted = True
+                        break
+                    domain = self.domain(record)
+                    if not pending[domain]:
+                        domains.append(domain)
+                    pending[domain].append(record)
+                    buffered += 1
+
+                while buffered and len(inflight) < 2 * workers:
+                    domain = domains.popleft()
+                    record = pending[domain].popleft()
+                    buffered -= 1
+                    if pending[domain]:
+                        domains.append(domain)
+                    else:
+                        del pending[domain]
+                    inflight[executor.submit(fetch, record)] = record
+
+                if not inflight:
+                    break
+
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = inflight.pop(future)
+                    progress.update(1)
+                    try:
+                        result = future.result()
+                    except (requests.RequestException, KeyError) as e:
+                        self.bad += 1
+                        logger.error(f"{record.get('link')}: {e}")
+                        continue
+                    self.good += 1
+                    yield result
+
+        progress.close()
+
+    def emit(self, item):
+        try:
+            out = json.dumps(item)
+            print(out)
+            if self.metrics:
+                self.metrics.out(out)
+        except Exception as e:
+            sys.stderr.write(f"\n\nitem: {item}\t{e}\n")
+
     def get_article(self, link_field="link", groupby="source", output="text"):
         for item in self.data:
             group = item.get(groupby, "default")
@@ -153,20 +332,7 @@ class RSSFeedProcessor:
 
     def paragraph_text(self, doc: str) -> str:
         """Return the text content of paragraph html tags"""
-        soup = BeautifulSoup(
-            doc, features="xml"
-        )  # Use lxml parser for better performance
-        paragraphs = soup.find_all("p")
-        result = []
-        for p in paragraphs:
-            # Replace HTML entities with UTF-8 entities
-            text = html.unescape(str(p))
-            text = BeautifulSoup(text, features="xml").get_text()
-            text = re.sub("\n", "", text)
-            # Remove any remaining HTML tags
-            text = re.sub("<[^<]+?>", "", text)
-            result.append(text)
-        return " ".join(result)
+        return self.extract(doc)
 
     def fetch_and_store(self, item, link_field, output):
         url = item.get(link_field)
@@ -205,9 +371,110 @@ class RSSFeedProcessor:
             # sys.stdout.flush()
 
 
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Add the paragraph text of each article link read from stdin."
+    )
+    ap.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Articles fetched in parallel (default {DEFAULT_WORKERS})",
+    )
+    ap.add_argument(
+        "-r",
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help=f"Requests per second to any one domain (default {DEFAULT_RATE})",
+    )
+    ap.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=f"Retries with backoff on connection errors, 429 and 5xx (default {DEFAULT_RETRIES})",
+    )
+    ap.add_argument(
+        "--window",
+        type=int,
+        default=DEFAULT_WINDOW,
+        help=f"Input records read ahead of the fetchers (default {DEFAULT_WINDOW})",
+    )
+    ap.add_argument(
+        "--flush",
+        type=int,
+        default=DEFAULT_FLUSH,
+        help=f"Flush stdout every this many records (default {DEFAULT_FLUSH})",
+    )
+    ap.add_argument(
+        "-b",
+        "--buffered",
+        action="store_true",
+        help="Old behaviour: read everything, fetch one at a time, print at the end",
+    )
+    ap.add_argument(
+        "--cache-dir",
+        default=DEFAULT_PAGE_CACHE,
+        help=f"Page cache directory (default {DEFAULT_PAGE_CACHE})",
+    )
+    ap.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_HOURS,
+        help=f"Hours a cached page stays fresh (default {DEFAULT_TTL_HOURS})",
+    )
+    ap.add_argument(
+        "--cache-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        help=f"Page cache size cap in MB, least recently used go first (default {DEFAULT_MAX_MB})",
+    )
+    ap.add_argument(
+        "-e",
+        "--extractor",
+        choices=list(EXTRACTORS),
+        default=DEFAULT_EXTRACTOR,
+        help=f"Paragraph text extractor, see tools/bench_extract.py (default {DEFAULT_EXTRACTOR})",
+    )
+    ap.add_argument(
+        "-n",
+        "--no-cache",
+        action="store_true",
+        help="Always fetch from the network",
+    )
+    return ap.parse_args(argv)
+
+
 if __name__ == "__main__":
-    processor = RSSFeedProcessor()
-    processor.read_from_stdin()
-    # processor.get_article()
-    processor.fetch_urls()
-    processor.output_data()
+    args = cmdargs()
+    page_cache = None
+    if not args.no_cache:
+        page_cache = PageCache(args.cache_dir, args.cache_ttl, args.cache_mb)
+    metrics = StageMetrics("read_article")
+    processor = RSSFeedProcessor(page_cache, args.extractor, metrics)
+    if args.buffered:
+        processor.read_from_stdin()
+        # processor.get_article()
+        processor.fetch_urls()
+        processor.output_data()
+    else:
+        good, bad = processor.fetch_concurrent(
+            processor.iter_stdin(),
+            args.workers,
+            args.rate,
+            args.retries,
+            args.window,
+            args.flush,
+        )
+        metrics.note("failed", bad)
+    if page_cache:
+        expired = page_cache.expire()
+        print(
+            f"page cache: {page_cache.hits} hits {page_cache.misses} misses "
+            f"{expired} expired",
+            file=sys.stderr,
+        )
+        page_cache.close()
+        metrics.track("pages", page_cache)
+    metrics.close()
@@ -8,13 +8,22 @@ import sys
 import json
 import re
 import html
+import argparse
+import threading
+import itertools
+from collections import defaultdict
+from urllib.parse import urlsplit
 
 # from icecream import ic
 from lib.util.decor import arrest
+from lib.util.log import logger
+from lib.feed_cache import FeedCache, DEFAULT_FEED_CACHE
+from lib.metrics import StageMetrics
 from dataclasses import dataclass, asdict, field
 
 import feedparser
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import urllib.request
 import urllib.error
 import socket
 
@@ -25,6 +34,9 @@ VALID_RECORD = re.compile(
 )
 FORMAT_ERROR = "Invalid input format. Should be 3 tab delimited columns: 2 letter language code, feed name (starting with a letter, then alphanumerics) and feed URL."
 DEFAULT_TIMEOUT = 30
+# Total feeds fetched at once and the most any single host sees at a time.
+DEFAULT_WORKERS = 16
+DEFAULT_PER_HOST = 2
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
 
@@ -84,8 +96,9 @@ class Feed:
 
 
 class ReadRss(BaseException):
-    def __init__(self):
-        pass
+    def __init__(self, feed_cache: FeedCache = None, metrics: StageMetrics = None):
+        self.feed_cache = feed_cache
+        self.metrics = metrics
 
     @arrest([ValueError], "Invalid feed entry in input.")
     def validate_feed(self, line) -> FeedRecord:
@@ -108,65 +121,100 @@ class ReadRss(BaseException):
 
     @arrest([ValueError], "Couldn't read RSS feed, maybe 403 forbidden.")
     def read_rss(self, feed_rec: Feed, timeout=DEFAULT_TIMEOUT) -> FeedRecord:
+        self.emit(self.fetch_feed(feed_rec, timeout))
+
+    def emit(self, records: list) -> None:
+        """Write a feed's records to stdout in one go so feeds never interleave."""
+        if records:
+            out = "".join(f"{rec}\n" for rec in records)
+            sys.stdout.write(out)
+            sys.stdout.flush()
+            if self.metrics:
+                self.metrics.out(out, len(records))
+
+    def fetch_feed(self, feed_rec: Feed, timeout=DEFAULT_TIMEOUT) -> list:
+        """Fetch and parse one feed. Returns the FeedRecord followed by its Articles,
+        or nothing if the feed cache says it hasn't changed since the last run."""
+        if self.metrics:
+            with self.metrics.timed():
+                return self._fetch_feed(feed_rec, timeout)
+        return self._fetch_feed(feed_rec, timeout)
+
+    def _fetch_feed(self, feed_rec: Feed, timeout) -> list:
+        headers = {"User-Agent": USER_AGENT}
+        if self.feed_cache:
+            headers.update(self.feed_cache.headers(feed_rec.url))
         try:
-            req = urllib.request.Request(
-                feed_rec.url, headers={"User-Agent": USER_AGENT}
-            )
+            req = urllib.request.Request(feed_rec.url, headers=headers)
             with urllib.request.urlopen(req, timeout=timeout) as response:
                 data = response.read()
-                records = feedparser.parse(data)
-                # ic(records)
-                rec = FeedRecord(
+                etag = response.headers.get("ETag")
+                modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and self.feed_cache:
+                self.feed_cache.not_modified(feed_rec.url)
+                return []
+            raise ValueError(f"Error fetching RSS feed from {feed_rec.url} {e}")
+        except (urllib.error.URLError, socket.timeout) as e:
+            raise ValueError(f"Error fetching RSS feed from {feed_rec.url} {e}")
+        if self.feed_cache and not self.feed_cache.changed(
+            feed_rec.url, data, etag, modified
+        ):
+            return []
+        return self.parse_feed(feed_rec, data)
+
+    def parse_feed(self, feed_rec: Feed, data: bytes) -> list:
+        records = feedparser.parse(data)
+        # ic(records)
+        rec = FeedRecord(
+            lang=feed_rec.lang,
+            source=feed_rec.source,
+            link=feed_rec.url,
+            title=records.feed.title,
+            subtitle=records.feed.subtitle,
+        )
+
+        if "language" in records.feed:
+            rec.language = records.feed.language
+        out = [rec]
+        # print(dir(records))
+        if records and len(records.entries) > 0:
+            for entry in records.entries:
+                # ic(entry)
+                article = Article(
                     lang=feed_rec.lang,
                     source=feed_rec.source,
-                    link=feed_rec.url,
-                    title=records.feed.title,
-                    subtitle=records.feed.subtitle,
+                    title=entry.title,
+                    link=entry.link,
                 )
 
-                if "language" in records.feed:
-                    rec.language = records.feed.language
-                print(rec)
-                # print(dir(records))
-                if records and len(records.entries) > 0:
-                    for entry in records.entries:
-                        # ic(entry)
-                        article = Article(
-                            lang=feed_rec.lang,
-                            source=feed_rec.source,
-                            title=entry.title,
-                            link=entry.link,
-                        )
-
-                        # Main image entry. Detect other type of media.
-                        if "media_content" in entry:
-                            article.media_content = entry.media_content
-                        if "media_thumbnail" in entry:
-                            article.media_thumbnail = entry.media_thumbnail
-
-                        if "summary" in entry:
-                            article.summary = self.html2txt(entry.summary)
-                        if "tags" in entry:
-                            article.tags = [tag.term for tag in entry.tags]
-                        # Fold fields updated and updated_parsed onto published and published_parsed
-                        if "published" not in entry and "updated" in entry:
-                            article.published = entry["updated"]
-                        if (
-                            "published_parsed" not in entry
-                            and "updated_parsed" in entry
-                        ):
-                            article.published_parsed = entry["updated_parsed"]
-                        if "published" in entry:
-                            article.published = entry.published
-                        if "published_parsed" in entry:
-                            article.published_parsed = entry.published_parsed
-                        print(article)
-
-        except (urllib.error.HTTPError, urllib.error.URLError, socket.timeout) as e:
-            raise ValueError(f"Error fetching RSS feed from {feed_rec.url} {e}")
+                # Main image entry. Detect other type of media.
+                if "media_content" in entry:
+                    article.media_content = entry.media_content
+                if "media_thumbnail" in entry:
+                    article.media_thumbnail = entry.media_thumbnail
+
+                if "summary" in entry:
+                    article.summary = self.html2txt(entry.summary)
+                if "tags" in entry:
+                    article.tags = [tag.term for tag in entry.tags]
+                # Fold fields updated and updated_parsed onto published and published_parsed
+                if "published" not in entry and "updated" in entry:
+                    article.published = entry["updated"]
+                if "published_parsed" not in entry and "updated_parsed" in entry:
+                    article.published_parsed = entry["updated_parsed"]
+                if "published" in entry:
+                    article.published = entry.published
+                if "published_parsed" in entry:
+                    article.published_parsed = entry.published_parsed
+                out.append(article)
+        return out
 
-    def read(self):
-        for i, line in enumerate(sys.stdin, start=1):
+    def feeds(self, lines=None):
+        """Yield validated feed sources from lines, stdin by default."""
+        if lines is None:
+            lines = self.metrics.lines(sys.stdin) if self.metrics else sys.stdin
+        for i, line in enumerate(lines, start=1):
             line = line.strip()
             if not line:
                 continue
@@ -174,12 +222,128 @@ class ReadRss(BaseException):
             if line[0] == "#" or line.strip() == "":
                 continue
             feed_rec = self.validate_feed(line)
-            # print(f"{i}: {feed_rec}")
-            feed = self.read_rss(feed_rec)
+            if feed_rec:
+                yield feed_rec
+
+    def read(self, timeout=DEFAULT_TIMEOUT):
+        for feed_rec in self.feeds():
+            # print(f"{feed_rec}")
+            feed = self.read_rss(feed_rec, timeout)
+
+    @staticmethod
+    def interleave_hosts(feed_recs: list) -> list:
+        """Round robin feeds across hosts so one big host doesn't hog the pool."""
+        by_host = defaultdict(list)
+        for feed_rec in feed_recs:
+            by_host[urlsplit(feed_rec.url).netloc.lower()].append(feed_rec)
+        return [
+            feed_rec
+            for batch in itertools.zip_longest(*by_host.values())
+            for feed_rec in batch
+            if feed_rec is not None
+        ]
+
+    def read_concurrent(
+        self,
+        workers=DEFAULT_WORKERS,
+        per_host=DEFAULT_PER_HOST,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        """Fetch feeds in parallel and print them as they come in."""
+        for records in self.fetch_all(self.feeds(), workers, per_host, timeout):
+            self.emit(records)
+
+    def fetch_all(
+        self,
+        feed_recs,
+        workers=DEFAULT_WORKERS,
+        per_host=DEFAULT_PER_HOST,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        """Yield each feed's records as its fetch finishes, at most per_host
+        fetches at once against any one host. Workers only fetch and parse;
+        the caller's thread gets all the records."""
+        feed_recs = self.interleave_hosts(list(feed_recs))
+        # Built up front so worker threads only ever read it.
+        host_limits = {
+            urlsplit(feed_rec.url).netloc.lower(): threading.BoundedSemaphore(per_host)
+            for feed_rec in feed_recs
+        }
+
+        def fetch(feed_rec):
+            with host_limits[urlsplit(feed_rec.url).netloc.lower()]:
+                return self.fetch_feed(feed_rec, timeout)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fetch, feed_rec): feed_rec for feed_rec in feed_recs
+            }
+            for future in as_completed(futures):
+                try:
+                    records = future.result()
+                except Exception as e:
+                    logger.error(f"{futures[future].source}: {e}")
+                    logger.error("Couldn't read RSS feed, maybe 403 forbidden.")
+                    continue
+                yield records
 
     # def (self, feed_record: Feed) -> Feed:
 
 
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Read RSS feeds (lang, source, url) from stdin and emit JSONL."
+    )
+    ap.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Feeds fetched in parallel, 1 reads them one at a time (default {DEFAULT_WORKERS})",
+    )
+    ap.add_argument(
+        "-p",
+        "--per-host",
+        type=int,
+        default=DEFAULT_PER_HOST,
+        help=f"Max concurrent fetches against one host (default {DEFAULT_PER_HOST})",
+    )
+    ap.add_argument(
+        "-t",
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"Per feed timeout in seconds (default {DEFAULT_TIMEOUT})",
+    )
+    ap.add_argument(
+        "-c",
+        "--cache",
+        default=DEFAULT_FEED_CACHE,
+        help=f"ETag/Last-Modified store for conditional GETs (default {DEFAULT_FEED_CACHE})",
+    )
+    ap.add_argument(
+        "-n",
+        "--no-cache",
+        action="store_true",
+        help="Fetch and parse every feed even if unchanged since the last run",
+    )
+    return ap.parse_args(argv)
+
+
 if __name__ == "__main__":
-    processor = ReadRss()
-    processor.read()
+    args = cmdargs()
+    metrics = StageMetrics("read_rss")
+    feed_cache = None if args.no_cache else FeedCache(args.cache)
+    processor = ReadRss(feed_cache, metrics)
+    if args.workers > 1:
+        processor.read_concurrent(args.workers, args.per_host, args.timeout)
+    else:
+        processor.read(args.timeout)
+    if feed_cache:
+        feed_cache.save()
+        print(
+            f"feed cache: {feed_cache.hits} unchanged {feed_cache.misses} changed",
+            file=sys.stderr,
+        )
+        metrics.track("feeds", feed_cache)
+    metrics.close()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Add finished articles to the article store (lib/article_store) and write the
+ones published in the last --days, first article per title. This replaces
+cat-ing every dedupe_*.jsonl of the last three days through dedupe_titles.py
+and date_filter.py: articles the run manifest says were stored by an earlier
+run are skipped, so a run costs its new articles, not the whole window.
+Reads the JSONL files given, or stdin. With --parquet and --output the window
+is also written as Parquet (lib/columnar) for columns.py. Seed an empty store with
+  recent.py --all `find cache -name 'dedupe_*.jsonl' -newermt '3 day ago'`
+"""
+
+import sys
+import json
+import argparse
+import fileinput
+from lib.metrics import StageMetrics, run_id
+from lib.manifest import RunManifest, DEFAULT_MANIFEST
+from lib.article_store import (
+    ArticleStore,
+    DEFAULT_STORE,
+    DEFAULT_WINDOW_DAYS,
+    DEFAULT_KEEP_DAYS,
+)
+
+STAGE = "recent"
+
+
+def cmdargs(argv=None):
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("files", nargs="*", help="JSONL files of finished articles")
+    ap.add_argument(
+        "-d",
+        "--days",
+        type=float,
+        default=DEFAULT_WINDOW_DAYS,
+        help=f"Write the articles published in this many days (default {DEFAULT_WINDOW_DAYS})",
+    )
+    ap.add_argument(
+        "-o",
+        "--output",
+        help="File to write the window to (default stdout)",
+    )
+    ap.add_argument(
+        "-s",
+        "--store",
+        default=DEFAULT_STORE,
+        help=f"Article store (default {DEFAULT_STORE})",
+    )
+    ap.add_argument(
+        "--keep-days",
+        type=float,
+        default=DEFAULT_KEEP_DAYS,
+        help=f"Drop articles published longer ago from the store (default {DEFAULT_KEEP_DAYS})",
+    )
+    ap.add_argument(
+        "-m",
+        "--manifest",
+        default=DEFAULT_MANIFEST,
+        help=f"Run manifest with what was stored before (default {DEFAULT_MANIFEST})",
+    )
+    ap.add_argument(
+        "-p",
+        "--parquet",
+        action="store_true",
+        help="Also write the --output window as Parquet, articles and NER spans",
+    )
+    ap.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Store every article read, even ones an earlier run stored",
+    )
+    return ap.parse_args(argv)
+
+
+def records(lines):
+    """(line, record) for each JSON object line."""
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            yield line, json.loads(line)
+        except json.JSONDecodeError as e:
+            sys.stderr.write(f"JSON: {e}\n{line}\n")
+
+
+def write_window(store: ArticleStore, days: float, output=None, parquet=False) -> int:
+    """Write the window to output, a file name, or stdout, and its Parquet
+    copies if parquet. Returns the count."""
+    out = open(output, "w") if output else sys.stdout
+    columnar = None
+    if parquet and output:
+        from lib.columnar import ColumnarWriter
+
+        columnar = ColumnarWriter(output)
+    count = 0
+    try:
+        for line in store.window(days):
+            out.write(line + "\n")
+            if columnar:
+                columnar.add(json.loads(line), line)
+            count += 1
+    finally:
+        if output:
+            out.close()
+        if columnar:
+            columnar.close()
+    return count
+
+
+def report(store: ArticleStore, skipped: int, expired: int, count: int, days) -> None:
+    print(
+        f"recent: {store.added} stored, {skipped} stored before, "
+        f"{store.undated} without a date, {expired} expired, "
+        f"{count} in the last {days:g} days",
+        file=sys.stderr,
+    )
+
+
+def main():
+    args = cmdargs()
+    metrics = StageMetrics(STAGE)
+    manifest = RunManifest(args.manifest)
+    delta = manifest.delta(STAGE, run_id(), args.store)
+    if args.all:
+        delta.seen = set()
+    store = ArticleStore(args.store, args.keep_days)
+    ok = False
+    try:
+        for line, data in records(metrics.lines(fileinput.input(args.files))):
+            if delta.new(data) and store.add(data, line):
+                delta.out(data)
+        expired = store.expire()
+        count = write_window(store, args.days, args.output, args.parquet)
+        metrics.out(count=count)
+        ok = True
+    finally:
+        delta.finish(ok)
+        store.close()
+        manifest.close()
+    report(store, delta.skipped, expired, count, args.days)
+    metrics.note("stored", store.added)
+    metrics.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 Read RSS/Atom feed URLs from stdin, fetch the first three <link>s per feed,
 print each article’s title + full paragraph text (<p>), and show a concise
 summary at the end.  Every network call times out after 20 s.
+With --cache, article pages are read from and saved to the shared page cache.
 """
 
 from __future__ import annotations
@@ -17,6 +18,8 @@ import feedparser
 import requests
 from bs4 import BeautifulSoup
 
+from lib.page_cache import PageCache
+
 # ---------- global 20-second timeout ----------
 socket.setdefaulttimeout(20)
 
@@ -32,29 +35,38 @@ def clean(text: str) -> str:
     return " ".join(text.split())
 
 
-def fetch_article(link: str) -> Tuple[str, Optional[str]]:
+def fetch_article(
+    link: str, page_cache: Optional[PageCache] = None
+) -> Tuple[str, Optional[str]]:
     """
     Return (paragraph_text, error).
     If error is None, paragraph_text is ready to print.
     """
-    try:
-        resp = requests.get(
-            link,
-            timeout=20,
-            headers={"User-Agent": "RSS-Tester/1.0"},
-        )
-        resp.raise_for_status()
-    except requests.exceptions.Timeout:
-        return "", "Timeout after 20 s"
-    except requests.exceptions.RequestException as exc:
-        return "", str(exc)
-
-    soup = BeautifulSoup(resp.text, "html.parser")
+    doc = page_cache.get(link) if page_cache else None
+    if doc is None:
+        try:
+            resp = requests.get(
+                link,
+                timeout=20,
+                headers={"User-Agent": "RSS-Tester/1.0"},
+            )
+            resp.raise_for_status()
+        except requests.exceptions.Timeout:
+            return "", "Timeout after 20 s"
+        except requests.exceptions.RequestException as exc:
+            return "", str(exc)
+        doc = resp.text
+        if page_cache:
+            page_cache.put(link, doc)
+
+    soup = BeautifulSoup(doc, "html.parser")
     paragraphs = [p.get_text(" ", strip=True) for p in soup.find_all("p")]
     return "\n\n".join(paragraphs), None
 
 
-def process_feed(url: str) -> Tuple[str, FeedStats]:
+def process_feed(
+    url: str, page_cache: Optional[PageCache] = None
+) -> Tuple[str, FeedStats]:
     try:
         feed = feedparser.parse(url)
     except Exception as exc:
@@ -78,7 +90,7 @@ def process_feed(url: str) -> Tuple[str, FeedStats]:
         print(f"Link : {link}")
         print("-" * 72)
 
-        paragraphs, err = fetch_article(link)
+        paragraphs, err = fetch_article(link, page_cache)
         if err:
             first_fail = first_fail or err
             print(f"ERROR: {err}\n")
@@ -98,11 +110,12 @@ def main() -> None:
         print("No URLs supplied on stdin.", file=sys.stderr)
         sys.exit(1)
 
+    page_cache = PageCache() if "--cache" in sys.argv[1:] else None
     summary = {}
     start = time.time()
 
     for url in feed_urls:
-        feed_title, stats = process_feed(url)
+        feed_title, stats = process_feed(url, page_cache)
         summary[url] = (feed_title, stats)
 
     # ---------- final tally ----------
@@ -3,6 +3,7 @@
 import sys
 import subprocess
 import json
+import argparse
 
 # add summaries and generate the TTS jsonl
 
@@ -34,13 +35,24 @@ def runcmd(command):
 
 # -----
 
-if len(sys.argv) > 3:
-    model = sys.argv[1]
-    infile = sys.argv[2]
-    promptfile = sys.argv[3]
-    soundid = sys.argv[4]
-else:
-    sys.exit(1)
+ap = argparse.ArgumentParser(description="Add summaries of the id blocks in stdin.")
+ap.add_argument("model")
+ap.add_argument("infile")
+ap.add_argument("promptfile")
+ap.add_argument("soundid")
+# gemtest.py caches the summaries, these are handed through to it.
+ap.add_argument("-n", "--no-cache", action="store_true")
+ap.add_argument("--cache-ttl", type=float)
+args = ap.parse_args()
+model = args.model
+infile = args.infile
+promptfile = args.promptfile
+soundid = args.soundid
+gemtest_opts = ""
+if args.no_cache:
+    gemtest_opts += " --no-cache"
+if args.cache_ttl is not None:
+    gemtest_opts += f" --cache-ttl {args.cache_ttl}"
 
 for line in sys.stdin:
     if not line:
@@ -53,9 +65,12 @@ for line in sys.stdin:
 
         # sys.stderr.write(f"trig: {line.strip()}\n")
 
-        cmd.append(
-            f"cat {infile} | jq 'select(.id | IN({line.strip()}))' | jq '[.text]' | src/gemtest.py {model} {promptfile}"
-        )
+        if infile.endswith(".parquet"):
+            # Columnar copy (lib/columnar): read just the text of these ids.
+            select = f"src/columns.py {infile} -c text -j -i {line.strip()}"
+        else:
+            select = f"cat {infile} | jq 'select(.id | IN({line.strip()}))' | jq '[.text]'"
+        cmd.append(f"{select} | src/gemtest.py {model} {promptfile}{gemtest_opts}")
     if line[0] == "`":
         trig = trig * -1
 
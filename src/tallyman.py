@@ -1,59 +1,89 @@
 import sys
 from json import loads, dumps
-from lib.file_cache import FileCache as file_cache
+from lib.link_store import LinkStore
+from lib.id_allocator import IdAllocator
+from lib.metrics import StageMetrics
 
 """
 Assign unique, monotonically increasing IDs to each article if not in cache.
 Skip cached articles since they've already been assigned an ID and processed.
+Safe to run several at once: ids come from a shared locked sequence and each
+link is claimed in the store before it is printed.
 """
 
-COUNTERFILE = "cache/counter.json"
-CACHEFILE = "cache/articles.json"
-
-id = 0
-fc = file_cache(CACHEFILE)
-
-# try:
-#     count_fh = open(COUNTERFILE, "r")
-#     idline = count_fh.read()
-#     id = loads(idline)["id"]
-#     count_fh.close()
-# except ValueError as e:
-#     print(f"Invalid JSON: {idline}", file=sys.stderr)
-#     exit(1)
-
-# Check if COUNTERFILE exists, if not initialize id to 0
-try:
-    with open(COUNTERFILE, "r") as count_fh:
-        idline = count_fh.read()
-        try:
-            id = loads(idline)["id"]
-        except ValueError as e:
-            id = 0
-            #            count_fh.close()
-#            id = 0
-#            print(f"Invalid JSON in {COUNTERFILE}: count from file: {idline}", file=sys.stderr)
-#            exit(1)
-except FileNotFoundError:
-    pass
-
-count_fh = open(COUNTERFILE, "w")
-if not id:
-    id = 0
-
-for line in sys.stdin:
-    line = line.strip()
-
-    #    print(f"{line}")
-
-    if not line:
-        continue
-    data = loads(line)
-    if fc.cached(data["link"]):
-        continue
-    fc.put(data["link"], id)
-    data["id"] = id
-    print(dumps(data))
-    id += 1
-count_fh.write(dumps({"id": id}))
-count_fh.close()
+COUNTERFILE = "cache/counter.db"
+CACHEFILE = "cache/articles.db"
+# Pre-SQLite counter and cache, imported on first run.
+LEGACY_COUNTERFILE = "cache/counter.json"
+LEGACY_CACHEFILE = "cache/articles.json"
+# New links claimed per transaction.
+CLAIM_BATCH = 64
+
+
+def records(lines):
+    for line in lines:
+        line = line.strip()
+
+        #    print(f"{line}")
+
+        if not line:
+            continue
+        yield loads(line)
+
+
+def tally(
+    records,
+    metrics: StageMetrics = None,
+    cachefile=CACHEFILE,
+    counterfile=COUNTERFILE,
+    batch=CLAIM_BATCH,
+):
+    """Yield the records whose link hasn't been seen before, each with a new id.
+    Links are claimed batch at a time, one transaction each."""
+    seen = total = 0
+    fc = LinkStore(cachefile, legacy_json=LEGACY_CACHEFILE)
+    ids = IdAllocator(counterfile, legacy_json=LEGACY_COUNTERFILE)
+    pending = []
+    links = set()
+
+    def claimed():
+        won = fc.claim_many((data["link"], data["id"]) for data in pending)
+        # Links another run got first leave their ids as gaps.
+        for data in pending:
+            if data["link"] in won:
+                yield data
+        pending.clear()
+        links.clear()
+
+    try:
+        for data in records:
+            total += 1
+            if fc.cached(data["link"]) or data["link"] in links:
+                seen += 1
+                continue
+            data["id"] = ids.next()
+            pending.append(data)
+            links.add(data["link"])
+            if len(pending) >= batch:
+                yield from claimed()
+        yield from claimed()
+    finally:
+        ids.close()
+        fc.close()
+        if metrics:
+            metrics.cache("links", seen, total - seen)
+
+
+def main():
+    metrics = StageMetrics("tallyman")
+    try:
+        for data in tally(records(metrics.lines(sys.stdin)), metrics):
+            out = dumps(data)
+            print(out)
+            metrics.out(out)
+    finally:
+        metrics.close()
+
+
+if __name__ == "__main__":
+    main()
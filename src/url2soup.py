@@ -2,22 +2,40 @@
 # -*- coding: utf-8 -*-
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, UnicodeDammit
 import sys
 
+from lib.page_cache import PageCache
+
 """
 Fetch HTML from a URL and parse it using BeautifulSoup.
 This script fetches HTML content from a specified URL and applies a BeautifulSoup filter using the find_all method.
 It prints the number of elements found and their content.
+With --cache, pages are read from and saved to the shared page cache.
 """
 
+page_cache = None
+
+
+def get_html(url):
+    """Page body for url, from the page cache when enabled."""
+    html = page_cache.get(url) if page_cache else None
+    if html is None:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()  # Raise an exception for bad status codes
+        # Decoded the way BeautifulSoup would, honouring a <meta> charset;
+        # response.text guesses ISO-8859-1 when the header has none.
+        html = UnicodeDammit(response.content, is_html=True).unicode_markup
+        if page_cache:
+            page_cache.put(url, html)
+    return html
+
+
 def jpost(url, find_all_string):
     try:
         # Fetch the HTML content
         print(f"Fetching HTML from: {url}")
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = BeautifulSoup(get_html(url), 'html.parser')
 
         # 1. Find the main article container
         article_body = soup.find('section', itemprop='articleBody')
@@ -52,11 +70,10 @@ def fetch_and_parse(url, find_all_string):
     try:
         # Fetch the HTML content
         print(f"Fetching HTML from: {url}")
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
+        html = get_html(url)
 
         # Parse with BeautifulSoup
-        soup = BeautifulSoup(response.content, "html.parser")
+        soup = BeautifulSoup(html, "html.parser")
 
         # Apply find_all filter
         print(f"\nApplying find_all('{find_all_string}')...")
@@ -78,10 +95,15 @@ def fetch_and_parse(url, find_all_string):
 
 
 def main():
+    global page_cache
+    args = sys.argv[1:]
+    if "--cache" in args:
+        args.remove("--cache")
+        page_cache = PageCache()
     # Get URL and find_all string from command line arguments or user input
-    if len(sys.argv) == 3:
-        url = sys.argv[1]
-        find_all_string = sys.argv[2]
+    if len(args) == 2:
+        url = args[0]
+        find_all_string = args[1]
     else:
         url = input("Enter URL: ")
         find_all_string = input("Enter find_all string (e.g., 'a', 'div', 'p'): ")
@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.article_store import ArticleStore
+
+
+def article(id, title, days_ago=0, **more):
+    published = time.localtime(time.time() - days_ago * 86400)
+    return dict(id=id, title=title, published_parsed=list(published)[:9], **more)
+
+
+def ids(store, days=3):
+    return [json.loads(line)["id"] for line in store.window(days)]
+
+
+def test_window_first_per_title(tmp_path):
+    store = ArticleStore(str(tmp_path / "store.db"))
+    store.add(article(2, "Same story"))
+    store.add(article(1, "Same story"))
+    store.add(article(3, "Other story"))
+    store.add(article(4, "Old story", days_ago=10))
+    assert ids(store) == [1, 3]
+    assert ids(store, days=30) == [1, 3, 4]
+    store.close()
+
+
+def test_untitled_articles_are_all_kept(tmp_path):
+    store = ArticleStore(str(tmp_path / "store.db"))
+    store.add(article(1, None))
+    store.add(article(2, None))
+    store.add(article(3, "A title"))
+    assert ids(store) == [1, 2, 3]
+    store.close()
+
+
+def test_biased_copy_is_kept(tmp_path):
+    store = ArticleStore(str(tmp_path / "store.db"))
+    store.add(article(1, "T", bias={"bias": "left"}))
+    store.add(article(1, "T"))
+    assert "bias" in json.loads(next(store.window()))
+    store.add(article(1, "T updated", bias={"bias": "right"}))
+    assert json.loads(next(store.window()))["bias"] == {"bias": "right"}
+    store.close()
+
+
+def test_undated_and_expire(tmp_path):
+    store = ArticleStore(str(tmp_path / "store.db"), keep_days=5)
+    assert not store.add({"id": 1, "title": "no date"})
+    assert not store.add({"title": "no id", "published_parsed": [2024, 1, 1, 0, 0, 0]})
+    assert store.undated == 2
+    store.add(article(2, "new"))
+    store.add(article(3, "old", days_ago=10))
+    assert store.expire() == 1
+    assert len(store) == 1
+    store.close()
@@ -0,0 +1,44 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.boilerplate import Boilerplate
+
+FOOTER = "Subscribe to our newsletter today for more news."
+
+
+def test_recurring_sentence_is_stripped(tmp_path):
+    b = Boilerplate(str(tmp_path / "bp.db"), threshold=2)
+    assert b.strip("src", ["Story one is about apples.", FOOTER], "http://a/1") == (
+        ["Story one is about apples.", FOOTER],
+        [],
+    )
+    kept, dropped = b.strip("src", ["Story two is about pears.", FOOTER], "http://a/2")
+    assert kept == ["Story two is about pears."]
+    assert dropped == [FOOTER]
+    b.close()
+
+
+def test_refetched_link_with_new_sentence(tmp_path):
+    b = Boilerplate(str(tmp_path / "bp.db"))
+    b.strip("x", [FOOTER], "http://a")
+    # The same link again, updated: counted already, its new sentence never was.
+    kept, dropped = b.strip(
+        "x", [FOOTER, "A brand new sentence added in an update."], "http://a"
+    )
+    assert kept == [FOOTER, "A brand new sentence added in an update."]
+    assert dropped == []
+    b.close()
+
+
+def test_counts_persist_and_links_count_once(tmp_path):
+    path = str(tmp_path / "bp.db")
+    b = Boilerplate(path, threshold=2)
+    b.strip("src", [FOOTER], "http://a/1")
+    b.close()
+    b = Boilerplate(path, threshold=2)
+    b.strip("src", [FOOTER], "http://a/1")
+    assert b.boilerplate("src") == set()
+    b.strip("src", [FOOTER], "http://a/2")
+    assert len(b.boilerplate("src")) == 1
+    b.close()
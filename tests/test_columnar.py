@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+pytest.importorskip("pyarrow")
+from lib import columnar
+from lib.columnar import ColumnarWriter, convert, parquet_paths, read
+
+ARTICLE = {
+    "id": 7,
+    "title": "A title",
+    "published_parsed": [2025, 1, 2, 3, 4, 5, 0, 2, 0],
+    "stats": {"bias": "left", "positive": 3},
+    "bias": {"bias": "center", "degree": "minimal", "reason": "r"},
+    "ner": [
+        {
+            "tag": "POSITIVE",
+            "sentence": "Ann met Bob.",
+            "spans": [
+                {"text": "Ann", "value": "PER", "start": 0, "end": 3, "score": 0.99},
+                {"text": "Bob", "value": "PER", "start": 8, "end": 11, "score": "1"},
+            ],
+        }
+    ],
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "dedupe.jsonl")
+    with open(path, "w") as f:
+        f.write(json.dumps(ARTICLE) + "\n")
+        other = {"id": 8, "title": "Other", "stats": {"positive": "many"}}
+        f.write(json.dumps(other) + "\n")
+        f.write("not json\n")
+    assert convert(path, row_group=1) == 2
+    articles, ner = parquet_paths(path)
+    columns = ["id", "stats.bias", "bias.degree", "stats.positive"]
+    assert list(read(articles, columns)) == [
+        {"id": 7, "stats.bias": "left", "bias.degree": "minimal", "stats.positive": 3},
+        {"id": 8, "stats.bias": None, "bias.degree": None, "stats.positive": None},
+    ]
+    assert json.loads(next(read(articles, ["record"], ids=[7]))["record"]) == ARTICLE
+    assert list(read(articles, ["id"], ids=[8])) == [{"id": 8}]
+    spans = list(read(ner, ["id", "sentence", "tag", "text", "score"]))
+    assert spans == [
+        {"id": 7, "sentence": 0, "tag": "POSITIVE", "text": "Ann", "score": 0.99},
+        {"id": 7, "sentence": 0, "tag": "POSITIVE", "text": "Bob", "score": 1.0},
+    ]
+
+
+def test_typed():
+    pa = columnar.pa
+    assert columnar.typed(1, pa.float64()) == 1.0
+    assert columnar.typed("0.5", pa.float64()) == 0.5
+    assert columnar.typed("high", pa.float64()) is None
+    assert columnar.typed(True, pa.int64()) is None
+    assert columnar.typed({"a": 1}, pa.string()) == '{"a": 1}'
+    assert columnar.typed("", pa.string()) is None
+
+
+def test_missing_column(tmp_path):
+    path = str(tmp_path / "a.jsonl")
+    with ColumnarWriter(path) as writer:
+        writer.add({"id": 1})
+    with pytest.raises(ValueError):
+        list(read(parquet_paths(path)[0], ["nope"]))
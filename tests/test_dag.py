@@ -0,0 +1,140 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.dag import Pipeline, Stage, pushed, unblocked
+
+
+class Collect:
+    def __init__(self):
+        self.records = []
+        self.closed = False
+
+    def add(self, record):
+        self.records.append(record)
+
+    def close(self):
+        self.closed = True
+
+
+def numbers(n):
+    return ({"n": i} for i in range(n))
+
+
+def test_per_record_keeps_order_and_drops(tmp_path):
+    def slow_odd(record):
+        if record["n"] % 3 == 0:
+            return None
+        time.sleep(0.001 * (record["n"] % 2))
+        return record
+
+    sink = Collect()
+    checkpoint = str(tmp_path / "out.jsonl")
+    Pipeline(
+        [
+            Stage("read", lambda records: records),
+            Stage("filter", slow_odd, per_record=True, workers=4, queue_size=2),
+            Stage("out", lambda records: records, checkpoint=checkpoint, sinks=[sink]),
+        ]
+    ).run(numbers(30))
+    expected = [i for i in range(30) if i % 3]
+    assert [r["n"] for r in sink.records] == expected
+    assert sink.closed
+    with open(checkpoint) as f:
+        assert len(f.readlines()) == len(expected)
+
+
+def test_fan_out():
+    left, right = Collect(), Collect()
+    Pipeline(
+        [
+            Stage("read", lambda records: records),
+            Stage("left", lambda records: records, sinks=[left]),
+            Stage("right", lambda records: records, input="read", sinks=[right]),
+        ]
+    ).run(numbers(100))
+    assert len(left.records) == len(right.records) == 100
+
+
+def test_failed_stage_tears_down_the_run():
+    sink = Collect()
+
+    def boom(records):
+        for record in records:
+            if record["n"] == 5:
+                raise ValueError("bad record")
+            yield record
+
+    pipeline = Pipeline(
+        [
+            Stage("read", lambda records: records),
+            Stage("boom", boom, queue_size=1),
+            Stage("out", lambda records: records, sinks=[sink]),
+        ]
+    )
+    start = time.monotonic()
+    # Far more input than the queues hold: read has to be let go.
+    with pytest.raises(RuntimeError, match="Failed stages: boom"):
+        pipeline.run(numbers(100000))
+    assert time.monotonic() - start < 10
+    assert [r["n"] for r in sink.records] == [0, 1, 2, 3, 4]
+    assert sink.closed
+
+
+def test_pushed():
+    def fn(records, emit):
+        for record in records:
+            emit(record)
+            emit(record)
+
+    assert [r["n"] for r in pushed(fn, numbers(3), queue_size=1)] == [0, 0, 1, 1, 2, 2]
+
+    def fails(records, emit):
+        raise ValueError("no")
+
+    with pytest.raises(ValueError):
+        list(pushed(fails, []))
+
+
+def test_pushed_lets_go_when_closed():
+    done = threading.Event()
+
+    def fn(records, emit):
+        try:
+            for record in records:
+                emit(record)
+        finally:
+            done.set()
+
+    output = pushed(fn, numbers(1000), queue_size=1)
+    next(output)
+    output.close()
+    assert done.wait(5)
+
+
+def test_unblocked_keeps_the_loop_going():
+    ticks = []
+
+    def slow():
+        for i in range(3):
+            time.sleep(0.05)
+            yield i
+
+    async def tick():
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    async def read():
+        task = asyncio.create_task(tick())
+        items = [i async for i in unblocked(slow())]
+        task.cancel()
+        return items
+
+    assert asyncio.run(read()) == [0, 1, 2]
+    # A blocking read would have let the ticker run once at most.
+    assert len(ticks) > 5
@@ -0,0 +1,104 @@
+import sys
+import os
+import asyncio
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.endpoint_pool import EndpointPool, endpoint_url, ollama_hosts, retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class ContextWindowExceededError(StatusError):
+    def __init__(self):
+        super().__init__(400)
+
+
+def pool(hosts="a,b,c", **kwargs):
+    p = EndpointPool(hosts, **kwargs)
+    p.healthy = lambda endpoint: True
+    return p
+
+
+def test_endpoint_url():
+    assert endpoint_url("gpu1") == "http://gpu1:11434"
+    assert endpoint_url("gpu1:8080") == "http://gpu1:8080"
+    assert endpoint_url("http://gpu1/") == "http://gpu1:11434"
+    assert endpoint_url("https://llm.example.com") == "https://llm.example.com"
+    assert endpoint_url("https://llm.example.com:8443") == "https://llm.example.com:8443"
+    assert ollama_hosts("a, b,") == ["http://a:11434", "http://b:11434"]
+
+
+def test_retryable():
+    assert retryable(ConnectionRefusedError())
+    assert retryable(TimeoutError())
+    assert retryable(StatusError(503))
+    assert not retryable(StatusError(400))
+    assert not retryable(ContextWindowExceededError())
+    assert not retryable(ValueError("bad json"))
+
+
+def test_retry_on_another_endpoint_and_eject():
+    p = pool(max_failures=1)
+    seen = []
+
+    def fn(url):
+        seen.append(url)
+        if url == "http://a:11434":
+            raise ConnectionRefusedError()
+        return url
+
+    assert p.call(fn) != "http://a:11434"
+    assert seen[0] == "http://a:11434" and len(seen) == 2
+    assert p.endpoints[0].ejected_until > 0
+    assert p.call(fn) != "http://a:11434"
+    assert all(e.outstanding == 0 for e in p.endpoints)
+
+
+def test_request_errors_are_not_retried():
+    p = pool(max_failures=1)
+    seen = []
+
+    def fn(url):
+        seen.append(url)
+        raise ContextWindowExceededError()
+
+    with pytest.raises(ContextWindowExceededError):
+        p.call(fn)
+    assert len(seen) == 1
+    assert not any(e.ejected_until for e in p.endpoints)
+    assert all(e.outstanding == 0 for e in p.endpoints)
+
+
+def test_gives_up_after_retries():
+    p = pool(retries=1)
+    seen = []
+
+    def fn(url):
+        seen.append(url)
+        raise StatusError(500)
+
+    with pytest.raises(StatusError):
+        p.call(fn)
+    assert len(seen) == 2 and len(set(seen)) == 2
+
+
+def test_call_async():
+    p = pool()
+
+    async def fn(url):
+        if url == "http://a:11434":
+            raise asyncio.TimeoutError()
+        return url
+
+    async def bad(url):
+        raise StatusError(422)
+
+    assert asyncio.run(p.call_async(fn)) == "http://b:11434"
+    with pytest.raises(StatusError):
+        asyncio.run(p.call_async(bad))
+    assert all(e.outstanding == 0 for e in p.endpoints)
@@ -0,0 +1,30 @@
+import sys
+import os
+import glob
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.extract import bs4_paragraphs, lxml_paragraphs, extractor
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+
+
+def test_lxml_matches_bs4_on_fixtures():
+    paths = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+    assert paths
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            doc = f.read()
+        assert lxml_paragraphs(doc) == bs4_paragraphs(doc), path
+
+
+def test_escaped_markup_is_dropped_like_bs4():
+    doc = "<p>revenue &lt;b&gt;beat&lt;/b&gt; AT&amp;T</p><p>x<![CDATA[a<b]]></p>"
+    assert lxml_paragraphs(doc) == bs4_paragraphs(doc)
+
+
+def test_unknown_extractor():
+    try:
+        extractor("nope")
+    except ValueError:
+        return
+    assert False
@@ -0,0 +1,71 @@
+import sys
+import os
+import types
+import importlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def load(monkeypatch):
+    """lib.flair_sentiment, with flair and NewsSentiment faked where missing:
+    only the batching is under test, not the models."""
+    fakes = {
+        "flair": {},
+        "flair.nn": {"Classifier": object},
+        "flair.splitter": {"SegtokSentenceSplitter": object},
+        "NewsSentiment": {"TargetSentimentClassifier": object},
+    }
+    for name, attrs in fakes.items():
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            module = types.ModuleType(name)
+            module.__dict__.update(attrs)
+            monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.delitem(sys.modules, "lib.flair_sentiment", raising=False)
+    module = importlib.import_module("lib.flair_sentiment")
+    # Dropped again afterwards, so nothing else gets the faked import.
+    monkeypatch.setitem(sys.modules, "lib.flair_sentiment", module)
+    return module
+
+
+class Span:
+    def __init__(self, start, end):
+        self.start_position = start
+        self.end_position = end
+
+
+class Sentence:
+    def __init__(self, text, spans):
+        self.text = text
+        self.spans = spans
+
+    def to_plain_string(self):
+        return self.text
+
+    def get_spans(self, kind):
+        return self.spans
+
+
+class Tsc:
+    def __init__(self):
+        self.calls = []
+
+    def infer(self, targets, batch_size=1, disable_tqdm=False):
+        self.calls.append((len(targets), batch_size, disable_tqdm))
+        return [[{"class_label": "neutral", "class_prob": 0.9}] for _ in targets]
+
+
+def test_one_infer_call_per_batch(monkeypatch):
+    flair_sentiment = load(monkeypatch)
+    tagger = flair_sentiment.FlairSentiment.__new__(flair_sentiment.FlairSentiment)
+    tagger.tsc = Tsc()
+    tagger.tsc_batch_size = 4
+    sentences = [
+        Sentence(f"Ann met Bob in Rome {i}.", [Span(0, 3), Span(8, 11)])
+        for i in range(3)
+    ]
+    tagged = tagger.target_sentiments(sentences)
+    # Six targets in batches of four: two calls, not six.
+    assert tagger.tsc.calls == [(4, 4, True), (2, 4, True)]
+    assert all(len(tagged[id(s)][1]) == 2 for s in sentences)
@@ -0,0 +1,51 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.id_allocator import IdAllocator
+
+
+def test_ids_increase(tmp_path):
+    with IdAllocator(str(tmp_path / "counter.db"), block=3) as ids:
+        assert [ids.next() for _ in range(7)] == list(range(7))
+
+
+def test_concurrent_allocators_never_share_ids(tmp_path):
+    db = str(tmp_path / "counter.db")
+    with IdAllocator(db, block=4) as a, IdAllocator(db, block=4) as b:
+        got = []
+        for _ in range(10):
+            got.append(a.next())
+            got.append(b.next())
+        assert len(set(got)) == len(got)
+
+
+def test_unused_block_is_handed_back(tmp_path):
+    db = str(tmp_path / "counter.db")
+    ids = IdAllocator(db, block=100)
+    assert ids.next() == 0
+    ids.close()
+    with IdAllocator(db, block=100) as ids:
+        assert ids.next() == 1
+
+
+def test_block_is_kept_once_another_run_reserved_past_it(tmp_path):
+    db = str(tmp_path / "counter.db")
+    a = IdAllocator(db, block=100)
+    b = IdAllocator(db, block=100)
+    assert a.next() == 0
+    assert b.next() == 100
+    a.close()
+    # a's tail can't go back: b's block comes after it.
+    assert b.peek() == 101
+    b.close()
+    with IdAllocator(db, block=100) as c:
+        assert c.next() == 101
+
+
+def test_legacy_counter_is_imported(tmp_path):
+    legacy = tmp_path / "counter.json"
+    legacy.write_text('{"id": 42}')
+    with IdAllocator(str(tmp_path / "counter.db"), legacy_json=str(legacy)) as ids:
+        assert ids.next() == 42
+    assert not legacy.exists()
@@ -0,0 +1,52 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.journal import Journal
+
+
+def test_resume_finds_finished_records(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path)
+    journal.append({"id": 1, "bias": "left"})
+    journal.append({"id": 2, "bias": "right"})
+    journal.close()
+    journal = Journal(path, resume=True)
+    assert journal.finished({"id": 1}) == {"id": 1, "bias": "left"}
+    assert journal.finished({"id": "2"})["bias"] == "right"
+    assert journal.finished({"id": 3}) is None
+    assert journal.finished({"title": "no id"}) is None
+    journal.close()
+
+
+def test_without_resume_starts_fresh(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with open(path, "w") as f:
+        f.write('{"id": 1}\n')
+    journal = Journal(path)
+    assert journal.finished({"id": 1}) is None
+    journal.close()
+    assert os.path.getsize(path) == 0
+
+
+def test_partial_last_line_is_skipped_and_appends_stay_whole(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with open(path, "w") as f:
+        f.write('{"id": 1}\n{"id": 2, "bi')
+    journal = Journal(path, resume=True)
+    assert journal.finished({"id": 1}) is not None
+    assert journal.finished({"id": 2}) is None
+    journal.append({"id": 2, "bias": "center"})
+    journal.close()
+    journal = Journal(path, resume=True)
+    assert journal.finished({"id": 2}) == {"id": 2, "bias": "center"}
+    journal.close()
+
+
+def test_sync_every(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"), sync_every=2)
+    journal.append({"id": 1})
+    assert journal.unsynced == 1
+    journal.append({"id": 2})
+    assert journal.unsynced == 0
+    journal.close()
@@ -0,0 +1,39 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.link_store import LinkStore
+
+
+def test_claim_once(tmp_path):
+    db = str(tmp_path / "links.db")
+    with LinkStore(db) as store, LinkStore(db) as other:
+        assert store.claim("http://a", 1)
+        assert not other.claim("http://a", 2)
+        assert other.get("http://a") == 1
+
+
+def test_claim_many_in_one_batch(tmp_path):
+    with LinkStore(str(tmp_path / "links.db")) as store:
+        store.claim("http://a", 1)
+        claimed = store.claim_many([("http://a", 2), ("http://b", 3), ("http://b", 4)])
+        assert claimed == {"http://b"}
+        assert store.get("http://b") == 3
+        assert len(store) == 2
+
+
+def test_expired_claim_is_taken_over(tmp_path):
+    with LinkStore(str(tmp_path / "links.db")) as store:
+        store.claim("http://a", 1, ttl_hours=-1)
+        assert not store.cached("http://a")
+        assert store.claim("http://a", 2)
+        assert store.get("http://a") == 2
+
+
+def test_compact_drops_expired(tmp_path):
+    with LinkStore(str(tmp_path / "links.db")) as store:
+        store.put("http://old", 1, ttl_hours=-1)
+        store.put("http://new", 2)
+        store.compact()
+        assert len(store) == 1
+        assert store.cached("http://new")
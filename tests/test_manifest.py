@@ -0,0 +1,70 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.manifest import RunManifest
+
+
+def run(manifest, run_id, ids, failed=(), ok=True):
+    """One bias run over ids, returning the ids it took in."""
+    delta = manifest.delta("bias", run_id)
+    taken = []
+    for data in delta.records({"id": id} for id in ids):
+        taken.append(data["id"])
+        if data["id"] not in failed:
+            delta.out(data)
+    delta.finish(ok)
+    return taken
+
+
+def test_interleaved_blocks(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.db"))
+    # Two runs in parallel with id blocks 0-99 and 100-199; the later block
+    # finishes first.
+    run(manifest, "b", range(100, 105))
+    assert run(manifest, "a", range(0, 5)) == list(range(0, 5))
+    assert run(manifest, "c", [3, 103, 200]) == [200]
+    manifest.close()
+
+
+def test_failed_records_are_retried(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.db"))
+    run(manifest, "a", [1, 2, 3], failed={2})
+    assert run(manifest, "b", [1, 2, 3, 4]) == [2, 4]
+    assert run(manifest, "c", [1, 2, 3, 4]) == []
+    manifest.close()
+
+
+def test_unfinished_run_is_redone(tmp_path):
+    path = str(tmp_path / "manifest.db")
+    manifest = RunManifest(path)
+    run(manifest, "a", [1, 2], ok=False)
+    manifest.close()
+    manifest = RunManifest(path)
+    assert run(manifest, "b", [1, 2]) == [1, 2]
+    runs = manifest.runs("bias")
+    assert [(r["run_id"], r["ok"], r["first_id"], r["last_id"]) for r in runs] == [
+        ("b", 1, 1, 2),
+        ("a", 0, 1, 2),
+    ]
+    manifest.close()
+
+
+def test_records_without_ids_and_all(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.db"))
+    run(manifest, "a", [1])
+    delta = manifest.delta("bias", "b")
+    assert delta.new({"title": "no id"})
+    assert not delta.new({"id": 1})
+    delta.seen = set()
+    assert delta.new({"id": 1})
+    assert (delta.records_in, delta.skipped) == (2, 1)
+    manifest.close()
+
+
+def test_stages_are_separate(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.db"))
+    run(manifest, "a", [1])
+    assert manifest.processed("bias") == {1}
+    assert manifest.processed("recent") == set()
+    manifest.close()
@@ -0,0 +1,53 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.metrics import StageMetrics, percentile
+from metrics_report import load
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([5], 95) == 5
+
+
+def test_stage_line(tmp_path, monkeypatch):
+    monkeypatch.setenv("RUN_ID", "run-1")
+    path = str(tmp_path / "metrics.jsonl")
+
+    class Cache:
+        hits, misses = 3, 1
+
+    metrics = StageMetrics("tagger", path)
+    for line in metrics.lines(["a\n", "bb\n"]):
+        with metrics.timed():
+            metrics.out(line)
+    metrics.cache("sentences", 0, 0)
+    metrics.track("llm", Cache)
+    metrics.note("model", "m")
+    metrics.close()
+    metrics.close()
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 1
+    rec = lines[0]
+    assert (rec["run_id"], rec["stage"], rec["model"]) == ("run-1", "tagger", "m")
+    assert (rec["records_in"], rec["records_out"], rec["bytes_in"]) == (2, 2, 5)
+    assert rec["timed"] == 2 and rec["p50"] is not None
+    assert rec["caches"]["llm"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+    assert rec["caches"]["sentences"]["hit_rate"] is None
+
+
+def test_report_groups_stages_by_run(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.jsonl")
+    for run, stage in [("r1", "a"), ("r2", "a"), ("r1", "b")]:
+        monkeypatch.setenv("RUN_ID", run)
+        StageMetrics(stage, path).close()
+    with open(path, "a") as f:
+        f.write('{"run_id": "r2", "sta')
+    runs = load(path)
+    assert [rec["stage"] for rec in runs["r1"]] == ["a", "b"]
+    assert len(runs["r2"]) == 1
@@ -0,0 +1,55 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib.minhash import NearDupeIndex, signature, similarity
+from near_dupes import near_dupes
+
+STORY = (
+    "The senate passed the spending bill late on Tuesday after a long debate "
+    "about taxes, the deficit and money for roads and bridges in rural states, "
+    "sending it to the president who is expected to sign it this week."
+)
+COPY = STORY.replace("this week", "this week, aides said")
+OTHER = (
+    "A storm brought heavy snow to the mountains overnight, closing passes and "
+    "leaving thousands of homes without power as crews worked to clear roads."
+)
+
+
+def test_similarity():
+    assert similarity(signature(STORY), signature(STORY)) == 1
+    assert similarity(signature(STORY), signature(COPY)) > 0.6
+    assert similarity(signature(STORY), signature(OTHER)) < 0.2
+
+
+def test_match_and_rerun(tmp_path):
+    index = NearDupeIndex(str(tmp_path / "nd.db"), threshold=0.6)
+    index.add(1, "a", "http://a/1", signature(STORY))
+    assert index.match(signature(COPY), 2) == ("1", "a", "http://a/1")
+    assert index.match(signature(OTHER), 3) is None
+    # An article is never a copy of itself.
+    assert index.match(signature(STORY), 1) is None
+    index.close()
+
+
+def test_near_dupes_streams_and_groups(tmp_path):
+    index = NearDupeIndex(str(tmp_path / "nd.db"), threshold=0.6)
+    read = []
+
+    def records():
+        for data in [
+            {"id": 1, "source": "a", "link": "http://a/1", "text": STORY},
+            {"id": 2, "source": "b", "link": "http://b/2", "text": COPY},
+            {"id": 3, "source": "c", "link": "http://c/3", "text": OTHER},
+            {"id": 4, "flavor": "rss"},
+        ]:
+            read.append(data["id"])
+            yield data
+
+    kept = near_dupes(records(), index)
+    assert next(kept)["id"] == 1
+    assert read == [1]
+    assert [data["id"] for data in kept] == [3, 4]
+    assert index.duplicates(1) == [{"id": "2", "source": "b", "link": "http://b/2"}]
+    index.close()
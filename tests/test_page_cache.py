@@ -0,0 +1,60 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib import page_cache
+from lib.page_cache import PageCache, canonical_url
+
+
+def test_canonical_url_drops_tracking_only():
+    assert canonical_url("HTTPS://Example.com/a?utm_source=rss&fbclid=x#top") == (
+        "https://example.com/a"
+    )
+    assert canonical_url("http://x.com/article.php?p=2&id=123&utm_medium=feed") == (
+        "http://x.com/article.php?id=123&p=2"
+    )
+    assert canonical_url("http://x.com/a.php?id=123") != canonical_url(
+        "http://x.com/a.php?id=124"
+    )
+
+
+def test_get_put_shares_canonical_entry(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put("http://x.com/a?utm_source=rss", "body")
+    assert cache.get("http://X.com/a") == "body"
+    assert cache.get("http://x.com/b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(page_cache.time, "time", lambda: now[0])
+    cache = PageCache(str(tmp_path), ttl_hours=1)
+    cache.put("http://x.com/a", "old")
+    cache.put("http://x.com/b", "new")
+    now[0] += 1800
+    cache.put("http://x.com/b", "newer")
+    now[0] += 2400
+    assert cache.get("http://x.com/a") is None
+    assert cache.expire() == 1
+    assert cache.get("http://x.com/b") == "newer"
+    cache.close()
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(page_cache.time, "time", lambda: now[0])
+    cache = PageCache(str(tmp_path))
+    for name in "abc":
+        cache.put(f"http://x.com/{name}", name * 1000)
+        now[0] += 1
+    # Room for two pages: touching a makes b the least recently used.
+    cache.max_bytes = cache.size - 1
+    cache.get("http://x.com/a")
+    now[0] += 1
+    cache.put("http://x.com/d", "d")
+    assert cache.get("http://x.com/b") is None
+    assert cache.get("http://x.com/a") == "a" * 1000
+    assert cache.get("http://x.com/d") == "d"
+    cache.close()
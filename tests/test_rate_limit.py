@@ -0,0 +1,51 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib import rate_limit
+from lib.rate_limit import TokenBucket, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_waits(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Tokens are borrowed from the future, each one half a second later.
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+    clock.now += 1.0
+    assert bucket.reserve() == 0.5
+
+
+def test_refill_is_capped_at_burst(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.reserve()
+    clock.now += 100
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 1.0
+
+
+def test_no_rate_never_waits():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.reserve() == 0 for _ in range(10))
+
+
+def test_buckets_are_per_key(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "monotonic", Clock())
+    limiter = RateLimiter(rate=1)
+    assert limiter.bucket("a.com").reserve() == 0
+    assert limiter.bucket("b.com").reserve() == 0
+    assert limiter.bucket("a.com").reserve() == 1.0
+    assert limiter.bucket("a.com") is limiter.bucket("a.com")
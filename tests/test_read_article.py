@@ -0,0 +1,59 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import requests
+from read_article import RSSFeedProcessor
+
+
+class Response:
+    def __init__(self, url):
+        self.url = url
+        self.text = f"<html><body><p>text of {url}</p></body></html>"
+
+    def raise_for_status(self):
+        if "missing" in self.url:
+            raise requests.HTTPError(f"404 for {self.url}")
+
+
+class Session:
+    def __init__(self):
+        self.headers = {}
+
+    def get(self, url, timeout=None):
+        return Response(url)
+
+
+def processor():
+    p = RSSFeedProcessor()
+    p.make_session = lambda retries: Session()
+    return p
+
+
+def test_fetched_adds_text_and_counts_failures():
+    p = processor()
+    records = [
+        {"link": "http://a.com/1"},
+        {"link": "http://b.com/missing"},
+        {"link": "http://c.com/2"},
+    ]
+    out = list(p.fetched(records, workers=2, rate=0))
+    assert sorted(r["link"] for r in out) == ["http://a.com/1", "http://c.com/2"]
+    assert all("text of" in r["text"] for r in out)
+    assert (p.good, p.bad) == (2, 1)
+
+
+def test_fetched_streams_input():
+    read = 0
+
+    def records():
+        nonlocal read
+        for n in range(100):
+            read += 1
+            yield {"link": f"http://site{n % 5}.com/{n}"}
+
+    fetched = processor().fetched(records(), workers=1, rate=0, window=2)
+    next(fetched)
+    # Only the lookahead window and the fetches in flight were read.
+    assert read < 10
+    assert len(list(fetched)) == 99
@@ -0,0 +1,72 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib import result_cache
+from lib.result_cache import ResultCache, digest
+
+
+def test_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"))
+    key = digest("flair", "some text")
+    cache.put(key, [{"spans": []}, {"bias": "neutral"}])
+    assert cache.get(key) == [{"spans": []}, {"bias": "neutral"}]
+    assert cache.get(digest("flair", "other text")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_digest_separates_parts():
+    assert digest("ab", "c") != digest("a", "bc")
+
+
+def test_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    cache = ResultCache(str(tmp_path / "results.db"), ttl_hours=1)
+    cache.put("a", 1)
+    now[0] += 3000
+    assert cache.get("a") == 1
+    now[0] += 1000
+    assert cache.get("a") is None
+    cache.put("b", 2)
+    assert cache.db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 1
+    cache.close()
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    cache = ResultCache(str(tmp_path / "results.db"))
+    for key in "abc":
+        cache.put(key, key * 100)
+        now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.max_bytes = cache.size
+    cache.put("d", "d" * 100)
+    assert cache.get("b") is None
+    assert cache.get_many(["a", "c", "d"]).keys() == {"a", "c", "d"}
+    assert cache.size <= cache.max_bytes
+    cache.close()
+
+
+def test_size_survives_reopen(tmp_path):
+    path = str(tmp_path / "results.db")
+    cache = ResultCache(path)
+    cache.put_many({"a": "x" * 50, "b": "y" * 50})
+    size = cache.size
+    cache.close()
+    assert ResultCache(path).size == size
+
+
+def test_delete(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"))
+    cache.put_many({"a": "x" * 50, "b": "y" * 50})
+    size = cache.size
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is None
+    assert cache.size < size
+    assert cache.get("b") == "y" * 50
+    cache.close()
@@ -0,0 +1,62 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from lib import token_budget
+from lib.token_budget import TokenBudget, context_window, DEFAULT_CONTEXT
+
+MODEL = "ollama/qwen3:8b"
+
+
+@pytest.fixture(autouse=True)
+def char_tokens(monkeypatch):
+    # Four characters a token, whether or not litellm is installed.
+    monkeypatch.setattr(token_budget, "token_counter", None)
+
+
+def sentence(word, n=10):
+    return " ".join([word] * n) + "."
+
+
+def test_short_article_is_sent_whole():
+    budget = TokenBudget(MODEL, "Rate the bias.", article_tokens=100)
+    text = sentence("short")
+    assert budget.fit(text) == (text, budget.count(text), budget.count(text))
+    assert budget.truncated == 0
+
+
+def test_long_article_keeps_lead_and_entity_sentences():
+    budget = TokenBudget(MODEL, "Rate the bias.", article_tokens=60)
+    sentences = [sentence(f"s{i}x") for i in range(10)]
+    ner = [
+        {"sentence": s, "spans": [{"value": "PER"}] * (3 if i == 7 else 0)}
+        for i, s in enumerate(sentences)
+    ]
+    ner[8]["spans"] = [{"value": "DATE"}] * 5
+    text, tokens, original = budget.fit(" ".join(sentences), ner)
+    assert tokens <= 60 < original
+    assert text.startswith(sentences[0])
+    assert sentences[7] in text
+    assert sentences[8] not in text
+    assert budget.truncated == 1
+
+
+def test_prompt_that_leaves_no_room_raises():
+    with pytest.raises(ValueError):
+        TokenBudget(MODEL, "x" * 4 * DEFAULT_CONTEXT, article_tokens=2000)
+
+
+def test_context_window():
+    assert context_window("ollama/llama4:scout") == 16384
+    # Unknown Ollama models run with the num_ctx we send, not their maximum.
+    assert context_window("ollama/some-new-model") == DEFAULT_CONTEXT
+    budget = TokenBudget(MODEL, "prompt", article_tokens=0, context=4096)
+    assert budget.budget == budget.room() == 4096 - budget.prompt_tokens - budget.reserve
+
+
+def test_room_grows_answer_reserve_with_batch():
+    budget = TokenBudget(MODEL, "prompt", context=8192)
+    assert budget.room(1) == budget.room()
+    assert budget.room(4) == budget.room() - 3 * token_budget.BATCH_ANSWER_TOKENS
+    assert budget.room(1, extra=50) == budget.room() - 50
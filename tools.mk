@@ -22,7 +22,7 @@ tsv2html:
 html2pdf:
 	chrome --headless --disable-gpu --print-to-pdf="tmp/0527idtitlelink.pdf" "file:///Users/kyle/hub/Pheme-News/tmp/0527idtitlelink.html"
 ollamacheck:
-	python src/lib/ollamaai.py 'llama3.1:8b' 3000 prompt="Capital of Spain"
+	cd src && python -m lib.ollamaai 'llama3.1:8b' 3000 prompt="Capital of Spain"
 gpechinavietnam:
 	jq -n '[inputs | . as $root | .ner[].spans[] | select(.value? == "GPE" and (.text? | IN("China", "Vietnam") | . == true)) | {text: .text, value: .value, source: $root.source, id: $root.id}]' cache/dedupe.jsonl
 workschinavietname:
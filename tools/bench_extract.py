@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark the paragraph extractors in src/lib/extract.py on saved pages and
+check they give the same text.
+
+Usage: python tools/bench_extract.py [-n REPEAT] [PATH ...]
+
+PATHs are .html files or directories of them. Gzipped pages from the page
+cache (cache/pages) work too. Defaults to tests/fixtures/html.
+"""
+
+import os
+import sys
+import gzip
+import time
+import argparse
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from lib.extract import EXTRACTORS  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(SRC, "..", "tests", "fixtures", "html")
+BASELINE = "bs4"
+
+
+def load(path):
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def pages(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith((".html", ".htm", ".gz")):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time and compare paragraph extractors.")
+    ap.add_argument("paths", nargs="*", default=[DEFAULT_FIXTURES])
+    ap.add_argument("-n", "--repeat", type=int, default=5, help="Runs per page")
+    args = ap.parse_args()
+
+    docs = [(path, load(path)) for path in pages(args.paths)]
+    if not docs:
+        print("No pages found.", file=sys.stderr)
+        sys.exit(1)
+    size = sum(len(doc) for _, doc in docs)
+    print(f"{len(docs)} pages, {size / 1024:.0f} KiB, {args.repeat} runs each")
+
+    timings = {}
+    outputs = {}
+    for name, extract in EXTRACTORS.items():
+        outputs[name] = [extract(doc) for _, doc in docs]
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for _, doc in docs:
+                extract(doc)
+        timings[name] = time.perf_counter() - start
+
+    base = timings[BASELINE]
+    for name, secs in timings.items():
+        per_page = secs / (args.repeat * len(docs)) * 1000
+        print(f"{name:8} {secs:8.3f}s {per_page:8.2f} ms/page {base / secs:6.2f}x")
+
+    mismatches = 0
+    for name in EXTRACTORS:
+        for (path, _), want, got in zip(docs, outputs[BASELINE], outputs[name]):
+            if want != got:
+                mismatches += 1
+                print(f"MISMATCH {name}: {path}", file=sys.stderr)
+    if mismatches:
+        sys.exit(2)
+    print(f"all extractors match {BASELINE}")
+
+
+if __name__ == "__main__":
+    main()